@@ -0,0 +1,72 @@
+"""
+Per-viewer like state for post lists, and an idempotent like/unlike.
+
+``liked_by_me`` is either annotated onto a post queryset as an ``EXISTS`` subquery (one query for the
+whole page) or, for posts that were already fetched (the feed), filled in with one ``post_id IN (...)``
+query. ``like_count`` and ``comment_count`` come from the counters on ``Post`` and need no aggregation.
+
+``like_post`` and ``unlike_post`` are single statements that cannot fail on a duplicate or missing like.
+They send ``post_save``/``post_delete`` for the rows they actually changed, so counters and any other
+receivers see exactly one event per real transition. The statement and its signal share one transaction,
+so a failing receiver rolls the like back with it instead of leaving the counter out of step.
+"""
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.signals import post_delete, post_save
+
+from .models import Like
+
+
+def with_liked_by_me(queryset, user):
+    if not user.is_authenticated:
+        return queryset.annotate(liked_by_me=Value(False))
+    return queryset.annotate(liked_by_me=Exists(Like.objects.filter(post=OuterRef('pk'), user_id=user.pk)))
+
+
+def mark_liked_by_me(posts, user):
+    """Sets ``liked_by_me`` on already-fetched ``posts``."""
+    liked = set()
+    if user.is_authenticated and posts:
+        liked = set(Like.objects.filter(user_id=user.pk, post_id__in=[post.pk for post in posts])
+                    .values_list('post_id', flat=True))
+    for post in posts:
+        post.liked_by_me = post.pk in liked
+    return posts
+
+
+def _table():
+    return connection.ops.quote_name(Like._meta.db_table)
+
+
+def like_post(post_id, user_id):
+    """Likes the post unless already liked. Returns whether a like was created."""
+    # No savepoint: nothing here recovers from an error, so a nested call just fails the outer transaction.
+    with transaction.atomic(savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {_table()} (post_id, user_id, "timestamp") VALUES (%s, %s, now()) '
+                f'ON CONFLICT (post_id, user_id) DO NOTHING RETURNING id, "timestamp"',
+                [post_id, user_id],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return False
+        like = Like(id=row[0], post_id=post_id, user_id=user_id, timestamp=row[1])
+        like._state.adding = False
+        post_save.send(sender=Like, instance=like, created=True, update_fields=None, raw=False,
+                       using=connection.alias)
+    return True
+
+
+def unlike_post(post_id, user_id):
+    """Removes the like if there is one. Returns whether a like was deleted."""
+    with transaction.atomic(savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {_table()} WHERE post_id = %s AND user_id = %s RETURNING id, "timestamp"',
+                           [post_id, user_id])
+            row = cursor.fetchone()
+        if row is None:
+            return False
+        like = Like(id=row[0], post_id=post_id, user_id=user_id, timestamp=row[1])
+        post_delete.send(sender=Like, instance=like, using=connection.alias, origin=like)
+    return True
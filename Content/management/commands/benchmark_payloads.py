@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from PawsConnect.benchmarking import time_calls, write_report
+from UserManagement.models import CustomUser, Friendship
+from UserManagement.seeding import Seeder
+
+CARD_FIELDS = ('id,content,photo_renditions,timestamp,like_count,comment_count,liked_by_me,'
+               'user.id,user.display_name,user.profile_picture')
+
+# name -> (URL name, query parameters); '{author}' is replaced with a friend of the viewer
+SHAPES = {
+    'feed_full': ('content:feed-list', {}),
+    'feed_card': ('content:feed-list', {'fields': CARD_FIELDS}),
+    'feed_card_expanded_pets': ('content:feed-list', {'fields': CARD_FIELDS + ',tagged_pets',
+                                                      'expand': 'tagged_pets'}),
+    'profile_posts_full': ('content:post-list', {'user_id': '{author}'}),
+    'profile_posts_card': ('content:post-list', {'user_id': '{author}', 'fields': CARD_FIELDS}),
+}
+
+
+class Command(BaseCommand):
+    help = 'Measures payload size, query count and latency of common list shapes with and without ?fields=/?expand='
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--friends', type=int, default=100, help="Friends of the benchmarking user")
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=20, help='Page size requested')
+        parser.add_argument('--output', help='Write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        report = {}
+        with transaction.atomic():
+            viewer, author = self.generate(options)
+            client = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(viewer)}')
+
+            for name, (url_name, params) in SHAPES.items():
+                params = {key: value.format(author=author) for key, value in params.items()}
+                params['limit'] = options['limit']
+                url = reverse(url_name)
+
+                def get():
+                    response = client.get(url, params)
+                    assert response.status_code == 200, response.content
+                    return response
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = get()
+                report[name] = time_calls(get, [()] * options['requests'])
+                report[name]['bytes'] = len(response.content)
+                report[name]['queries'] = len(queries)
+            transaction.set_rollback(True)
+
+        for name, stats in report.items():
+            self.stdout.write(f"{name:<26} {stats['bytes']:>9} B  {stats['queries']:>3} queries  "
+                              f"p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms")
+        if options['output']:
+            write_report(options['output'], report)
+
+    def generate(self, options):
+        self.stdout.write('Generating data...')
+        seeder = Seeder(seed=1)
+        user_ids = seeder.users(options['users'], geocode=False)
+        seeder.pets(user_ids, per_user=1.5)
+        seeder.friendships(user_ids, options['users'] * 5)
+        viewer = CustomUser.objects.get(pk=user_ids[0])
+        friends = user_ids[1:options['friends'] + 1]
+        Friendship.objects.bulk_create([
+            Friendship(user_from_id=viewer.pk, user_to_id=friend_id, status='accepted') for friend_id in friends
+        ], ignore_conflicts=True)
+        post_ids = seeder.posts(user_ids, options['posts'])
+        seeder.finish(post_ids)
+        return viewer, friends[0]
@@ -1,9 +1,15 @@
 import os
 
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
+from PawsConnect.renditions import schedule_renditions
+from UserManagement.models import Friendship
+
 
 def validate_image(file):
     valid_extensions = ['jpg', 'jpeg', 'png', 'gif']
@@ -20,27 +26,63 @@ class Post(models.Model):
     user = models.ForeignKey('UserManagement.CustomUser', on_delete=models.CASCADE, related_name='posts')
     content = models.TextField()
     photo = models.ImageField(upload_to='post_photos/', null=True, blank=True, validators=[validate_image])
+    renditions = models.JSONField(default=dict, blank=True, editable=False)  # see PawsConnect.renditions
     visibility = models.CharField(max_length=20, choices=VisibilityChoices.choices, default=VisibilityChoices.PUBLIC)
     tagged_pets = models.ManyToManyField('PetManagement.Pet', related_name='tagged_in_posts', blank=True)
     timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Maintained by the Like/Comment hooks below; repaired by the reconcile_counters command.
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    RENDITION_SOURCE = 'photo'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-id'], name='post_user_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Post by {self.user.username} on {self.timestamp}"
 
 
+@receiver(post_save, sender=Post)
+def render_post_photo(sender, instance, **kwargs):
+    schedule_renditions(instance)
+
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey('UserManagement.CustomUser', on_delete=models.CASCADE, related_name='comments')
     content = models.TextField()
+    tagged_pets = models.ManyToManyField('PetManagement.Pet', related_name='tagged_in_comments', blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='comment_recent_idx'),
+            models.Index(fields=['post', '-timestamp', '-id'], name='comment_post_recent_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.username} on {self.post.id}"
 
+    def save(self, *args, **kwargs):
+        # comment_count tracks active comments, so count creation and every is_active flip.
+        with transaction.atomic():
+            was_active = None
+            if self.pk is not None:
+                was_active = Comment.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'is_active', flat=True).first()
+            super().save(*args, **kwargs)
+            if self.is_active and not was_active:
+                adjust_post_counter(self.post_id, 'comment_count', 1)
+            elif was_active and not self.is_active:
+                adjust_post_counter(self.post_id, 'comment_count', -1)
+
     def deactivate(self):
         self.is_active = False
         self.save()
@@ -58,3 +100,92 @@ class Like(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['post', 'user'], name='unique_like_per_user')
         ]
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='like_recent_idx'),
+            models.Index(fields=['post', '-timestamp', '-id'], name='like_post_recent_idx'),
+        ]
+
+
+def adjust_post_counter(post_id, field, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(**{f'{field}__gte': -delta})
+    posts.update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Like)
+def increment_like_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_post_counter(instance.post_id, 'like_count', 1)
+
+
+@receiver(post_delete, sender=Like)
+def decrement_like_count(sender, instance, **kwargs):
+    adjust_post_counter(instance.post_id, 'like_count', -1)
+
+
+def notify_post_author(post_id, event_type, actor_id, **payload):
+    from PawsConnect.notifications import notify
+    author_id = Post.objects.filter(pk=post_id).values_list('user_id', flat=True).first()
+    notify([author_id], event_type, actor_id=actor_id, post=post_id, **payload)
+
+
+@receiver(post_save, sender=Like)
+def notify_like(sender, instance, created, **kwargs):
+    if created:
+        notify_post_author(instance.post_id, 'post.liked', instance.user_id)
+
+
+@receiver(post_save, sender=Comment)
+def notify_comment(sender, instance, created, **kwargs):
+    if created and instance.is_active:
+        notify_post_author(instance.post_id, 'post.commented', instance.user_id, comment=instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    if instance.is_active:
+        adjust_post_counter(instance.post_id, 'comment_count', -1)
+
+
+class TimelineEntry(models.Model):
+    """A post pushed into a user's home feed when it was written (fan-out-on-write)."""
+    user = models.ForeignKey('UserManagement.CustomUser', related_name='timeline_entries', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='timeline_entries', on_delete=models.CASCADE)
+    # Copied from the post so the feed can be range-scanned on this table's index alone.
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-timestamp', '-post'], name='timeline_user_recent_idx')
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in feed of user {self.user_id}"
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post_on_create(sender, instance, created, **kwargs):
+    if created:
+        from .timeline import fan_out_post
+        transaction.on_commit(lambda: fan_out_post(instance))
+
+
+@receiver(post_save, sender=Friendship)
+def sync_timelines_on_friendship_save(sender, instance, created, **kwargs):
+    from .timeline import backfill_friendship, remove_friendship
+    # Only transitions into or out of 'accepted' change what either side's timeline should hold.
+    previous = getattr(instance, '_previous_status', None)
+    if instance.status == 'accepted' and previous != 'accepted':
+        transaction.on_commit(lambda: backfill_friendship(instance.user_from_id, instance.user_to_id))
+    elif previous == 'accepted' and instance.status != 'accepted':
+        remove_friendship(instance.user_from_id, instance.user_to_id)
+
+
+@receiver(post_delete, sender=Friendship)
+def sync_timelines_on_friendship_delete(sender, instance, **kwargs):
+    from .timeline import remove_friendship
+    remove_friendship(instance.user_from_id, instance.user_to_id)
@@ -1,14 +1,10 @@
 from rest_framework import permissions
 
-from UserManagement.models import Friendship
+from .visibility import can_view_post
 
 
 class IsFriendOrOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        if obj.visibility == 'Public':
-            return True
-        if request.user == obj.user:
-            return True
-        if obj.visibility == 'Friends Only':
-            return Friendship.objects.filter(user_from=request.user, user_to=obj.user, status='accepted').exists()
-        return False
+        # Comments share the audience of the post they are on.
+        post = getattr(obj, 'post', obj)
+        return can_view_post(request, post)
@@ -1,12 +1,13 @@
 # Content/serializers.py
 from rest_framework import serializers
 
+from PawsConnect.serializers import EagerLoadingMixin, FieldSelectionMixin, RenditionsField
 from PetManagement.models import Pet
 from UserManagement.serializers import CustomUserSerializer
 from .models import Post, Comment, Like
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(FieldSelectionMixin, EagerLoadingMixin, serializers.ModelSerializer):
     user = CustomUserSerializer(read_only=True)
     tagged_pets = serializers.PrimaryKeyRelatedField(
         queryset=Pet.objects.all(),
@@ -16,28 +17,40 @@ class PostSerializer(serializers.ModelSerializer):
     visibility = serializers.ChoiceField(choices=Post.VisibilityChoices.choices)
     can_edit = serializers.SerializerMethodField()
     can_delete = serializers.SerializerMethodField()
+    liked_by_me = serializers.SerializerMethodField()
     photo = serializers.ImageField(required=False, allow_null=True)
+    photo_renditions = RenditionsField()
 
     class Meta:
         model = Post
-        fields = ['id', 'user', 'content', 'photo', 'visibility', 'tagged_pets', 'timestamp', 'updated_at', 'is_active',
-                  'can_edit', 'can_delete']
-        read_only_fields = ['user', 'timestamp', 'updated_at']
+        fields = ['id', 'user', 'content', 'photo', 'photo_renditions', 'visibility', 'tagged_pets', 'timestamp', 'updated_at', 'is_active',
+                  'like_count', 'comment_count', 'liked_by_me', 'can_edit', 'can_delete']
+        read_only_fields = ['user', 'timestamp', 'updated_at', 'like_count', 'comment_count']
+    expandable_fields = {'tagged_pets': ('PetManagement.serializers.PetSerializer', {'many': True})}
 
     def get_can_edit(self, obj):
         request = self.context.get('request')
         if obj is None:
             return False
-        return obj.user == request.user
+        return obj.user_id == request.user.id
 
     def get_can_delete(self, obj):
         request = self.context.get('request')
         if obj is None:
             return False
-        return obj.user == request.user
+        return obj.user_id == request.user.id
+
+    def get_liked_by_me(self, obj):
+        # Lists set this for the whole page (Content.likes); single posts fall back to one query.
+        liked = getattr(obj, 'liked_by_me', None)
+        if liked is None:
+            request = self.context.get('request')
+            liked = bool(request and request.user.is_authenticated
+                         and obj.likes.filter(user_id=request.user.id).exists())
+        return liked
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(FieldSelectionMixin, EagerLoadingMixin, serializers.ModelSerializer):
     user = CustomUserSerializer(read_only=True)
     post = serializers.PrimaryKeyRelatedField(queryset=Post.objects.all())
     tagged_pets = serializers.PrimaryKeyRelatedField(
@@ -50,7 +63,14 @@ class CommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Comment
-        fields = ['id', 'post', 'user', 'content', 'tagged_pets', 'timestamp', 'updated_at', 'is_active']
+        fields = ['id', 'post', 'user', 'content', 'tagged_pets', 'timestamp', 'updated_at', 'is_active',
+                  'can_edit', 'can_delete']
+    # get_can_delete reads the post's author
+    extra_select_related = ('post',)
+    expandable_fields = {
+        'post': ('Content.serializers.PostSerializer', {}),
+        'tagged_pets': ('PetManagement.serializers.PetSerializer', {'many': True}),
+    }
 
     def create(self, validated_data):
         tagged_pets = validated_data.pop('tagged_pets', [])
@@ -70,20 +90,22 @@ class CommentSerializer(serializers.ModelSerializer):
     def get_can_edit(self, obj):
         request = self.context.get('request', None)
         if request and hasattr(request, 'user') and request.user:
-            return obj.user == request.user
+            return obj.user_id == request.user.id
         return False
 
     def get_can_delete(self, instance):
         request = self.context.get('request', None)
         if request and hasattr(request, 'user') and request.user:
-            return instance.user == request.user or (hasattr(instance, 'post') and instance.post.user == request.user)
+            return instance.user_id == request.user.id or instance.post.user_id == request.user.id
         return False
 
 
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(FieldSelectionMixin, EagerLoadingMixin, serializers.ModelSerializer):
     user = CustomUserSerializer(read_only=True)
     post = serializers.PrimaryKeyRelatedField(queryset=Post.objects.all())
 
+    expandable_fields = {'post': ('Content.serializers.PostSerializer', {})}
+
     class Meta:
         model = Like
-        fields = ['id', 'post', 'user', 'timestamp', 'updated_at', 'is_active']
+        fields = ['id', 'post', 'user', 'timestamp']
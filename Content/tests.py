@@ -0,0 +1,268 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from PawsConnect.query_budget import QueryBudgetTestMixin
+from PawsConnect.testing import befriend, make_pet, make_post, make_user
+from UserManagement.models import Friendship
+from .likes import like_post
+from .models import Comment, Like, Post, TimelineEntry
+from .timeline import read_feed
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viewer = make_user()
+            self.friend = make_user()
+            self.stranger = make_user()
+            befriend(self.viewer, self.friend)
+            make_pet(self.friend)
+            make_pet(self.stranger)
+        self.client.force_authenticate(self.viewer)
+
+    def add_posts(self, count):
+        """``count`` posts by the friend, half of them friends-only, each tagged, commented and liked."""
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                visibility = Post.VisibilityChoices.FRIENDS_ONLY if i % 2 else Post.VisibilityChoices.PUBLIC
+                post = make_post(self.friend, tagged_pets=[make_pet(self.friend)], visibility=visibility)
+                Comment.objects.create(post=post, user=self.stranger, content='Nice!')
+                Like.objects.create(post=post, user=self.stranger)
+
+    def test_post_list(self):
+        self.assertBudgetWhileGrowing('content:post-list', self.add_posts, data={'user_id': self.friend.pk})
+
+    def test_comment_list(self):
+        self.assertBudgetWhileGrowing('content:comment-list', self.add_posts)
+
+    def test_like_list(self):
+        self.assertBudgetWhileGrowing('content:like-list', self.add_posts)
+
+    def test_feed_list(self):
+        self.assertBudgetWhileGrowing('content:feed-list', self.add_posts)
+
+    def test_post_like(self):
+        # A like changes the post, so each size gets a fresh post with that many likes already on it.
+        counts = []
+        for size in (self.N, 3 * self.N):
+            with self.captureOnCommitCallbacks(execute=True):
+                post = make_post(self.friend)
+                for _ in range(size):
+                    Like.objects.create(post=post, user=make_user())
+            counts.append(len(self.assertQueryBudget('content:post-like', args=[post.pk], method='put')))
+        self.assertEqual(counts[0], counts[1])
+
+
+class LikeTests(APITestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viewer = make_user()
+            self.other = make_user()
+            self.post = make_post(self.other)
+            Like.objects.create(post=self.post, user=self.other)
+        self.client.force_authenticate(self.viewer)
+        self.url = reverse('content:post-like', args=[self.post.pk])
+
+    def assertLikeState(self, response, liked_by_me, like_count):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'liked_by_me': liked_by_me, 'like_count': like_count})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, Like.objects.filter(post=self.post).count())
+
+    def test_put_is_idempotent(self):
+        self.assertLikeState(self.client.put(self.url), True, 2)
+        self.assertLikeState(self.client.put(self.url), True, 2)
+        self.assertEqual(Like.objects.filter(post=self.post, user=self.viewer).count(), 1)
+
+    def test_delete_is_idempotent(self):
+        self.client.put(self.url)
+        self.assertLikeState(self.client.delete(self.url), False, 1)
+        self.assertLikeState(self.client.delete(self.url), False, 1)
+        self.assertFalse(Like.objects.filter(post=self.post, user=self.viewer).exists())
+
+    def test_liked_by_me_comes_from_the_database(self):
+        # DELETE without a like of one's own leaves the other user's like alone and reports the stored state.
+        self.assertLikeState(self.client.delete(self.url), False, 1)
+        Like.objects.create(post=self.post, user=self.viewer)
+        self.assertLikeState(self.client.put(self.url), True, 2)
+
+    def test_failing_receiver_rolls_back_the_like(self):
+        def fail(**kwargs):
+            raise RuntimeError
+
+        post_save.connect(fail, sender=Like)
+        self.addCleanup(post_save.disconnect, fail, sender=Like)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            like_post(self.post.pk, self.viewer.pk)
+        self.assertFalse(Like.objects.filter(post=self.post, user=self.viewer).exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.author = make_user()
+        self.other = make_user()
+        self.post = make_post(self.author)
+
+    def assertCountersMatch(self, like_count, comment_count):
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (like_count, comment_count))
+        self.assertEqual(self.post.like_count, Like.objects.filter(post=self.post).count())
+        self.assertEqual(self.post.comment_count, Comment.objects.filter(post=self.post, is_active=True).count())
+
+    def test_comment_create_deactivate_and_delete(self):
+        first = Comment.objects.create(post=self.post, user=self.other, content='First')
+        second = Comment.objects.create(post=self.post, user=self.author, content='Second')
+        self.assertCountersMatch(0, 2)
+
+        first.deactivate()
+        first.deactivate()  # already inactive, so not counted twice
+        self.assertCountersMatch(0, 1)
+
+        first.delete()  # inactive comments were already taken off the counter
+        self.assertCountersMatch(0, 1)
+        second.delete()
+        self.assertCountersMatch(0, 0)
+
+    def test_reactivated_comment_is_counted_again(self):
+        comment = Comment.objects.create(post=self.post, user=self.other, content='Back again')
+        comment.deactivate()
+        comment.is_active = True
+        comment.save()
+        self.assertCountersMatch(0, 1)
+
+    def test_like_create_and_delete(self):
+        like = Like.objects.create(post=self.post, user=self.other)
+        Like.objects.create(post=self.post, user=self.author)
+        self.assertCountersMatch(2, 0)
+        like.delete()
+        self.assertCountersMatch(1, 0)
+
+
+class VisibilityTests(APITestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author = make_user()
+            self.friend = make_user()
+            self.stranger = make_user()
+            self.friendship = befriend(self.author, self.friend)
+            self.public = make_post(self.author)
+            self.private = make_post(self.author, visibility=Post.VisibilityChoices.FRIENDS_ONLY)
+            self.comment = Comment.objects.create(post=self.private, user=self.author, content='Friends only')
+            self.like = Like.objects.create(post=self.private, user=self.author)
+
+    def ids(self, user, url_name, **data):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse(url_name), data)
+        self.assertEqual(response.status_code, 200)
+        return {item['id'] for item in response.data['results']}
+
+    def detail_status(self, user, url_name, pk):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse(url_name, args=[pk])).status_code
+
+    def test_friends_only_post_is_visible_to_friends_and_the_author(self):
+        for user in (self.friend, self.author):
+            self.assertEqual(self.ids(user, 'content:post-list', user_id=self.author.pk),
+                             {self.public.pk, self.private.pk})
+            self.assertEqual(self.detail_status(user, 'content:post-detail', self.private.pk), 200)
+            self.assertIn(self.comment.pk, self.ids(user, 'content:comment-list'))
+            self.assertIn(self.like.pk, self.ids(user, 'content:like-list'))
+
+    def test_friends_only_post_is_hidden_from_others(self):
+        self.assertEqual(self.ids(self.stranger, 'content:post-list', user_id=self.author.pk), {self.public.pk})
+        self.assertEqual(self.detail_status(self.stranger, 'content:post-detail', self.private.pk), 404)
+        self.assertNotIn(self.comment.pk, self.ids(self.stranger, 'content:comment-list'))
+        self.assertEqual(self.detail_status(self.stranger, 'content:comment-detail', self.comment.pk), 404)
+        self.assertNotIn(self.like.pk, self.ids(self.stranger, 'content:like-list'))
+        self.assertEqual(self.client.put(reverse('content:post-like', args=[self.private.pk])).status_code, 404)
+
+    def test_unfriending_hides_the_post_on_the_next_request(self):
+        self.assertEqual(self.detail_status(self.friend, 'content:post-detail', self.private.pk), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.friendship.delete()
+        self.assertEqual(self.ids(self.friend, 'content:post-list', user_id=self.author.pk), {self.public.pk})
+        self.assertEqual(self.detail_status(self.friend, 'content:post-detail', self.private.pk), 404)
+        self.assertNotIn(self.comment.pk, self.ids(self.friend, 'content:comment-list'))
+
+    def test_deactivated_post_is_hidden_from_everyone(self):
+        Post.objects.filter(pk=self.private.pk).update(is_active=False)
+        for user in (self.author, self.friend):
+            self.assertEqual(self.ids(user, 'content:post-list', user_id=self.author.pk), {self.public.pk})
+            self.assertEqual(self.detail_status(user, 'content:post-detail', self.private.pk), 404)
+            self.assertNotIn(self.comment.pk, self.ids(user, 'content:comment-list'))
+            self.assertNotIn(self.like.pk, self.ids(user, 'content:like-list'))
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author = make_user()
+            self.friend = make_user()
+            self.stranger = make_user()
+            self.friendship = befriend(self.author, self.friend)
+
+    def timeline(self, user):
+        return set(TimelineEntry.objects.filter(user=user).values_list('post_id', flat=True))
+
+    def post(self, user, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_post(user, **fields)
+
+    def set_status(self, friendship, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship.status = status
+            friendship.save()
+
+    def test_new_post_fans_out_to_author_and_accepted_friends(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Friendship.objects.create(user_from=self.stranger, user_to=self.author)  # pending
+        post = self.post(self.author, visibility=Post.VisibilityChoices.FRIENDS_ONLY)
+        self.assertEqual(self.timeline(self.author), {post.pk})
+        self.assertEqual(self.timeline(self.friend), {post.pk})
+        self.assertEqual(self.timeline(self.stranger), set())
+
+    def test_accepting_backfills_both_sides(self):
+        mine, theirs = self.post(self.author), self.post(self.stranger)
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship = Friendship.objects.create(user_from=self.stranger, user_to=self.author)
+        self.assertNotIn(mine.pk, self.timeline(self.stranger))
+
+        self.set_status(friendship, 'accepted')
+        self.assertIn(mine.pk, self.timeline(self.stranger))
+        self.assertIn(theirs.pk, self.timeline(self.author))
+
+    def test_resaving_an_accepted_friendship_does_not_backfill_again(self):
+        post = self.post(self.author)
+        TimelineEntry.objects.filter(user=self.friend).delete()
+        self.set_status(self.friendship, 'accepted')
+        self.assertNotIn(post.pk, self.timeline(self.friend))
+
+    def test_unfriending_removes_the_other_sides_posts(self):
+        mine, theirs = self.post(self.author), self.post(self.friend)
+        self.set_status(self.friendship, 'declined')
+        self.assertEqual(self.timeline(self.author), {mine.pk})
+        self.assertEqual(self.timeline(self.friend), {theirs.pk})
+
+        self.set_status(self.friendship, 'accepted')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.friendship.delete()
+        self.assertEqual(self.timeline(self.friend), {theirs.pk})
+
+    def test_saving_a_pending_friendship_deletes_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            friendship = Friendship.objects.create(user_from=self.stranger, user_to=self.author)
+        post = self.post(self.author)
+        TimelineEntry.objects.create(user=self.stranger, post=post, timestamp=post.timestamp)
+        self.set_status(friendship, 'pending')
+        self.assertIn(post.pk, self.timeline(self.stranger))
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_pull_authors_are_read_on_demand(self):
+        post = self.post(self.author)
+        self.assertEqual(self.timeline(self.friend), set())
+        self.assertEqual([p.pk for p in read_feed(self.friend, limit=10)], [post.pk])
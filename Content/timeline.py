@@ -0,0 +1,136 @@
+"""
+Home feed storage.
+
+Every new post is pushed into the timeline of its author and of the author's accepted friends
+(fan-out-on-write), so reading a feed is a single index range scan on ``TimelineEntry``. Authors with
+more than ``FEED_FANOUT_LIMIT`` friends are not fanned out; their posts are pulled on read instead and
+merged into the page.
+
+Only the author and their accepted friends ever receive an entry, and both ``Public`` and
+``Friends Only`` posts are visible to them, so the feed respects ``Post.visibility`` by construction.
+Inactive posts are filtered out on read.
+"""
+import heapq
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from UserManagement.models import CustomUser, Friendship
+from .models import Post, TimelineEntry
+
+
+def is_pull_author(user_id):
+    return CustomUser.objects.filter(pk=user_id, num_friends__gt=settings.FEED_FANOUT_LIMIT).exists()
+
+
+def pull_author_ids(user):
+    """Friends of ``user`` whose posts are read on demand rather than pushed."""
+    return list(
+        CustomUser.objects.filter(num_friends__gt=settings.FEED_FANOUT_LIMIT).filter(
+            Q(sent_friendships__user_to=user, sent_friendships__status='accepted') |
+            Q(received_friendships__user_from=user, received_friendships__status='accepted')
+        ).values_list('pk', flat=True).distinct()
+    )
+
+
+def _push(posts, user_ids):
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post.pk, timestamp=post.timestamp)
+        for post in posts for user_id in user_ids
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=settings.FEED_FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    if not post.is_active:
+        return
+    recipients = {post.user_id}
+    if not is_pull_author(post.user_id):
+        recipients |= Friendship.objects.friend_ids(post.user_id)
+    _push([post], recipients)
+
+
+def fan_out_post_range(first_id, last_id):
+    """
+    Set-based fan-out for posts created without signals (``bulk_create``), e.g. by the ``create_users``
+    seeder: one ``INSERT ... SELECT`` over the accepted friendships instead of one fan-out per post.
+    """
+    quote = connection.ops.quote_name
+    post, entry = quote(Post._meta.db_table), quote(TimelineEntry._meta.db_table)
+    friendship, user = quote(Friendship._meta.db_table), quote(CustomUser._meta.db_table)
+    sql = f"""
+        INSERT INTO {entry} (user_id, post_id, "timestamp")
+        SELECT edges.reader_id, p.id, p."timestamp"
+        FROM {post} p
+        JOIN (
+            SELECT user_from_id AS author_id, user_to_id AS reader_id FROM {friendship} WHERE status = 'accepted'
+            UNION ALL
+            SELECT user_to_id, user_from_id FROM {friendship} WHERE status = 'accepted'
+        ) edges ON edges.author_id = p.user_id
+        JOIN {user} author ON author.id = p.user_id
+        WHERE p.id BETWEEN %s AND %s AND p.is_active AND author.num_friends <= %s
+        UNION ALL
+        SELECT p.user_id, p.id, p."timestamp" FROM {post} p WHERE p.id BETWEEN %s AND %s AND p.is_active
+        ON CONFLICT DO NOTHING
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [first_id, last_id, settings.FEED_FANOUT_LIMIT, first_id, last_id])
+
+
+def _recent_posts(user_id):
+    return list(
+        Post.objects.filter(user_id=user_id, is_active=True)
+        .only('pk', 'timestamp')
+        .order_by('-timestamp', '-id')[:settings.FEED_BACKFILL_SIZE]
+    )
+
+
+def backfill_friendship(user_a, user_b):
+    """Seeds each side's timeline with the other's recent posts once a friendship is accepted."""
+    for author, reader in ((user_a, user_b), (user_b, user_a)):
+        if not is_pull_author(author):
+            _push(_recent_posts(author), [reader])
+
+
+def remove_friendship(user_a, user_b):
+    TimelineEntry.objects.filter(
+        Q(user_id=user_a, post__user_id=user_b) | Q(user_id=user_b, post__user_id=user_a)
+    ).delete()
+
+
+def _before(queryset, cursor, timestamp_field, id_field):
+    if cursor is None:
+        return queryset
+    timestamp, pk = cursor
+    return queryset.filter(
+        Q(**{f'{timestamp_field}__lt': timestamp}) | Q(**{timestamp_field: timestamp, f'{id_field}__lt': pk})
+    )
+
+
+def read_feed(user, limit, cursor=None):
+    """
+    Returns up to ``limit`` posts for ``user``'s home feed, newest first, starting strictly after
+    ``cursor`` (a ``(timestamp, post_id)`` pair). Both sources are bounded by ``limit``, so a page
+    costs the same no matter how large the timeline is.
+    """
+    entries = _before(TimelineEntry.objects.filter(user=user, post__is_active=True), cursor, 'timestamp', 'post_id')
+    entries = entries.select_related('post__user').order_by('-timestamp', '-post_id')[:limit]
+    pushed = [entry.post for entry in entries]
+
+    pull_ids = pull_author_ids(user)
+    if not pull_ids:
+        return pushed
+
+    pulled = _before(Post.objects.filter(user_id__in=pull_ids, is_active=True), cursor, 'timestamp', 'id')
+    pulled = list(pulled.select_related('user').order_by('-timestamp', '-id')[:limit])
+
+    seen = set()
+    posts = []
+    for post in heapq.merge(pushed, pulled, key=lambda p: (p.timestamp, p.pk), reverse=True):
+        if post.pk not in seen:
+            seen.add(post.pk)
+            posts.append(post)
+        if len(posts) == limit:
+            break
+    return posts
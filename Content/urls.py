@@ -1,12 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import PostViewSet, CommentViewSet, LikeViewSet
+from .views import PostViewSet, CommentViewSet, LikeViewSet, FeedViewSet
 
 router = DefaultRouter()
 router.register('posts', PostViewSet, basename='post')
 router.register('comments', CommentViewSet, basename='comment')
 router.register('likes', LikeViewSet, basename='like')
+router.register('feed', FeedViewSet, basename='feed')
 
 app_name = 'content'
 
@@ -1,16 +1,27 @@
 # Content/views.py
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import prefetch_related_objects
 from rest_framework import status, serializers
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from Content.likes import like_post, mark_liked_by_me, unlike_post, with_liked_by_me
 from Content.models import Post, Comment, Like
 from Content.permissions import IsFriendOrOwner
 from Content.serializers import PostSerializer, CommentSerializer, LikeSerializer
+from Content.timeline import read_feed
+from Content.visibility import friend_ids_for, visible_posts, visible_comments, visible_likes
+from PawsConnect.asynchronous import AsyncListModelMixin, AsyncViewSetMixin
+from PawsConnect.pagination import encode_cursor, decode_cursor
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(AsyncViewSetMixin, AsyncListModelMixin, viewsets.ModelViewSet):
     serializer_class = PostSerializer
+    cursor_ordering = ('-timestamp', '-id')
     permission_classes = [IsAuthenticated, IsFriendOrOwner]
 
     def create(self, request, *args, **kwargs):
@@ -24,21 +35,50 @@ class PostViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    async def list(self, request, *args, **kwargs):
+        # get_queryset filters on the viewer's friend ids, which may have to come from the database.
+        await sync_to_async(friend_ids_for)(request)
+        return await super().list(request, *args, **kwargs)
+
     def get_queryset(self):
-        user_id = self.request.query_params.get('user_id')
-        if user_id:
-            return Post.objects.filter(user_id=user_id).order_by('-timestamp')
-        return Post.objects.none()
+        queryset = visible_posts(Post.objects.all(), self.request)
+        if self.action == 'list':
+            user_id = self.request.query_params.get('user_id')
+            if not user_id:
+                return Post.objects.none()
+            queryset = queryset.filter(user_id=user_id)
+        queryset = with_liked_by_me(queryset, self.request.user)
+        return self.get_serializer_class().setup_eager_loading(queryset, request=self.request)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(methods=['PUT', 'DELETE'], detail=True, url_path='like')
+    def like(self, request, pk=None):
+        """PUT likes the post and DELETE unlikes it; repeating either is a no-op."""
+        post = get_object_or_404(visible_posts(Post.objects.only('id', 'user_id', 'visibility', 'is_active'),
+                                               request), pk=pk)
+        self.check_object_permissions(request, post)
+        if request.method == 'PUT':
+            like_post(post.pk, request.user.pk)
+        else:
+            unlike_post(post.pk, request.user.pk)
+        state = (with_liked_by_me(Post.objects.filter(pk=post.pk), request.user)
+                 .values('liked_by_me', 'like_count').first())
+        return Response(state)
+
 
 class CommentViewSet(viewsets.ModelViewSet):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+    cursor_ordering = ('-timestamp', '-id')
     permission_classes = [IsAuthenticated, IsFriendOrOwner]
 
+    def get_queryset(self):
+        queryset = visible_comments(super().get_queryset(), self.request)
+        return self.get_serializer_class().setup_eager_loading(queryset, request=self.request)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -46,7 +86,37 @@ class CommentViewSet(viewsets.ModelViewSet):
 class LikeViewSet(viewsets.ModelViewSet):
     queryset = Like.objects.all()
     serializer_class = LikeSerializer
+    cursor_ordering = ('-timestamp', '-id')
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = visible_likes(super().get_queryset(), self.request)
+        return self.get_serializer_class().setup_eager_loading(queryset, request=self.request)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+
+class FeedViewSet(viewsets.GenericViewSet):
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        try:
+            limit = int(request.query_params.get('limit', settings.FEED_PAGE_SIZE))
+            limit = max(1, min(limit, settings.FEED_MAX_PAGE_SIZE))
+            cursor = request.query_params.get('cursor')
+            cursor = decode_cursor(cursor, 2) if cursor else None
+        except ValueError:
+            return Response({'error': 'Invalid limit or cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        posts = read_feed(request.user, limit + 1, cursor)
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor([posts[-1].timestamp, posts[-1].pk])
+        prefetch_related_objects(posts, *self.get_serializer_class().prefetch_lookups(request=request))
+        mark_liked_by_me(posts, request.user)
+
+        serializer = self.get_serializer(posts, many=True)
+        return Response({'next': next_cursor, 'results': serializer.data})
@@ -0,0 +1,57 @@
+"""
+Audience filtering for posts and everything hanging off them.
+
+The requester's accepted-friend ids are read from the ``Friendship`` table on the primary (never from the
+cached adjacency index, which may lag behind an unfriend) and memoized on the request, so a request runs
+at most one friend query no matter how many objects it filters or checks. Visibility is then a single SQL predicate:
+public, or written by the requester, or friends-only and written by a friend.
+"""
+from django.db.models import Q
+
+from UserManagement.friends import load_friend_ids
+from .models import Post
+
+
+def friend_ids_for(request):
+    user = request.user
+    if not user.is_authenticated:
+        return frozenset()
+    friend_ids = getattr(request, '_friend_ids', None)
+    if friend_ids is None:
+        friend_ids = request._friend_ids = frozenset(load_friend_ids(user.pk))
+    return friend_ids
+
+
+def visible_posts_q(request, prefix=''):
+    """``Q`` matching active posts ``request.user`` may see; ``prefix`` reaches a post through a relation."""
+    audience = Q(**{f'{prefix}visibility': Post.VisibilityChoices.PUBLIC})
+    user = request.user
+    if user.is_authenticated:
+        audience |= Q(**{f'{prefix}user_id': user.pk})
+        friend_ids = friend_ids_for(request)
+        if friend_ids:
+            audience |= Q(**{f'{prefix}visibility': Post.VisibilityChoices.FRIENDS_ONLY,
+                             f'{prefix}user_id__in': friend_ids})
+    return audience & Q(**{f'{prefix}is_active': True})
+
+
+def visible_posts(queryset, request):
+    return queryset.filter(visible_posts_q(request))
+
+
+def visible_comments(queryset, request):
+    return queryset.filter(visible_posts_q(request, prefix='post__'), is_active=True)
+
+
+def visible_likes(queryset, request):
+    return queryset.filter(visible_posts_q(request, prefix='post__'))
+
+
+def can_view_post(request, post):
+    if not post.is_active:
+        return False
+    if post.user_id == request.user.id:
+        return True
+    if post.visibility == Post.VisibilityChoices.PUBLIC:
+        return True
+    return post.visibility == Post.VisibilityChoices.FRIENDS_ONLY and post.user_id in friend_ids_for(request)
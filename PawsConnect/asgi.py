@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "PawsConnect.settings")
 
-application = get_asgi_application()
+# Loads the app registry, which the imports below need.
+django_application = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from django.urls import path  # noqa: E402
+
+from PawsConnect.notifications import JWTAuthMiddleware, NotificationConsumer  # noqa: E402
+
+# Sockets authenticate with a token rather than cookies, so, as with CORS_ALLOW_ALL_ORIGINS, any origin may connect.
+application = ProtocolTypeRouter({
+    'http': django_application,
+    'websocket': JWTAuthMiddleware(URLRouter([
+        path('ws/notifications/', NotificationConsumer.as_asgi()),
+    ])),
+})
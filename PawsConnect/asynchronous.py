@@ -0,0 +1,90 @@
+"""
+Coroutine actions on DRF viewsets.
+
+DRF only dispatches synchronously, so under ASGI a request to any viewset holds a worker thread until its
+response is built. ``AsyncViewSetMixin`` lets individual actions be ``async def``: a route whose actions
+include a coroutine gets an async view, and its dispatch awaits the handler on the event loop. Only
+authentication, permissions and throttling (which may query the database) and any synchronous handlers
+sharing the route run through ``sync_to_async``. Routes without async actions are left untouched.
+
+Async actions load data with the async ORM (``aget``, ``async for``), which includes ``prefetch_related``.
+Serialization then runs on the event loop, so everything a serializer reads must be loaded up front, which
+``EagerLoadingMixin`` already guarantees for the API serializers. A lazy query that slips through fails
+loudly with ``SynchronousOnlyOperation`` instead of blocking the loop.
+
+Under WSGI, Django runs async views through ``async_to_sync``, so the same routes keep working there.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework.response import Response
+
+
+class AsyncViewSetMixin:
+    async_dispatch = False  # set per route by as_view()
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        is_async = any(iscoroutinefunction(getattr(cls, action, None)) for action in (actions or {}).values())
+        view = super().as_view(actions, async_dispatch=is_async, **initkwargs)
+        return markcoroutinefunction(view) if is_async else view
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.async_dispatch:
+            return self.adispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """``APIView.dispatch`` with the handler awaited."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    async def aget_object(self):
+        """``GenericAPIView.get_object`` on the async ORM."""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        # Object permissions are free to follow relations.
+        await sync_to_async(self.check_object_permissions)(self.request, obj)
+        return obj
+
+
+class AsyncListModelMixin:
+    async def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer([obj async for obj in queryset], many=True).data)
+
+
+class AsyncRetrieveModelMixin:
+    async def retrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await self.aget_object()).data)
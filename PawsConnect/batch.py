@@ -0,0 +1,173 @@
+"""
+``POST /api/batch/``: several API calls in one round trip.
+
+The body looks like::
+
+    {"parallel": true,
+     "requests": [{"id": "profile", "method": "GET", "path": "/user/api/users/5/"},
+                  {"id": "like", "method": "PUT", "path": "/content/api/posts/9/like/"},
+                  {"method": "POST", "path": "/content/api/comments/", "body": {"post": 9, "content": "Hi"}}]}
+
+Each sub-request is resolved against the normal URLconf and dispatched to its view in-process. The
+batch's already authenticated user is handed to every sub-request, so the JWT is checked once. Items run
+in order on the request's own database connection. With ``"parallel": true``, consecutive safe (GET/HEAD)
+items run concurrently on up to ``BATCH_MAX_WORKERS`` threads, each with its own connection; a write is
+always a barrier. The response lists ``{"id", "status", "headers", "body"}`` per item, in request order.
+DRF responses contribute their data as-is, so every payload is rendered once, by the batch response.
+
+Sub-requests skip the middleware stack. What the batch's own middleware set up still covers them,
+because each one runs in a copy of the batch request's context (worker threads included): their queries
+count toward the batch in ``/metrics``, and they follow its database routing. The batch is a POST, so
+they all use the primary database. Each sub-request gets its own copy of the user object. Streaming
+responses (files) report their status and headers only.
+"""
+import contextvars
+import copy
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD')
+ALLOWED_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE')
+FORWARDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Location', 'Cache-Control')
+
+
+class BatchItemError(ValueError):
+    pass
+
+
+def _parse_item(index, item):
+    if not isinstance(item, dict):
+        raise BatchItemError(f'Request {index} must be an object.')
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if method not in ALLOWED_METHODS:
+        raise BatchItemError(f'Request {index} has an unsupported method.')
+    if not isinstance(path, str) or not path.startswith('/'):
+        raise BatchItemError(f"Request {index} needs an absolute 'path'.")
+    return {'id': item.get('id', index), 'method': method, 'path': path, 'body': item.get('body')}
+
+
+class BatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({'error': "'requests' must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BATCH_MAX_REQUESTS:
+            return Response({'error': f'At most {settings.BATCH_MAX_REQUESTS} requests per batch.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            items = [_parse_item(index, item) for index, item in enumerate(items)]
+        except BatchItemError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        parallel = bool(request.data.get('parallel')) and settings.BATCH_MAX_WORKERS > 1
+        results = [None] * len(items)
+        reads = []  # indexes of the current run of consecutive safe items
+
+        def flush(pool):
+            if pool and len(reads) > 1:
+                # A context can only be entered by one thread at a time, so every item gets its own copy.
+                futures = [pool.submit(contextvars.copy_context().run, self.dispatch_item_threaded, request,
+                                       items[index]) for index in reads]
+                for index, future in zip(reads, futures):
+                    results[index] = future.result()
+            else:
+                for index in reads:
+                    results[index] = self.dispatch_item(request, items[index])
+            reads.clear()
+
+        with ThreadPoolExecutor(max_workers=settings.BATCH_MAX_WORKERS) if parallel else nullcontext() as pool:
+            for index, item in enumerate(items):
+                if item['method'] in SAFE_METHODS:
+                    reads.append(index)
+                    continue
+                flush(pool)
+                results[index] = self.dispatch_item(request, item)
+            flush(pool)
+        return Response(results)
+
+    def dispatch_item_threaded(self, request, item):
+        try:
+            return self.dispatch_item(request, item)
+        finally:
+            connections.close_all()  # the worker thread's own connections
+
+    def dispatch_item(self, request, item):
+        url = urlsplit(item['path'])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return self.result(item, status.HTTP_404_NOT_FOUND, body={'detail': 'Not found.'})
+        if getattr(match.func, 'view_class', None) is type(self):
+            return self.result(item, status.HTTP_400_BAD_REQUEST, body={'detail': 'Batches cannot be nested.'})
+
+        # Async views (PawsConnect.asynchronous) run to completion on this thread, like under WSGI.
+        view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+        try:
+            response = view(self.build_request(request, item, url), *match.args, **match.kwargs)
+        except Http404:
+            return self.result(item, status.HTTP_404_NOT_FOUND, body={'detail': 'Not found.'})
+        except PermissionDenied:
+            return self.result(item, status.HTTP_403_FORBIDDEN, body={'detail': 'Permission denied.'})
+        except Exception:
+            logger.exception('Batch item %s %s failed', item['method'], item['path'])
+            return self.result(item, status.HTTP_500_INTERNAL_SERVER_ERROR, body={'detail': 'Server error.'})
+
+        if isinstance(response, Response):
+            body = response.data
+        elif response.streaming:
+            body = None
+        elif response.get('Content-Type', '').startswith('application/json'):
+            body = json.loads(response.content or b'null')
+        else:
+            body = response.content.decode(response.charset, errors='replace')
+        headers = {name: response[name] for name in FORWARDED_HEADERS if response.has_header(name)}
+        if response.streaming:
+            response.close()
+        return self.result(item, response.status_code, headers, body)
+
+    @staticmethod
+    def result(item, status_code, headers=None, body=None):
+        return {'id': item['id'], 'status': status_code, 'headers': headers or {}, 'body': body}
+
+    @staticmethod
+    def build_request(request, item, url):
+        content = b'' if item['body'] is None else json.dumps(item['body']).encode()
+        environ = {key: value for key, value in request.META.items() if isinstance(key, str)}
+        environ.update({
+            'REQUEST_METHOD': item['method'],
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(content)),
+            'wsgi.input': io.BytesIO(content),
+            'wsgi.url_scheme': request.scheme,
+        })
+        sub_request = WSGIRequest(environ)
+        # Authenticated once for the whole batch: DRF views take these instead of re-running authentication.
+        # A copy each, so nothing a view sets on the user leaks into items running beside it.
+        user = copy.copy(request.user)
+        sub_request._force_auth_user = user
+        sub_request._force_auth_token = request.auth
+        sub_request.user = user
+        return sub_request
@@ -0,0 +1,42 @@
+"""Small timing helpers shared by the ``benchmark_*`` management commands."""
+import json
+import statistics
+import time
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples, elapsed=None):
+    """Latency summary in milliseconds for a list of per-call durations in seconds."""
+    total = elapsed if elapsed is not None else sum(samples)
+    return {
+        'calls': len(samples),
+        'throughput_per_s': round(len(samples) / total, 2) if total else 0.0,
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def time_calls(func, args_list):
+    """Calls ``func(*args)`` for each entry of ``args_list`` and summarizes the latencies."""
+    samples = []
+    started = time.perf_counter()
+    for args in args_list:
+        call_started = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - call_started)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def write_report(path, report):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,29 @@
+"""
+Checks for caches that must be shared by every server process.
+
+Some caches hold state that other processes have to see (token revocations, invalidation counters,
+read-after-write markers). A locmem or dummy backend silently keeps that state to the process that wrote
+it, which is fine for ``runserver`` but wrong as soon as there are several workers. Outside ``DEBUG``,
+``require_shared_cache`` refuses to start with one.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_process_local(alias):
+    return isinstance(caches[alias], PROCESS_LOCAL_BACKENDS)
+
+
+def require_shared_cache(setting, purpose):
+    """Raises ``ImproperlyConfigured`` outside ``DEBUG`` when the cache alias in ``setting`` is process-local."""
+    alias = getattr(settings, setting)
+    if not settings.DEBUG and is_process_local(alias):
+        raise ImproperlyConfigured(
+            f"{setting} ('{alias}') holds {purpose}, which every server process must see. "
+            f"Point it at a shared cache such as Redis or Memcached."
+        )
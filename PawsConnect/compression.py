@@ -0,0 +1,131 @@
+"""
+Response compression negotiated from ``Accept-Encoding``: brotli when the ``brotli`` package is
+installed and the client accepts it, gzip otherwise.
+
+Only responses whose media type is in ``COMPRESSION_CONTENT_TYPES`` are touched; images and other
+already-compressed media pass through. Buffered responses shorter than ``COMPRESSION_MIN_SIZE`` bytes are
+left alone, as are partial (206) responses and anything that already has a ``Content-Encoding``. Streaming
+responses are compressed chunk by chunk, flushing after each chunk so the client still receives data as it
+is produced.
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+def _accepted_encodings(header):
+    """``'gzip;q=0.5, br'`` -> ``{'gzip': 0.5, 'br': 1.0}``, leaving out codings with ``q=0``."""
+    accepted = {}
+    for part in header.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = _accepted_encodings(header)
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best = max(candidates, key=lambda coding: accepted.get(coding, accepted.get('*', 0)))
+    return best if accepted.get(best, accepted.get('*', 0)) > 0 else None
+
+
+def compressible(content_type):
+    media_type = content_type.split(';')[0].strip().lower()
+    return any(media_type.startswith(allowed) if allowed.endswith('/') else media_type == allowed
+               for allowed in settings.COMPRESSION_CONTENT_TYPES)
+
+
+class _Compressor:
+    """One streaming compressor with a common ``compress``/``flush``/``finish`` interface."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits=31: a deflate stream with gzip header and trailer
+            self._zlib = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._brotli.process(data) if self.encoding == 'br' else self._zlib.compress(data)
+
+    def flush(self):
+        return self._brotli.flush() if self.encoding == 'br' else self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._brotli.finish() if self.encoding == 'br' else self._zlib.flush()
+
+
+def compress(data, encoding):
+    compressor = _Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(chunks, encoding):
+    compressor = _Compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def compress_stream_async(chunks, encoding):
+    compressor = _Compressor(encoding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+        if not compressible(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        # The representation now depends on Accept-Encoding, whether or not this client gets it compressed.
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_stream_async(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag promises byte-identical bodies, which the compressed body no longer is.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,219 @@
+"""
+Read replicas for the read-only API requests.
+
+``DATABASES`` may list replicas next to ``default`` (the primary), see ``DATABASE_REPLICA_HOSTS``.
+``ReplicaRoutingMiddleware`` marks GET, HEAD and OPTIONS requests as eligible, and ``PrimaryReplicaRouter``
+sends their reads to a random healthy replica. Everything else goes to the primary: writes, every query
+of other requests, reads inside a transaction on the primary, reads after the request wrote something,
+and anything outside a request (management commands, WebSocket consumers, background threads).
+
+Health: each process checks a replica at most every ``REPLICA_HEALTH_CHECK_INTERVAL`` seconds, the first
+time it wants to use it after that. A replica that cannot be reached, or that replays more than
+``REPLICA_MAX_LAG`` seconds behind the primary, is skipped until a later check passes. Reads fall back to
+the primary when no replica is healthy.
+
+Sticky reads: when a request writes, its user reads from the primary for the next
+``REPLICA_STICKY_SECONDS``, so nobody reads a replica that has not caught up with their own write yet. The
+marker lives in the ``REPLICA_STICKY_CACHE`` alias, which every process must see, because the next request
+may land on another worker. With replicas configured, the app refuses to start on a process-local cache
+outside ``DEBUG``.
+
+``pin_to_primary()`` sends every query in its block to the primary, for code that reads what it is about
+to write (geocoding, pet transfers) or that must not cache what a lagging replica returns.
+"""
+import contextvars
+import random
+import threading
+import time
+from contextlib import ContextDecorator
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+STICKY_KEY = 'db:primary:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Replay lag in seconds; 0 when everything received has been replayed, however old the last transaction is.
+LAG_SQL = ('SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+           'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END')
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+_pinned = contextvars.ContextVar('db_routing_pinned', default=False)
+
+
+class RoutingState:
+    """Routing of the current request."""
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.wrote = False
+
+
+class pin_to_primary(ContextDecorator):
+    """Sends every query in the block (or decorated function) to the primary."""
+
+    def _recreate_cm(self):
+        # A fresh instance per call, so a decorated function can run in several threads at once.
+        return type(self)()
+
+    def __enter__(self):
+        self.token = _pinned.set(True)
+
+    def __exit__(self, *exc_info):
+        _pinned.reset(self.token)
+
+
+class ReplicaHealth:
+    def __init__(self):
+        self.checked = {}  # alias -> (monotonic time of the check, healthy)
+        self.lock = threading.Lock()
+
+    def is_healthy(self, alias):
+        checked_at, healthy = self.checked.get(alias, (None, False))
+        if checked_at is not None and time.monotonic() - checked_at < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+            return healthy
+        # One thread checks; the others go on with the last result (unknown counts as unhealthy).
+        if not self.lock.acquire(blocking=False):
+            return healthy
+        try:
+            healthy = self.check(alias)
+            self.checked[alias] = (time.monotonic(), healthy)
+        finally:
+            self.lock.release()
+        return healthy
+
+    @staticmethod
+    def check(alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            connection.close()
+            return False
+        return float(lag) <= settings.REPLICA_MAX_LAG
+
+    def stats(self):
+        return {alias: healthy for alias, (_, healthy) in self.checked.items()}
+
+
+_health = ReplicaHealth()
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def replica_health():
+    """Result of the last health check of every replica this process has used."""
+    return _health.stats()
+
+
+def _sticky_cache():
+    return caches[settings.REPLICA_STICKY_CACHE]
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (state is None or not state.use_replica or state.wrote or _pinned.get()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        healthy = [alias for alias in replica_aliases() if _health.is_healthy(alias)]
+        return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas are copies of the primary, so every object lives in the same database.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _token_user_id(request):
+    """
+    The user id claim of the request's bearer token, decoded without verifying it. It only decides where
+    the request reads from, so there is no need to check the token twice; the view authenticates it.
+    """
+    import jwt
+    from rest_framework_simplejwt.authentication import AUTH_HEADER_TYPE_BYTES
+    from rest_framework_simplejwt.settings import api_settings
+
+    parts = request.META.get(api_settings.AUTH_HEADER_NAME, '').split()
+    if len(parts) != 2 or parts[0].encode() not in AUTH_HEADER_TYPE_BYTES:
+        return None
+    try:
+        claims = jwt.decode(parts[1], options={'verify_signature': False})
+    except jwt.InvalidTokenError:
+        return None
+    return claims.get(api_settings.USER_ID_CLAIM)
+
+
+class ReplicaRoutingMiddleware:
+    """Sets up routing for the request. Goes after ``AuthenticationMiddleware``."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        user_id = None
+        if self.eligible(request):
+            user_id = _token_user_id(request)
+            if user_id is None and hasattr(request, 'session'):
+                user_id = request.session.get(SESSION_KEY)
+        state, token = self.start(request, user_id)
+        try:
+            return self.get_response(request)
+        finally:
+            _state.reset(token)
+            self.finish(request, state)
+
+    async def __acall__(self, request):
+        user_id = None
+        if self.eligible(request):
+            user_id = _token_user_id(request)
+            if user_id is None and hasattr(request, 'session'):
+                user_id = await sync_to_async(request.session.get)(SESSION_KEY)
+        state, token = self.start(request, user_id)
+        try:
+            return await self.get_response(request)
+        finally:
+            _state.reset(token)
+            self.finish(request, state)
+
+    @staticmethod
+    def eligible(request):
+        return request.method in SAFE_METHODS and bool(replica_aliases())
+
+    def start(self, request, user_id):
+        use_replica = self.eligible(request)
+        if use_replica and user_id is not None and _sticky_cache().get(STICKY_KEY.format(user_id)):
+            use_replica = False
+        state = RoutingState(use_replica)
+        return state, _state.set(state)
+
+    @staticmethod
+    def finish(request, state):
+        if not state.wrote:
+            return
+        # The authenticated user, never the unverified token claim; DRF sets it on the Django request too.
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            _sticky_cache().set(STICKY_KEY.format(user.pk), True, settings.REPLICA_STICKY_SECONDS)
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from Content.likes import mark_liked_by_me
+from Content.models import Post
+from Content.serializers import PostSerializer
+from PawsConnect.benchmarking import time_calls, write_report
+from PawsConnect.compression import brotli, compress
+from PawsConnect.renderers import ORJSONRenderer
+from UserManagement.models import CustomUser
+from UserManagement.serializers import CustomUserSerializer
+from UserManagement.seeding import Seeder
+
+SIZES = (10, 100, 1000)
+RENDERERS = {'json': JSONRenderer(), 'orjson': ORJSONRenderer()}
+
+
+class Command(BaseCommand):
+    help = ('Measures serializer and renderer throughput and the raw/gzip/brotli size of post and user lists '
+            'of 10, 100 and 1000 items')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed calls per measurement')
+        parser.add_argument('--output', help='Write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        report = {}
+        with transaction.atomic():
+            viewer = self.generate(max(SIZES))
+            request = Request(RequestFactory(HTTP_HOST='localhost').get('/'))
+            request.user = viewer
+            context = {'request': request}
+
+            lists = {
+                'posts': (PostSerializer, lambda n: mark_liked_by_me(
+                    list(PostSerializer.setup_eager_loading(Post.objects.order_by('-pk'))[:n]), viewer)),
+                'users': (CustomUserSerializer, lambda n: list(
+                    CustomUserSerializer.setup_eager_loading(CustomUser.objects.order_by('pk'))[:n])),
+            }
+            for name, (serializer_class, fetch) in lists.items():
+                for size in SIZES:
+                    instances = fetch(size)
+                    report[f'{name}_{size}'] = self.measure(serializer_class, instances, context, options['repeat'])
+            transaction.set_rollback(True)
+
+        for name, stats in report.items():
+            self.stdout.write(
+                f"{name:<11} serialize {stats['serialize']['mean_ms']:>9.2f} ms  "
+                f"json {stats['render_json']['mean_ms']:>8.2f} ms  orjson {stats['render_orjson']['mean_ms']:>8.2f} ms  "
+                f"{stats['bytes']:>9} B  gzip {stats['bytes_gzip']:>8} B  brotli {stats.get('bytes_br', '-'):>8} B"
+            )
+        if options['output']:
+            write_report(options['output'], report)
+
+    @staticmethod
+    def measure(serializer_class, instances, context, repeat):
+        stats = {'items': len(instances)}
+        stats['serialize'] = time_calls(lambda: serializer_class(instances, many=True, context=context).data,
+                                        [()] * repeat)
+        data = serializer_class(instances, many=True, context=context).data
+        for label, renderer in RENDERERS.items():
+            stats[f'render_{label}'] = time_calls(renderer.render, [(data,)] * repeat)
+        body = RENDERERS['orjson'].render(data)
+        stats['bytes'] = len(body)
+
+        encodings = {'gzip': 'gzip'} if brotli is None else {'gzip': 'gzip', 'br': 'br'}
+        for label, encoding in encodings.items():
+            stats[f'compress_{label}'] = time_calls(compress, [(body, encoding)] * repeat)
+            stats[f'bytes_{label}'] = len(compress(body, encoding))
+        return stats
+
+    def generate(self, count):
+        self.stdout.write('Generating data...')
+        seeder = Seeder(seed=1)
+        user_ids = seeder.users(count, geocode=False)
+        seeder.pets(user_ids, per_user=1.5)
+        seeder.friendships(user_ids, count * 5)
+        post_ids = seeder.posts(user_ids, count)
+        seeder.finish(post_ids)
+        return CustomUser.objects.get(pk=user_ids[0])
@@ -0,0 +1,173 @@
+"""
+Closed-loop HTTP load test of the async read endpoints against a running server.
+
+Start the same code once under each entry point, e.g.::
+
+    gunicorn PawsConnect.wsgi --workers 4 --threads 32
+    uvicorn PawsConnect.asgi:application --workers 4
+
+and run ``manage.py load_test --label wsgi`` / ``--label asgi`` against it with the same ``--output`` file;
+each run is stored under its label, so the file ends up holding both for comparison. Every connection is a
+keep-alive socket that sends its next request as soon as the previous response has been read, cycling
+through the scenarios. The client is a single event loop; raise ``ulimit -n`` above ``--connections``.
+"""
+import asyncio
+import json
+import os
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from PawsConnect.benchmarking import summarize
+from PetManagement.models import Pet
+from UserManagement.models import CustomUser
+
+
+async def read_response(reader):
+    """Reads one HTTP/1.1 response; returns ``(status, keep_alive)``."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by the server.')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)  # the chunk and its CRLF; the last chunk is just the CRLF
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+class Command(BaseCommand):
+    help = 'Drives the async read endpoints of a running server with many concurrent keep-alive connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--connections', type=int, default=500)
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to measure')
+        parser.add_argument('--warmup', type=float, default=5, help='Seconds of load before measuring')
+        parser.add_argument('--user', help='Username to authenticate as (default: a user who owns pets)')
+        parser.add_argument('--query', default='ja', help='User search text')
+        parser.add_argument('--label', default='run', help='Key of this run in the --output file')
+        parser.add_argument('--output', help='Merge the results into this JSON file')
+
+    def handle(self, *args, **options):
+        base = urlsplit(options['base_url'])
+        if base.scheme != 'http':
+            raise CommandError('Only plain http:// servers are supported.')
+        user = self.get_user(options['user'])
+        self.token = str(AccessToken.for_user(user))
+        self.host = base.netloc
+        self.address = (base.hostname, base.port or 80)
+        self.scenarios = self.build_scenarios(user, options['query'])
+
+        result = asyncio.run(self.run(options['connections'], options['warmup'], options['duration']))
+        result.update(base_url=options['base_url'], connections=options['connections'])
+
+        self.stdout.write(f"{options['label']}: {result['requests']} requests, {result['errors']} errors, "
+                          f"{result['throughput_per_s']} req/s")
+        for name, stats in result['scenarios'].items():
+            self.stdout.write(f"  {name:<16} p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms  "
+                              f"p99 {stats['p99_ms']:>8.2f} ms  statuses {stats['statuses']}")
+        if options['output']:
+            report = {}
+            if os.path.exists(options['output']):
+                with open(options['output']) as f:
+                    report = json.load(f)
+            report[options['label']] = result
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
+
+    @staticmethod
+    def get_user(username):
+        if username:
+            try:
+                return CustomUser.objects.get(username=username)
+            except CustomUser.DoesNotExist:
+                raise CommandError(f'No user named {username!r}.')
+        user = CustomUser.objects.filter(is_active=True, pet__isnull=False).order_by('pk').first()
+        if user is None:
+            raise CommandError('No user owns a pet; seed data with create_users first.')
+        return user
+
+    @staticmethod
+    def build_scenarios(user, query):
+        pet_id = Pet.objects.filter(owner=user).values_list('pk', flat=True).first()
+        return {
+            'user_search': f"{reverse('UserManagement:user-search')}?{urlencode({'query': query})}",
+            'posts_by_user': f"{reverse('content:post-list')}?{urlencode({'user_id': user.pk})}",
+            'pet_list': reverse('PetManagement:pet-list'),
+            'pet_detail': reverse('PetManagement:pet-detail', args=[pet_id]),
+            'friendship_list': reverse('UserManagement:friendship-list'),
+        }
+
+    async def run(self, connections, warmup, duration):
+        samples = {name: [] for name in self.scenarios}
+        statuses = {name: {} for name in self.scenarios}
+        errors = 0
+        started = time.perf_counter()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+
+        async def connection(offset):
+            nonlocal errors
+            names = list(self.scenarios)
+            reader = writer = None
+            i = offset
+            while time.perf_counter() < stop_at:
+                name = names[i % len(names)]
+                i += 1
+                request = (f'GET {self.scenarios[name]} HTTP/1.1\r\nHost: {self.host}\r\n'
+                           f'Authorization: Bearer {self.token}\r\nConnection: keep-alive\r\n\r\n').encode()
+                sent = time.perf_counter()
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(*self.address)
+                    writer.write(request)
+                    await writer.drain()
+                    status, keep_alive = await read_response(reader)
+                except (OSError, ConnectionError, ValueError, IndexError, asyncio.IncompleteReadError):
+                    if sent >= measure_from:
+                        errors += 1
+                    if writer is not None:
+                        writer.close()
+                    reader = writer = None
+                    continue
+                if sent >= measure_from:
+                    samples[name].append(time.perf_counter() - sent)
+                    statuses[name][status] = statuses[name].get(status, 0) + 1
+                if not keep_alive:
+                    writer.close()
+                    reader = writer = None
+            if writer is not None:
+                writer.close()
+
+        await asyncio.gather(*(connection(offset) for offset in range(connections)))
+        elapsed = time.perf_counter() - measure_from
+        scenarios = {name: {**summarize(samples[name], elapsed), 'statuses': statuses[name]}
+                     for name in self.scenarios}
+        requests = sum(len(values) for values in samples.values())
+        return {
+            'requests': requests,
+            'errors': errors,
+            'throughput_per_s': round(requests / elapsed, 2) if elapsed else 0.0,
+            'duration_s': round(elapsed, 2),
+            'scenarios': scenarios,
+        }
@@ -0,0 +1,163 @@
+"""
+Serving stored media (uploads and renditions) efficiently.
+
+Files are streamed with ``FileResponse``, so a WSGI server with ``wsgi.file_wrapper`` can ``sendfile`` them
+without copying through Python. In ``MEDIA_SERVE_MODE = 'accel'`` only the first bytes are read (to
+sniff the type): the response carries ``X-Accel-Redirect`` to an ``internal`` nginx location that maps ``MEDIA_ACCEL_PREFIX`` onto
+``MEDIA_ROOT``. nginx then serves the bytes and handles ``Range`` itself.
+
+Every response has a strong ``ETag`` (size and mtime) and ``Last-Modified``, so conditional requests get a
+304 and ``If-Match`` mismatches get a 412. Single byte ranges are honoured. The content type is read
+from the file's magic bytes instead of trusted from its name. A URL whose name carries a content hash (as
+rendition file names do), or that passes the current ETag as ``?v=``, is cached as immutable for a year.
+Anything else must be revalidated after ``MEDIA_MAX_AGE`` seconds.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{16}-[^/]+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+]
+
+
+def sniff_content_type(head, name=''):
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+class RangeFile:
+    """Reads at most ``length`` bytes from ``file``'s current position."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _open(storage, name):
+    """Returns ``(file, size, mtime)``; local files are opened directly so they stay ``sendfile``-able."""
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        file = storage.open(name, 'rb')
+        return file, storage.size(name), storage.get_modified_time(name).timestamp()
+    try:
+        file = open(path, 'rb')
+    except (FileNotFoundError, IsADirectoryError):
+        raise Http404('No such file.')
+    stat = os.fstat(file.fileno())
+    return file, stat.st_size, stat.st_mtime
+
+
+def _byte_range(request, size, etag, last_modified):
+    """``(start, end)`` inclusive for a satisfiable single range, ``None`` to send everything, or ``False``."""
+    header = request.META.get('HTTP_RANGE')
+    if not header or size == 0:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(last_modified):
+        return None  # the client's partial copy is stale
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None  # multiple or malformed ranges: ignoring Range is allowed
+    first, last = match.groups()
+    if first and last and int(last) < int(first):
+        return None  # syntactically invalid (RFC 7233, 2.1), so the header is ignored
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:  # suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def serve_file(request, name, storage=default_storage, immutable=False):
+    """Serves ``name`` from ``storage``, honouring conditional and range requests."""
+    try:
+        file, size, mtime = _open(storage, name)
+    except SuspiciousFileOperation:
+        raise Http404('No such file.')
+
+    etag = f'"{size:x}-{int(mtime * 1000000):x}"'
+    immutable = immutable or bool(HASHED_NAME.search(name)) or request.GET.get('v') == etag.strip('"')
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(mtime),
+        'Cache-Control': IMMUTABLE if immutable else f'public, max-age={settings.MEDIA_MAX_AGE}',
+        'Accept-Ranges': 'bytes',
+    }
+
+    def finish(response):
+        for header, value in headers.items():
+            response.headers[header] = value
+        return response
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+    if conditional is not None:
+        file.close()
+        return finish(conditional)
+
+    head = file.read(16)
+    file.seek(0)
+    content_type = sniff_content_type(head, name)
+
+    if settings.MEDIA_SERVE_MODE == 'accel':
+        file.close()
+        response = HttpResponse(content_type=content_type)
+        response.headers['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + name
+        return finish(response)
+
+    byte_range = _byte_range(request, size, etag, mtime)
+    if byte_range is False:
+        file.close()
+        response = HttpResponse(status=416)
+        response.headers['Content-Range'] = f'bytes */{size}'
+        return finish(response)
+    if byte_range is None:
+        return finish(FileResponse(file, content_type=content_type))
+
+    start, end = byte_range
+    file.seek(start)
+    # A range running to the end streams the real file, so it can still go out through sendfile.
+    body = file if end == size - 1 else RangeFile(file, end - start + 1)
+    response = FileResponse(body, status=206, content_type=content_type)
+    response.headers['Content-Length'] = str(end - start + 1)
+    response.headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return finish(response)
+
+
+@require_safe
+def serve_media(request, path):
+    """Everything under ``MEDIA_URL``, without access checks; only routed under ``DEBUG``."""
+    return serve_file(request, path)
@@ -0,0 +1,274 @@
+"""
+Per-route request metrics, exported in the Prometheus text format on ``/metrics``.
+
+``MetricsMiddleware`` records, for each resolved URL name (``user-search``, ``post-list``,
+``pet-transfer-request-accept`` ...) and method:
+
+* a latency histogram (``METRICS_LATENCY_BUCKETS``) and a request count per status,
+* the number of SQL queries and the time spent in them, from a wrapper installed on every database
+  connection (``connection_created``), so queries run from ``sync_to_async`` threads are counted too,
+* the time spent serializing (the outermost ``to_representation`` calls of the API serializers),
+* the response size as sent, i.e. after compression.
+
+The per-request state lives in a context variable, which asgiref copies into the threads it runs sync
+code on. Metrics are kept per process; scrape every process or put them behind a single one.
+
+A sample (``METRICS_SLOW_SAMPLE_RATE``) of requests also keeps the SQL they ran. If such a request takes
+longer than ``METRICS_SLOW_REQUEST_MS``, it is logged with its statements to ``PawsConnect.metrics.slow``.
+Unsampled requests only pay for a few counters.
+
+Alongside the routes, ``/metrics`` reports the response caches, geocoding, the database connection pool
+(checkout waits and saturation) and replica health.
+"""
+import bisect
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+
+slow_logger = logging.getLogger('PawsConnect.metrics.slow')
+
+_current = contextvars.ContextVar('metrics_recording', default=None)
+_lock = threading.Lock()
+_routes = {}
+
+
+class Recording:
+    """What one request did so far."""
+    __slots__ = ('queries', 'query_seconds', 'serializer_seconds', 'serializer_depth', 'statements')
+
+    def __init__(self, keep_statements):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+        self.statements = [] if keep_statements else None
+
+    def add_query(self, sql, seconds):
+        self.queries += 1
+        self.query_seconds += seconds
+        if self.statements is not None and len(self.statements) < settings.METRICS_SLOW_MAX_STATEMENTS:
+            self.statements.append((round(seconds * 1000, 3), sql))
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.buckets = [0] * (len(settings.METRICS_LATENCY_BUCKETS) + 1)  # the last one is +Inf
+        self.seconds = 0.0
+        self.statuses = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.response_bytes = 0
+
+    def observe(self, seconds, status, recording, size):
+        self.buckets[bisect.bisect_left(settings.METRICS_LATENCY_BUCKETS, seconds)] += 1
+        self.seconds += seconds
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.queries += recording.queries
+        self.query_seconds += recording.query_seconds
+        self.serializer_seconds += recording.serializer_seconds
+        self.response_bytes += size
+
+
+def record_query(execute, sql, params, many, context):
+    recording = _current.get()
+    if recording is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recording.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # Fires on every reconnect of the same wrapper, so only add the recorder once.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid='PawsConnect.metrics')
+
+
+class serialization_timer:
+    """Adds the time of the outermost serializer call of the current request to its recording."""
+    __slots__ = ('recording', 'started')
+
+    def __enter__(self):
+        self.recording = recording = _current.get()
+        if recording is not None:
+            if recording.serializer_depth == 0:
+                self.started = time.perf_counter()
+            recording.serializer_depth += 1
+
+    def __exit__(self, *exc_info):
+        recording = self.recording
+        if recording is not None:
+            recording.serializer_depth -= 1
+            if recording.serializer_depth == 0:
+                recording.serializer_seconds += time.perf_counter() - self.started
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.url_name or match.view_name or 'unnamed'
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started, recording, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, started, recording)
+        return response
+
+    async def __acall__(self, request):
+        started, recording, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, started, recording)
+        return response
+
+    @staticmethod
+    def start():
+        recording = Recording(keep_statements=random.random() < settings.METRICS_SLOW_SAMPLE_RATE)
+        return time.perf_counter(), recording, _current.set(recording)
+
+    @staticmethod
+    def finish(request, response, started, recording):
+        seconds = time.perf_counter() - started
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        route = route_name(request)
+        with _lock:
+            metrics = _routes.get((route, request.method))
+            if metrics is None:
+                metrics = _routes[route, request.method] = RouteMetrics()
+            metrics.observe(seconds, response.status_code, recording, size)
+
+        if recording.statements is not None and seconds * 1000 >= settings.METRICS_SLOW_REQUEST_MS:
+            slow_logger.warning(
+                'Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms, serializing %.1f ms\n%s',
+                request.method, request.get_full_path(), route, seconds * 1000, recording.queries,
+                recording.query_seconds * 1000, recording.serializer_seconds * 1000,
+                '\n'.join(f'  {ms:>9.3f} ms  {sql}' for ms, sql in recording.statements),
+            )
+
+
+def _labels(**labels):
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def _family(lines, name, kind, help_text, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    lines.extend(f'{name}{suffix} {value}' for suffix, value in samples)
+
+
+def render_metrics():
+    from UserManagement.geocoding import geocoding_stats
+    from .db_routing import replica_health
+    from .postgis_pool.base import pool_stats
+    from .response_cache import response_cache_stats
+
+    with _lock:
+        routes = sorted(_routes.items())
+        snapshot = [(route, method, metrics.buckets[:], metrics.seconds, dict(metrics.statuses), metrics.queries,
+                     metrics.query_seconds, metrics.serializer_seconds, metrics.response_bytes)
+                    for (route, method), metrics in routes]
+
+    lines = []
+    histogram = []
+    for route, method, buckets, seconds, statuses, *_ in snapshot:
+        cumulative = 0
+        bounds = [*map(str, settings.METRICS_LATENCY_BUCKETS), '+Inf']
+        for bound, count in zip(bounds, buckets):
+            cumulative += count
+            histogram.append((f'_bucket{_labels(route=route, method=method, le=bound)}', cumulative))
+        histogram.append((f'_sum{_labels(route=route, method=method)}', seconds))
+        histogram.append((f'_count{_labels(route=route, method=method)}', cumulative))
+    _family(lines, 'pawsconnect_http_request_duration_seconds', 'histogram', 'Request latency by route.', histogram)
+    _family(lines, 'pawsconnect_http_requests_total', 'counter', 'Requests by route and status.', [
+        (_labels(route=route, method=method, status=code), count)
+        for route, method, _, _, statuses, *_ in snapshot for code, count in sorted(statuses.items())
+    ])
+    per_route = {
+        'pawsconnect_db_queries_total': ('SQL queries run by route.', 5),
+        'pawsconnect_db_query_duration_seconds_total': ('Time spent in SQL by route.', 6),
+        'pawsconnect_serializer_duration_seconds_total': ('Time spent serializing by route.', 7),
+        'pawsconnect_http_response_bytes_total': ('Response bytes sent by route.', 8),
+    }
+    for name, (help_text, index) in per_route.items():
+        _family(lines, name, 'counter', help_text,
+                [(_labels(route=row[0], method=row[1]), row[index]) for row in snapshot])
+
+    caches = response_cache_stats()
+    _family(lines, 'pawsconnect_response_cache_hits_total', 'counter', 'Response cache hits.',
+            [(_labels(cache=name), stats['hits']) for name, stats in sorted(caches.items())])
+    _family(lines, 'pawsconnect_response_cache_misses_total', 'counter', 'Response cache misses.',
+            [(_labels(cache=name), stats['misses']) for name, stats in sorted(caches.items())])
+    _family(lines, 'pawsconnect_geocoding_lookups_total', 'counter', 'Geocoding lookups by where they were answered.',
+            [(_labels(result=name), count) for name, count in sorted(geocoding_stats().items())])
+    pools = sorted(pool_stats().items())
+    waits = []
+    for alias, stats in pools:
+        cumulative = 0
+        bounds = [*map(str, settings.DATABASE_POOL_WAIT_BUCKETS), '+Inf']
+        for bound, count in zip(bounds, stats['wait_buckets']):
+            cumulative += count
+            waits.append((f'_bucket{_labels(alias=alias, le=bound)}', cumulative))
+        waits.append((f'_sum{_labels(alias=alias)}', stats['wait_seconds']))
+        waits.append((f'_count{_labels(alias=alias)}', cumulative))
+    _family(lines, 'pawsconnect_db_pool_wait_seconds', 'histogram', 'Time spent waiting for a pooled connection.', waits)
+    pool_gauges = {
+        'pawsconnect_db_pool_size': ('gauge', 'Open connections in the pool.', 'size'),
+        'pawsconnect_db_pool_in_use': ('gauge', 'Pooled connections checked out.', 'in_use'),
+        'pawsconnect_db_pool_max_size': ('gauge', 'Most connections the pool may open.', 'max_size'),
+        'pawsconnect_db_pool_saturation': ('gauge', 'Checked out connections over max_size.', 'saturation'),
+        'pawsconnect_db_pool_waiting': ('gauge', 'Checkouts waiting for a connection.', 'waiting'),
+        'pawsconnect_db_pool_errors_total': ('counter', 'Checkouts that timed out or failed.', 'errors'),
+        'pawsconnect_db_pool_connections_lost_total': ('counter', 'Pooled connections found broken.', 'lost'),
+    }
+    for name, (kind, help_text, field) in pool_gauges.items():
+        _family(lines, name, kind, help_text, [(_labels(alias=alias), stats[field]) for alias, stats in pools])
+    _family(lines, 'pawsconnect_db_replica_healthy', 'gauge', 'Result of the last health check of each replica.',
+            [(_labels(alias=alias), int(healthy)) for alias, healthy in sorted(replica_health().items())])
+    return '\n'.join(lines) + '\n'
+
+
+@require_safe
+def metrics_view(request):
+    token = settings.METRICS_AUTH_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,110 @@
+"""
+Push notifications over WebSockets (``/ws/notifications/``).
+
+Clients connect with their access token (``?token=<jwt>``). Each socket joins its user's group on the
+channel layer (``CHANNEL_LAYERS``), and ``notify`` sends events to those groups once the current
+transaction commits, so nothing is pushed for a write that is rolled back. Events are small JSON objects
+naming what changed, e.g. ``{"type": "friendship.requested", "friendship": 12, "user": 5}``. Clients
+fetch the details from the API, which is what they used to poll.
+
+The in-memory layer only reaches sockets of the same process; with several server processes or nodes,
+configure the Redis layer (``CHANNEL_LAYER_URL``).
+"""
+import asyncio
+import logging
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from rest_framework.exceptions import AuthenticationFailed
+
+logger = logging.getLogger(__name__)
+
+CLOSE_UNAUTHORIZED = 4401
+
+
+def user_group(user_id):
+    return f'notifications.user.{user_id}'
+
+
+def notify(user_ids, event_type, actor_id=None, **payload):
+    """Sends an event to every open socket of ``user_ids``, except the user who caused it, on commit."""
+    recipients = {user_id for user_id in user_ids if user_id is not None and user_id != actor_id}
+    if not recipients:
+        return
+    event = {'type': event_type, 'user': actor_id, **payload}
+
+    def send():
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        for user_id in recipients:
+            try:
+                async_to_sync(layer.group_send)(user_group(user_id), {'type': 'notification', 'event': event})
+            except Exception:
+                # A full or unreachable layer must never fail the write that triggered the event.
+                logger.exception('Could not push %s to user %s', event_type, user_id)
+    transaction.on_commit(send)
+
+
+@database_sync_to_async
+def authenticate_token(raw_token):
+    """Returns ``(user, expires_at)`` for a valid access token, or ``(AnonymousUser(), None)``."""
+    from UserManagement.authentication import CachedJWTAuthentication
+
+    authentication = CachedJWTAuthentication()
+    try:
+        token = authentication.get_validated_token(raw_token)
+        return authentication.get_user(token), token.get('exp')
+    except AuthenticationFailed:
+        return AnonymousUser(), None
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Sets ``scope['user']`` from the ``token`` query parameter (browsers cannot set WebSocket headers)."""
+
+    async def __call__(self, scope, receive, send):
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token', [''])[0]
+        user, expires_at = await authenticate_token(token) if token else (AnonymousUser(), None)
+        scope = dict(scope, user=user, token_expires_at=expires_at)
+        return await super().__call__(scope, receive, send)
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    group = None
+    expiry = None
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHORIZED)
+            return
+        self.group = user_group(user.pk)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+        # The socket lives no longer than the token it was opened with; clients reconnect with a fresh one.
+        expires_at = self.scope.get('token_expires_at')
+        if expires_at:
+            self.expiry = asyncio.get_running_loop().call_later(
+                max(0, expires_at - time.time()),
+                lambda: asyncio.ensure_future(self.close(code=CLOSE_UNAUTHORIZED)),
+            )
+
+    async def disconnect(self, code):
+        if self.expiry is not None:
+            self.expiry.cancel()
+        if self.group is not None:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def notification(self, message):
+        await self.send_json(message['event'])
@@ -0,0 +1,154 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(values):
+    """Packs a keyset position, e.g. ``(timestamp, id)``, into an opaque URL-safe token."""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    """Inverse of ``encode_cursor``. Raises ``ValueError`` for anything that was not produced by it."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, UnicodeError, binascii.Error, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor.') from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor.')
+    return values
+
+
+def keyset_filter(ordering, position):
+    """
+    Builds the "strictly after ``position``" predicate for ``ordering``, e.g. for
+    ``('-timestamp', '-id')``: ``timestamp < t OR (timestamp = t AND id < i)``.
+    Matches a composite index on the same columns, so every page is an index range scan.
+    """
+    predicate = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        term = Q(**{f'{name}__{lookup}': position[i]})
+        for prev_field, prev_value in zip(ordering[:i], position[:i]):
+            term &= Q(**{prev_field.lstrip('-'): prev_value})
+        predicate |= term
+    return predicate
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Forward-only cursor pagination keyed on ``view.cursor_ordering`` (``('-timestamp', '-id')`` by default).
+
+    Unlike DRF's ``CursorPagination`` the cursor holds the full composite key, so ties on the timestamp
+    never need an offset, and no ``COUNT(*)`` is ever run. Every ordering should end with a unique
+    column and be backed by a matching index.
+    """
+    ordering = ('-timestamp', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.get_page([obj async for obj in self.page_queryset(queryset, request, view)])
+
+    def page_queryset(self, queryset, request, view=None):
+        """The page's rows plus one, to tell whether there is a next page."""
+        self.request = request
+        self.ordering = tuple(getattr(view, 'cursor_ordering', self.ordering))
+        self.limit = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                position = decode_cursor(cursor, len(self.ordering))
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(keyset_filter(self.ordering, position))
+        return queryset.order_by(*self.ordering)[:self.limit + 1]
+
+    def get_page(self, results):
+        self.has_next = len(results) > self.limit
+        results = results[:self.limit]
+        self.next_cursor = None
+        if self.has_next:
+            self.next_cursor = encode_cursor([getattr(results[-1], f.lstrip('-')) for f in self.ordering])
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SearchResultsPagination(LimitOffsetPagination):
+    """
+    Limit/offset pages for ranked results, which have no stable keyset to resume from. Searches are capped
+    (``USER_SEARCH_MAX_RESULTS``), so offsets stay small; like the keyset paginator it never counts.
+    """
+    default_limit = api_settings.PAGE_SIZE
+    max_limit = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.get_page([obj async for obj in self.page_queryset(queryset, request, view)])
+
+    def page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        return queryset[self.offset:self.offset + self.limit + 1]
+
+    def get_page(self, results):
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return KeysetCursorPagination.get_paginated_response_schema(self, schema)
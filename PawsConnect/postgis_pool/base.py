@@ -0,0 +1,145 @@
+"""
+The PostGIS backend with a per-process psycopg connection pool (``'ENGINE': 'PawsConnect.postgis_pool'``).
+
+Django still opens a connection when a request first queries and closes it when the request finishes, but
+opening now checks a connection out of a ``psycopg_pool.ConnectionPool`` and closing gives it back. Requests
+skip the TCP and authentication round trips, and ``max_size`` caps what one process holds on the server
+however many threads are busy. Checkouts beyond that wait up to ``timeout`` seconds, then fail with
+``OperationalError``.
+
+Options go in the database's ``POOL`` entry: ``min_size``, ``max_size``, ``timeout``, ``max_lifetime`` (a
+connection is replaced after this many seconds) and ``max_idle`` (idle connections above ``min_size`` are
+closed after this many seconds). A connection is checked with a round trip on every checkout and replaced
+if it is broken. Physical connections are opened by the stock backend, so they are set up exactly as
+before (PostGIS adapters, isolation level), once each.
+
+The same code serves WSGI and ASGI: the ORM always runs in threads (``sync_to_async`` under ASGI), and each
+thread returns its connection when the request ends. That is why ``CONN_MAX_AGE`` must stay 0, since
+connections held per thread would bypass the pool. Pools are created lazily in the process that uses
+them, so workers forked from a preloaded master never share one.
+
+``pool_stats()`` feeds the pool gauges and the checkout wait histogram on ``/metrics``.
+"""
+import bisect
+import os
+import threading
+import time
+
+import psycopg
+from django.conf import settings
+from django.contrib.gis.db.backends.postgis.base import DatabaseWrapper as PostGISDatabaseWrapper
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.utils.asyncio import async_unsafe
+from psycopg_pool import ConnectionPool
+
+DEFAULT_POOL_OPTIONS = {'min_size': 2, 'max_size': 20, 'timeout': 10, 'max_lifetime': 1800, 'max_idle': 300}
+
+_lock = threading.Lock()
+_pools = {}  # (pid, alias, NAME, USER, HOST, PORT) -> ConnectionPool
+_waits = {}  # alias -> CheckoutWaits
+
+
+class CheckoutWaits:
+    def __init__(self):
+        self.buckets = [0] * (len(settings.DATABASE_POOL_WAIT_BUCKETS) + 1)  # the last one is +Inf
+        self.seconds = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(settings.DATABASE_POOL_WAIT_BUCKETS, seconds)] += 1
+        self.seconds += seconds
+
+
+def _connection_class(wrapper):
+    class Connection(psycopg.Connection):
+        @classmethod
+        def connect(cls, conninfo='', **kwargs):
+            # ``kwargs`` are the wrapper's connection parameters, which hold everything conninfo would.
+            return PostGISDatabaseWrapper.get_new_connection(wrapper, kwargs)
+    return Connection
+
+
+def close_pools(alias=None):
+    """Closes this process's pools (of ``alias`` only, if given)."""
+    with _lock:
+        for key in [key for key in _pools if key[0] == os.getpid() and alias in (None, key[1])]:
+            _pools.pop(key).close()
+
+
+def pool_stats():
+    """Size, use and checkout waits of this process's pools, by alias."""
+    with _lock:
+        pools = [(key[1], pool) for key, pool in _pools.items() if key[0] == os.getpid()]
+        waits = {alias: (observed.buckets[:], observed.seconds) for alias, observed in _waits.items()}
+    stats = {}
+    for alias, pool in pools:
+        counters = pool.get_stats()
+        size, available = counters.get('pool_size', 0), counters.get('pool_available', 0)
+        buckets, seconds = waits.get(alias, ([0] * (len(settings.DATABASE_POOL_WAIT_BUCKETS) + 1), 0.0))
+        stats[alias] = {
+            'size': size,
+            'in_use': size - available,
+            'max_size': pool.max_size,
+            'saturation': (size - available) / pool.max_size,
+            'waiting': counters.get('requests_waiting', 0),
+            'errors': counters.get('requests_errors', 0),
+            'lost': counters.get('connections_lost', 0),
+            'wait_buckets': buckets,
+            'wait_seconds': seconds,
+        }
+    return stats
+
+
+class DatabaseCreation(PostGISDatabaseWrapper.creation_class):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections, including those of mirrors, would keep the database from being dropped.
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(PostGISDatabaseWrapper):
+    creation_class = DatabaseCreation
+    _pool = None  # the pool the current connection was checked out of
+
+    @property
+    def pool(self):
+        settings_dict = self.settings_dict
+        key = (os.getpid(), self.alias, *(settings_dict[name] for name in ('NAME', 'USER', 'HOST', 'PORT')))
+        with _lock:
+            pool = _pools.get(key)
+            if pool is None:
+                if settings_dict['CONN_MAX_AGE']:
+                    raise ImproperlyConfigured(f"Database '{self.alias}' is pooled; set its CONN_MAX_AGE to 0.")
+                options = {**DEFAULT_POOL_OPTIONS, **settings_dict.get('POOL', {})}
+                pool = _pools[key] = ConnectionPool(
+                    kwargs=self.get_connection_params(),
+                    connection_class=_connection_class(self),
+                    check=ConnectionPool.check_connection,
+                    name=self.alias,
+                    open=True,
+                    **options,
+                )
+                _waits.setdefault(self.alias, CheckoutWaits())
+            return pool
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            # Maintenance connections (creating and dropping databases) are not pooled.
+            return super().get_new_connection(conn_params)
+        pool = self.pool
+        started = time.perf_counter()
+        connection = pool.getconn()
+        waited = time.perf_counter() - started
+        with _lock:
+            _waits[self.alias].observe(waited)
+        self._pool = pool
+        return connection
+
+    def _close(self):
+        pool, self._pool = self._pool, None
+        if pool is None or self.connection is None:
+            return super()._close()
+        # The pool rolls back whatever transaction is left open and discards broken connections.
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
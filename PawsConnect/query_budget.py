@@ -0,0 +1,78 @@
+"""
+Query-budget assertions for API tests.
+
+Mix ``QueryBudgetTestMixin`` into a ``TestCase`` (or ``APITestCase``) and call ``assertQueryBudget`` with a
+route name from ``QUERY_BUDGETS``. Pass ``grow`` to add more rows between two identical requests; the
+query count must stay the same, which is what catches an N+1 that a single small fixture would hide.
+``assertBudgetWhileGrowing`` does both steps with one row factory.
+Every route in ``QUERY_BUDGETS`` is covered by the ``QueryBudgetTests`` of its app's ``tests.py``.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+# Queries per request, including the authentication lookup, keyed by URL name.
+QUERY_BUDGETS = {
+    'content:post-list': 5,       # auth, friends, posts + authors, author pets, tagged pets
+    'content:comment-list': 5,    # auth, friends, comments + authors + posts, author pets, tagged pets
+    'content:like-list': 4,       # auth, friends, likes + authors, author pets
+    'content:feed-list': 6,       # auth, pull authors, timeline + posts + authors, author pets, tagged pets, likes
+    'content:post-like': 6,       # auth, friends, post, insert/delete, like_count update, like state read
+    'UserManagement:user-detail': 3,
+    'UserManagement:user-search': 3,
+    'UserManagement:friendship-list': 2,
+    'PetManagement:pet-list': 2,
+    'PetManagement:pet-transfer-request-list': 2,
+    'PetManagement:pet-transfer-request-inbox': 2,
+    'PetManagement:pet-transfer-request-outbox': 2,
+}
+
+
+class QueryBudgetTestMixin:
+    N = 5  # rows before growing to 3N; both sizes must fit in one page
+
+    def assertBudgetWhileGrowing(self, url_name, add, **kwargs):
+        """Calls ``add(count)`` to create ``N`` rows, then checks ``url_name`` at ``N`` and again at ``3N``."""
+        add(self.N)
+        return self.assertQueryBudget(url_name, grow=lambda: add(2 * self.N), **kwargs)
+
+    def assertQueryBudget(self, url_name, budget=None, *, args=None, kwargs=None, method='get', data=None,
+                          grow=None, client=None):
+        """
+        Requests ``url_name`` and fails if it runs more than ``budget`` queries (defaults to
+        ``QUERY_BUDGETS[url_name]``). With ``grow``, calls it after the first request and asserts that a
+        second, identical request runs exactly as many queries.
+        """
+        budget = QUERY_BUDGETS[url_name] if budget is None else budget
+        client = client or self.client
+        url = reverse(url_name, args=args, kwargs=kwargs)
+
+        first = self._capture(client, method, url, data)
+        self._check_budget(url_name, budget, first)
+        if grow is None:
+            return first
+
+        grow()
+        second = self._capture(client, method, url, data)
+        self._check_budget(url_name, budget, second)
+        if len(second) != len(first):
+            self.fail(
+                f"{url_name} ran {len(first)} queries before growing the data and {len(second)} after:\n"
+                + self._format(second)
+            )
+        return second
+
+    @staticmethod
+    def _capture(client, method, url, data):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(url, data)
+        assert response.status_code < 400, f"{url} returned {response.status_code}"
+        return context.captured_queries
+
+    def _check_budget(self, url_name, budget, queries):
+        if len(queries) > budget:
+            self.fail(f"{url_name} ran {len(queries)} queries, budget is {budget}:\n" + self._format(queries))
+
+    @staticmethod
+    def _format(queries):
+        return '\n'.join(f"{i}. {query['sql']}" for i, query in enumerate(queries, start=1))
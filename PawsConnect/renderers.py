@@ -0,0 +1,42 @@
+"""
+orjson-backed JSON renderer and parser for DRF.
+
+orjson serializes the plain dicts, lists, strings and numbers that serializers produce several times
+faster than the standard library, and produces UTF-8 bytes directly. Anything it cannot handle natively
+(lazy translation strings, ``Decimal``, ``QuerySet`` ...) falls back to DRF's own ``JSONEncoder``.
+The output matches ``JSONRenderer`` with ``UNICODE_JSON`` and ``COMPACT_JSON``, except that U+2028/U+2029
+are not escaped (that only matters when JSON is pasted into a ``<script>``). orjson can only indent by two
+spaces, so a request for any other ``indent`` is rendered by ``JSONRenderer`` itself.
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_fallback = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # "Accept: application/json; indent=N", parsed and clamped exactly as JSONRenderer does.
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent not in (None, 2):
+            return super().render(data, accepted_media_type, renderer_context)
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_fallback, option=option)
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
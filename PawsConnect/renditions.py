@@ -0,0 +1,183 @@
+"""
+Resized renditions of uploaded images.
+
+A model opts in with ``RENDITION_SOURCE = '<image field>'`` and a ``renditions`` JSON field, and calls
+``schedule_renditions`` from a ``post_save`` receiver. Once the transaction commits, the original is read
+once and a process pool decodes it and writes every size in ``RENDITION_SIZES`` × ``RENDITION_FORMATS``.
+None of this runs on the request thread. The files are stored under a content-hashed name, so their URLs
+never change meaning and can be cached forever. The result is recorded as::
+
+    {"source": "post_photos/cat.jpg",
+     "sizes": [{"name": "thumb", "width": 160, "height": 120, "webp": "renditions/...webp", "jpeg": "..."}, ...]}
+
+The row is only updated while its image is still the one that was rendered, so a job that finishes after
+a newer upload cannot overwrite the newer renditions.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# Sent with ``instance`` after new renditions are recorded (by a queryset update, so post_save does not fire).
+renditions_built = Signal()
+
+_lock = threading.Lock()
+_process_pool = None
+_dispatcher = None
+
+
+def render(data, sizes, formats):
+    """
+    Runs in a worker process. Returns ``[(name, width, height, {format: bytes})]``, largest first. Sizes
+    bound the longest edge and never upscale. Each size is resized from the previous one instead of from
+    the original, and JPEG sources are decoded at the smallest scale that still covers the largest size.
+    """
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    largest = max(sizes.values())
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    rendered = []
+    for name, bound in sorted(sizes.items(), key=lambda item: -item[1]):
+        image = image.copy()
+        image.thumbnail((bound, bound), Image.LANCZOS)
+        encoded = {}
+        for fmt, options in formats.items():
+            out = image
+            if fmt == 'jpeg' and image.mode == 'RGBA':
+                out = Image.new('RGB', image.size, (255, 255, 255))
+                out.paste(image, mask=image.getchannel('A'))
+            buffer = io.BytesIO()
+            out.save(buffer, format=fmt.upper(), **options)
+            encoded[fmt] = buffer.getvalue()
+        rendered.append((name, image.width, image.height, encoded))
+    return rendered
+
+
+def _pools():
+    global _process_pool, _dispatcher
+    with _lock:
+        if _process_pool is None:
+            # spawn: forking a threaded server process can deadlock the child
+            _process_pool = ProcessPoolExecutor(max_workers=settings.RENDITION_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+            _dispatcher = ThreadPoolExecutor(max_workers=settings.RENDITION_QUEUE_THREADS,
+                                             thread_name_prefix='renditions')
+        return _process_pool, _dispatcher
+
+
+def _stored_paths(renditions):
+    return {size[fmt] for size in renditions.get('sizes', ()) for fmt in EXTENSIONS if fmt in size}
+
+
+def build_renditions(instance, executor=None):
+    """
+    Renders and stores ``instance``'s renditions, then records them on the row. ``executor`` runs the
+    resizing; without one the work is done in this process. Returns the new ``renditions`` value, or
+    ``None`` if the image changed or was removed in the meantime.
+    """
+    model = type(instance)
+    field = model.RENDITION_SOURCE
+    file = getattr(instance, field)
+    if not file:
+        return None
+    source = file.name
+    with file.open('rb') as handle:
+        data = handle.read()
+
+    args = (data, settings.RENDITION_SIZES, settings.RENDITION_FORMATS)
+    rendered = executor.submit(render, *args).result() if executor else render(*args)
+
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    prefix = f'renditions/{model._meta.label_lower}/{instance.pk}/{digest}'
+    sizes = []
+    for name, width, height, encoded in rendered:
+        entry = {'name': name, 'width': width, 'height': height}
+        for fmt, content in encoded.items():
+            path = f'{prefix}-{name}.{EXTENSIONS[fmt]}'
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(content))
+            entry[fmt] = path
+        sizes.append(entry)
+    renditions = {'source': source, 'sizes': sizes}
+
+    rows = model._base_manager.filter(pk=instance.pk)
+    previous = rows.values_list('renditions', flat=True).first() or {}
+    updated = rows.filter(**{field: source}).update(renditions=renditions)
+    current = rows.values_list('renditions', flat=True).first() or {}
+    for path in (_stored_paths(previous) | _stored_paths(renditions)) - _stored_paths(current):
+        default_storage.delete(path)
+    if not updated:
+        return None
+    renditions_built.send(sender=model, instance=instance)
+    return renditions
+
+
+def _build_in_background(model, pk):
+    try:
+        instance = model._base_manager.filter(pk=pk).first()
+        if instance is not None:
+            build_renditions(instance, _pools()[0])
+    except Exception:
+        logger.exception('Rendering %s %s failed', model._meta.label, pk)
+    finally:
+        connection.close()
+
+
+def schedule_renditions(instance):
+    """
+    Queues a rebuild when ``instance``'s image differs from the one its renditions were made from, and
+    clears the renditions when the image was removed. Safe to call from every ``post_save``.
+    """
+    model = type(instance)
+    file = getattr(instance, model.RENDITION_SOURCE)
+    if not file:
+        if instance.renditions:
+            model._base_manager.filter(pk=instance.pk).update(renditions={})
+            instance.renditions = {}
+        return
+    if (instance.renditions or {}).get('source') == file.name:
+        return
+    if not settings.RENDITION_ASYNC:
+        transaction.on_commit(lambda: build_renditions(instance))
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: _pools()[1].submit(_build_in_background, model, pk))
+
+
+def rendition_urls(renditions, build_url=None):
+    """
+    The serialized form: each size's URLs by format, plus a ``srcset`` string per format, e.g.
+    ``{"thumb": {"width": 160, "height": 120, "webp": url, "jpeg": url}, ..., "srcset": {"webp": "u 160w, ..."}}``.
+    Empty when the renditions have not been built yet, in which case clients fall back to the original.
+    """
+    build_url = build_url or (lambda url: url)
+    result = {}
+    srcset = {}
+    for size in sorted((renditions or {}).get('sizes', ()), key=lambda size: size['width']):
+        entry = {'width': size['width'], 'height': size['height']}
+        for fmt in EXTENSIONS:
+            if fmt in size:
+                url = build_url(default_storage.url(size[fmt]))
+                entry[fmt] = url
+                srcset.setdefault(fmt, []).append(f'{url} {size["width"]}w')
+        result[size['name']] = entry
+    if srcset:
+        result['srcset'] = {fmt: ', '.join(candidates) for fmt, candidates in srcset.items()}
+    return result
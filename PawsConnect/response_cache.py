@@ -0,0 +1,133 @@
+"""
+Read-through cache for serialized detail responses.
+
+Each cached object has a version counter (``version:<model>:<pk>``), and payloads are stored under keys
+that include it. Invalidation therefore never deletes anything: a write bumps the counter, and readers
+move to a key that has not been filled yet. Old payloads simply age out. The ``post_save``/``post_delete``
+receivers of everything a payload is built from call ``invalidate``. Bumps wait for the transaction to
+commit, so a reader can never cache uncommitted data under the new version.
+
+Payloads and counters live in the ``RESPONSE_CACHE`` alias of ``CACHES``, which every server process must
+share (file-based, or Redis/Memcached): a bump only reaches the processes that read the same counter. A
+process-local backend (locmem, dummy) is only accepted under ``DEBUG``, where ``runserver`` is a single
+process; otherwise the app refuses to start. With a non-atomic backend (file), two concurrent bumps may
+count as one. That is still safe, because a bump always changes the version. Counters that go missing
+start again from a clock value rather than 0, so an old payload is never brought back.
+
+Payloads are always built from the primary database: right after a bump, a lagging replica could still
+return the old data, which would then be cached under the new version.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .db_routing import pin_to_primary
+
+_registry = {}
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE]
+
+
+def _version_key(model, pk):
+    return f'version:{model._meta.label_lower}:{pk}'
+
+
+def get_version(model, pk):
+    cache = _cache()
+    key = _version_key(model, pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(model, pk):
+    cache = _cache()
+    key = _version_key(model, pk)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump(keys):
+    cache = _cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate(model, *pks):
+    """Moves every cached response for these objects to a fresh version once the transaction commits."""
+    keys = {_version_key(model, pk) for pk in pks if pk is not None}
+    if keys:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+class ResponseCache:
+    """
+    Caches one serialized representation of ``model`` instances. Anything in the payload that depends on
+    the viewer must be recomputed by the caller after ``get_or_build``.
+    """
+
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+        self.hits = self.misses = 0
+        _registry[name] = self
+
+    def get_or_build(self, request, pk, build, variant=''):
+        """
+        Returns the cached payload for ``pk``, or calls ``build()`` and caches what it returns. ``variant``
+        separates differently shaped payloads of the same object (e.g. sparse fieldsets).
+        """
+        cache = _cache()
+        key = self._key(request, pk, variant, get_version(self.model, pk))
+        data = self._count(cache.get(key))
+        if data is None:
+            with pin_to_primary():
+                data = build()
+            cache.set(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+        return data
+
+    async def aget_or_build(self, request, pk, build, variant=''):
+        """``get_or_build`` for async views; ``build`` is a coroutine function."""
+        cache = _cache()
+        key = self._key(request, pk, variant, await aget_version(self.model, pk))
+        data = self._count(await cache.aget(key))
+        if data is None:
+            with pin_to_primary():
+                data = await build()
+            await cache.aset(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+        return data
+
+    def _key(self, request, pk, variant, version):
+        # Serialized URLs are absolute, so the host is part of the key.
+        return f'response:{self.name}:{request.get_host()}:{variant}:{pk}:{version}'
+
+    def _count(self, data):
+        with _stats_lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hits / lookups if lookups else 0.0}
+
+
+def response_cache_stats():
+    """Hit/miss counts and hit ratio of every response cache in this process."""
+    return {name: cache.stats() for name, cache in _registry.items()}
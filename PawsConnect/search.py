@@ -0,0 +1,42 @@
+"""
+Ranked search helpers shared by user and pet search.
+
+Each searchable model keeps a ``search_vector`` column (``tsvector``, GIN indexed) refreshed on save, and
+GIN ``gin_trgm_ops`` indexes on its short text columns. A query matches either the vector (whole words,
+``websearch`` syntax) or one of the trigram columns (typos and partial names); results are ordered by the
+sum of text rank and best trigram similarity.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+SEARCH_CONFIG = 'simple'  # usernames and pet names are not English prose, so no stemming or stop words
+
+
+def build_search_vector(weighted_fields):
+    """``weighted_fields`` is a sequence of ``(field, weight)`` pairs, e.g. ``[('name', 'A'), ('breed', 'B')]``."""
+    vector = None
+    for field, weight in weighted_fields:
+        part = SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vector(instance, weighted_fields, update_fields=None):
+    """Refreshes ``instance.search_vector`` in place, skipping saves that did not touch an indexed field."""
+    if update_fields is not None and not {field for field, _ in weighted_fields} & set(update_fields):
+        return
+    type(instance)._base_manager.filter(pk=instance.pk).update(search_vector=build_search_vector(weighted_fields))
+
+
+def ranked_search(queryset, query, trigram_fields):
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+    matches = Q(search_vector=search_query)
+    for field in trigram_fields:
+        matches |= Q(**{f'{field}__trigram_similar': query})
+
+    similarities = [TrigramSimilarity(field, query) for field in trigram_fields]
+    similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+    return queryset.annotate(
+        rank=SearchRank(F('search_vector'), search_query) + similarity
+    ).filter(matches).order_by('-rank', 'pk')
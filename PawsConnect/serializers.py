@@ -0,0 +1,203 @@
+import json
+
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+from .metrics import serialization_timer
+from .renditions import rendition_urls
+
+
+def _parse_paths(value):
+    """``'id,user.id,user.pets'`` -> ``{'id': {}, 'user': {'id': {}, 'pets': {}}}``."""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class FieldSelection:
+    """
+    Which fields a serializer outputs (``?fields=``) and which of its ``expandable_fields`` it expands
+    (``?expand=``). Both take comma-separated dotted paths, e.g.
+    ``?fields=id,content,user.id,user.display_name&expand=tagged_pets``. A nested field listed without
+    sub-paths is output in full; ``fields`` left out means every field.
+    """
+
+    def __init__(self, only=None, expand=None):
+        self.only = only
+        self.expand = expand or {}
+
+    @classmethod
+    def from_request(cls, request):
+        params = getattr(request, 'query_params', None)
+        if params is None:
+            return cls()
+        fields, expand = params.get('fields'), params.get('expand')
+        return cls(_parse_paths(fields) if fields else None, _parse_paths(expand) if expand else None)
+
+    def wanted(self, serializer_class):
+        """Field names to keep, or ``None`` for all; adds fields that the selected ones depend on."""
+        if self.only is None:
+            return None
+        requires = getattr(serializer_class, 'selection_requires', {})
+        wanted = set(self.only)
+        for name in self.only:
+            wanted.update(requires.get(name, ()))
+        return wanted
+
+    def expands(self, name):
+        return name in self.expand
+
+    def child(self, name):
+        only = self.only.get(name) if self.only is not None else None
+        return FieldSelection(only or None, self.expand.get(name))
+
+    def key(self):
+        """Canonical form, for cache keys."""
+        return json.dumps([self.only, self.expand], sort_keys=True, separators=(',', ':'))
+
+
+def expanded_fields(serializer_class, selection):
+    """Instances of the ``expandable_fields`` that ``selection`` expands."""
+    return {
+        name: import_string(path)(**{'read_only': True, **kwargs})
+        for name, (path, kwargs) in getattr(serializer_class, 'expandable_fields', {}).items()
+        if selection.expands(name)
+    }
+
+
+def eager_lookups(serializer_class, prefix='', in_prefetch=False, selection=None):
+    """
+    Works out the ``select_related`` and ``prefetch_related`` lookups a serializer needs by walking its
+    declared fields: nested serializers are joined (or prefetched when ``many=True``), many-to-many and
+    non-pk related fields are loaded up front, and pk-only relations are left alone since they read the
+    ``_id`` column. Lookups below a prefetch are prefetched too, as a join cannot cross one. With a
+    ``selection``, fields it leaves out are skipped and expanded relations are walked instead.
+
+    Serializers that read relations outside their declared fields (e.g. in ``to_representation``)
+    list them in ``extra_select_related`` / ``extra_prefetch_related``.
+    """
+    selection = selection or FieldSelection()
+    select = []
+    prefetch = []
+
+    def add(lookup, many=False):
+        (prefetch if many or in_prefetch else select).append(lookup)
+
+    fields = {**serializer_class._declared_fields, **expanded_fields(serializer_class, selection)}
+    wanted = selection.wanted(serializer_class)
+    for name, field in fields.items():
+        if field.write_only or field.source == '*' or (wanted is not None and name not in wanted):
+            continue
+        path = prefix + (field.source or name).replace('.', '__')
+        if isinstance(field, serializers.ListSerializer):
+            add(path, many=True)
+            child_select, child_prefetch = eager_lookups(type(field.child), f'{path}__', True, selection.child(name))
+            prefetch.extend(child_select + child_prefetch)
+        elif isinstance(field, serializers.BaseSerializer):
+            add(path)
+            child_select, child_prefetch = eager_lookups(type(field), f'{path}__', in_prefetch, selection.child(name))
+            select.extend(child_select)
+            prefetch.extend(child_prefetch)
+        elif isinstance(field, serializers.ManyRelatedField):
+            add(path, many=True)
+        elif isinstance(field, serializers.RelatedField) and not field.use_pk_only_optimization():
+            add(path)
+
+    for lookup in getattr(serializer_class, 'extra_select_related', ()):
+        add(prefix + lookup)
+    for lookup in getattr(serializer_class, 'extra_prefetch_related', ()):
+        prefetch.append(prefix + lookup)
+    return select, prefetch
+
+
+class EagerLoadingMixin:
+    """Lets a viewset load everything its serializer touches in a fixed number of queries."""
+    extra_select_related = ()
+    extra_prefetch_related = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, prefix='', request=None):
+        """Pass the ``request`` to load only what its ``?fields=``/``?expand=`` will serialize."""
+        select, prefetch = eager_lookups(cls, prefix, selection=cls._request_selection(request))
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    @classmethod
+    def prefetch_lookups(cls, prefix='', request=None):
+        """All lookups as a flat list, for ``prefetch_related_objects`` on already-fetched instances."""
+        select, prefetch = eager_lookups(cls, prefix, selection=cls._request_selection(request))
+        return select + prefetch
+
+    @classmethod
+    def _request_selection(cls, request):
+        # Only serializers that apply the selection to their output may load less because of it.
+        return FieldSelection.from_request(request) if issubclass(cls, FieldSelectionMixin) else None
+
+    def to_representation(self, instance):
+        # Counted as serializer time per route (PawsConnect.metrics); nested calls are not counted twice.
+        with serialization_timer():
+            return super().to_representation(instance)
+
+
+class FieldSelectionMixin:
+    """
+    Sparse fieldsets and on-demand expansion for output. The outermost serializer reads its
+    ``FieldSelection`` from the request and hands each nested serializer its part of it. Serializers that
+    are nested by hand pass ``selection=`` themselves.
+
+    ``expandable_fields`` maps a field name to ``(dotted serializer path, kwargs)``; the field keeps its
+    plain form unless expanded. ``selection_requires`` names fields that a selected field needs to be
+    present as well (e.g. for viewer-dependent fixups of cached output). Serializers given input data ignore
+    the selection, so a write never loses a field to it.
+    """
+    expandable_fields = {}
+    selection_requires = {}
+
+    def __init__(self, *args, selection=None, **kwargs):
+        self._selection = selection
+        super().__init__(*args, **kwargs)
+
+    @property
+    def selection(self):
+        if self._selection is None:
+            parent = getattr(self, 'parent', None)
+            if isinstance(parent, serializers.ListSerializer):
+                parent = getattr(parent, 'parent', None)
+            self._selection = (FieldSelection() if parent is not None
+                               else FieldSelection.from_request(self.context.get('request')))
+        return self._selection
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if hasattr(self, 'initial_data'):
+            return fields
+        selection = self.selection
+        fields.update(expanded_fields(type(self), selection))
+        wanted = selection.wanted(type(self))
+        if wanted is not None:
+            for name in list(fields):
+                if name not in wanted:
+                    del fields[name]
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, FieldSelectionMixin):
+                nested._selection = selection.child(name)
+        return fields
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """Serializes a model's ``renditions`` as absolute URLs per size and format plus ``srcset`` strings."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'renditions')
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        return rendition_urls(value, request.build_absolute_uri if request else None)
@@ -2,7 +2,7 @@ import os
 from datetime import timedelta
 from datetime import timedelta
 
-from decouple import config
+from decouple import Csv, config
 
 """
 Django settings for PawsConnect project.
@@ -22,9 +22,25 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = 'media/'
+# Media serving (PawsConnect.media): 'stream' sends files from Django, 'accel' hands them to nginx via
+# X-Accel-Redirect to an internal location aliased to MEDIA_ROOT.
+MEDIA_SERVE_MODE = config('MEDIA_SERVE_MODE', default='stream')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_MAX_AGE = 5 * 60  # for URLs without a content hash; revalidation after that is a cheap 304
 
 GOOGLE_MAPS_API_KEY = config('GOOGLE_MAPS_API_KEY')
 
+# Geocoding (UserManagement.geocoding)
+GEOCODING_BACKEND = config('GEOCODING_BACKEND', default='UserManagement.geocoding.GoogleGeocodingBackend')
+GEOCODING_STUB_RESULTS = {}  # normalized address -> (lng, lat), for UserManagement.geocoding.StubGeocodingBackend
+GEOCODING_TIMEOUT = 3  # seconds per HTTP attempt
+GEOCODING_RETRIES = 2
+GEOCODING_RETRY_BACKOFF = 0.25
+GEOCODING_LRU_SIZE = 10000
+# Census ZCTA Gazetteer file (or a zip,lat,lng CSV); lookups that hit it need no network.
+GEOCODING_ZIP_CENTROIDS_PATH = config('GEOCODING_ZIP_CENTROIDS_PATH',
+                                      default=os.path.join(BASE_DIR, 'misc', 'zip_centroids.txt'))
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
 
@@ -52,13 +68,16 @@ INSTALLED_APPS = [
     'allauth.socialaccount.providers.google',
     'debug_toolbar',
     'django.contrib.gis',
+    'django.contrib.postgres',
     "Content",
     "PetManagement",
     'UserManagement',
+    'PawsConnect',  # cross-app management commands (PawsConnect/management/commands)
     'rest_framework',
     'rest_framework_gis',
     'rest_framework_simplejwt',
     'corsheaders',
+    'channels',
     'django_extensions'
 ]
 AUTH_USER_MODEL = "UserManagement.CustomUser"
@@ -69,13 +88,126 @@ AUTHENTICATION_BACKENDS = [
 ]
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'UserManagement.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'PawsConnect.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
+    'DEFAULT_PARSER_CLASSES': (
+        'PawsConnect.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'PawsConnect.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 20,
 }
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=1982852),  # Access tokens expire after 15 minutes
     'REFRESH_TOKEN_LIFETIME': timedelta(days=151),     # Refresh tokens expire after 1 day
+    # A token issued in the second of a revocation is dated one second ahead (issue_tokens), which PyJWT
+    # would otherwise treat as not yet valid.
+    'LEEWAY': 1,
+    # Both check the revocation markers in AUTH_CACHE (UserManagement.authentication).
+    'TOKEN_OBTAIN_SERIALIZER': 'UserManagement.authentication.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'UserManagement.authentication.TokenRefreshSerializer',
+}
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='pawsconnect'),
+    },
+    # Serialized detail responses (PawsConnect.response_cache); must be shared (e.g. Redis) outside DEBUG.
+    'responses': {
+        'BACKEND': config('RESPONSE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('RESPONSE_CACHE_LOCATION', default='pawsconnect-responses'),
+    },
+}
+RESPONSE_CACHE = 'responses'
+
+# JWT user cache (UserManagement.authentication); AUTH_CACHE holds the cross-process invalidation markers and
+# must be shared (e.g. Redis) outside DEBUG
+AUTH_CACHE = 'default'
+JWT_USER_CACHE_SIZE = 10000
+JWT_USER_CACHE_TTL = 60  # seconds
+RESPONSE_CACHE_TIMEOUT = 15 * 60
+
+USER_SEARCH_MAX_RESULTS = 100
+PET_SEARCH_MAX_RESULTS = 100
+
+# Friend suggestions (UserManagement.friends / UserManagement.suggestions)
+SOCIAL_GRAPH_CACHE = 'default'
+SOCIAL_GRAPH_CACHE_TIMEOUT = 60 * 60
+SUGGESTIONS_MAX_FANOUT = 200  # friends walked per request; larger friend lists are sampled
+SUGGESTIONS_CANDIDATE_POOL = 200
+SUGGESTIONS_MAX_RESULTS = 50
+SUGGESTIONS_CACHE_TIMEOUT = 5 * 60
+SUGGESTIONS_PROXIMITY_WEIGHT = 1.0  # a candidate next door scores up to twice their mutual friend count
+SUGGESTIONS_PROXIMITY_SCALE_KM = 25
+
+# Home feed (Content.timeline)
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+FEED_FANOUT_LIMIT = 5000  # authors with more friends than this are pulled on read instead of fanned out
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 50  # recent posts copied into a new friend's timeline
+
+# Image renditions (PawsConnect.renditions); sizes bound the longest edge in pixels
+RENDITION_SIZES = {'thumb': 160, 'medium': 640, 'full': 1600}
+RENDITION_FORMATS = {
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
 }
+RENDITION_ASYNC = config('RENDITION_ASYNC', default=True, cast=bool)  # False renders on commit, in-process
+RENDITION_WORKERS = config('RENDITION_WORKERS', default=2, cast=int)  # resizing processes per server process
+RENDITION_QUEUE_THREADS = 2
+
+# Request metrics (PawsConnect.metrics); /metrics requires "Authorization: Bearer <token>" when a token is set
+METRICS_AUTH_TOKEN = config('METRICS_AUTH_TOKEN', default='')
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+METRICS_SLOW_REQUEST_MS = 500
+METRICS_SLOW_SAMPLE_RATE = 0.05  # share of requests whose SQL is kept in case they turn out slow
+METRICS_SLOW_MAX_STATEMENTS = 200
+
+# Pet transfers (PetManagement.transfers)
+TRANSFER_BULK_MAX = 100  # requests per bulk accept/reject
+
+# Batch endpoint (PawsConnect.batch)
+BATCH_MAX_REQUESTS = 25
+BATCH_MAX_WORKERS = 4  # threads for concurrent reads; each holds its own DB connection while it runs
+
+# Database connection pool (PawsConnect.postgis_pool), per process; max size x processes must fit max_connections
+DATABASE_POOL = {
+    'min_size': config('DATABASE_POOL_MIN_SIZE', default=2, cast=int),
+    'max_size': config('DATABASE_POOL_MAX_SIZE', default=20, cast=int),
+    'timeout': config('DATABASE_POOL_TIMEOUT', default=10, cast=float),  # seconds a checkout may wait
+    'max_lifetime': 1800,  # seconds before a connection is replaced
+    'max_idle': 300,  # seconds before an idle connection above min_size is closed
+}
+DATABASE_POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)  # seconds
+
+# Read replicas (PawsConnect.db_routing); DATABASE_REPLICA_HOSTS lists host[:port] of streaming replicas
+REPLICA_HEALTH_CHECK_INTERVAL = 5  # seconds between checks of a replica, per process
+REPLICA_MAX_LAG = 5  # seconds of replay lag before a replica is skipped
+REPLICA_STICKY_SECONDS = 10  # reads of a user who just wrote go to the primary for this long
+REPLICA_STICKY_CACHE = 'default'  # must be shared (e.g. Redis) outside DEBUG, so stickiness follows the user
+
+# WebSocket notifications (PawsConnect.notifications); set CHANNEL_LAYER_URL (redis://...) with several processes
+CHANNEL_LAYER_URL = config('CHANNEL_LAYER_URL', default='')
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {'hosts': [CHANNEL_LAYER_URL]},
+    } if CHANNEL_LAYER_URL else {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Response compression (PawsConnect.compression); brotli is used when the package is installed
+COMPRESSION_MIN_SIZE = 1024  # bytes; smaller buffered responses are sent as-is
+COMPRESSION_CONTENT_TYPES = ('application/json', 'application/javascript', 'image/svg+xml', 'text/')
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5  # 4-6 compresses better than gzip -6 at similar speed
 ACCOUNT_ADAPTER = 'UserManagement.adapters.CustomAccountAdapter'
 SITE_ID = 1
 
@@ -87,9 +219,12 @@ GDAL_LIBRARY_PATH = config('GDAL_LIBRARY_PATH')
 GEOS_LIBRARY_PATH = config('GEOS_LIBRARY_PATH')
 
 MIDDLEWARE = [
+    'PawsConnect.metrics.MetricsMiddleware',  # outermost, so latency and size cover the whole stack
     "django.middleware.security.SecurityMiddleware",
+    'PawsConnect.compression.CompressionMiddleware',  # before anything that reads or rewrites the body
     "django.contrib.sessions.middleware.SessionMiddleware",  # Ensure session is available
     "django.contrib.auth.middleware.AuthenticationMiddleware",  # Ensure user is authenticated
+    'PawsConnect.db_routing.ReplicaRoutingMiddleware',  # after the session, which it reads the user from
     'corsheaders.middleware.CorsMiddleware',
     "django.middleware.common.CommonMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -106,14 +241,24 @@ ROOT_URLCONF = "PawsConnect.urls"
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.contrib.gis.db.backends.postgis',
+        'ENGINE': 'PawsConnect.postgis_pool',
         'NAME': 'paws_reconnect',
         'USER': 'tyrellbaker',
         'PASSWORD': config('DATABASE_PASSWORD'),
         'HOST': 'localhost',
         'PORT': '5432',
+        'POOL': DATABASE_POOL,
     }
 }
+for index, host in enumerate(config('DATABASE_REPLICA_HOSTS', default='', cast=Csv()), start=1):
+    replica_host, _, replica_port = host.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['PawsConnect.db_routing.PrimaryReplicaRouter']
 
 TEMPLATES = [
     {
@@ -133,6 +278,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "PawsConnect.wsgi.application"
+ASGI_APPLICATION = "PawsConnect.asgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -0,0 +1,45 @@
+"""
+Small fixtures shared by the app test modules.
+
+Each helper creates one row through the ORM, so the model signals (counters, search vectors, timelines)
+fire as they do in production. Run them inside ``captureOnCommitCallbacks(execute=True)`` when the test
+depends on what happens on commit.
+"""
+import itertools
+
+_sequence = itertools.count(1)
+
+
+def make_user(username=None, **fields):
+    from UserManagement.models import CustomUser
+
+    number = next(_sequence)
+    username = username or f'user{number}'
+    fields.setdefault('display_name', username)
+    return CustomUser.objects.create(email=f'{username}@example.com', username=username,
+                                     password='TempPass!234', **fields)
+
+
+def make_pet(owner, **fields):
+    from PetManagement.models import Pet
+
+    fields.setdefault('name', f'Pet {next(_sequence)}')
+    pet = Pet.objects.create(owner=owner, **fields)
+    owner.pets.add(pet)
+    return pet
+
+
+def make_post(user, tagged_pets=(), **fields):
+    from Content.models import Post
+
+    fields.setdefault('content', f'Post {next(_sequence)}')
+    post = Post.objects.create(user=user, **fields)
+    if tagged_pets:
+        post.tagged_pets.set(tagged_pets)
+    return post
+
+
+def befriend(user_from, user_to):
+    from UserManagement.models import Friendship
+
+    return Friendship.objects.create(user_from=user_from, user_to=user_to, status='accepted')
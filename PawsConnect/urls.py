@@ -15,17 +15,26 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from .batch import BatchView
+from .media import serve_media
+from .metrics import metrics_view
+
 urlpatterns = [
                   path('admin/', admin.site.urls),
                   path('accounts/', include('allauth.urls')),
                   path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
                   path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+                  path('api/batch/', BatchView.as_view(), name='batch'),
+                  path('metrics', metrics_view, name='metrics'),
                   path('user/', include('UserManagement.urls', namespace='UserManagement')),
                   path('pet/', include('PetManagement.urls', namespace='PetManagement')),
                   path('content/', include('Content.urls', namespace='content')),
-              ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+              ]
+
+if settings.DEBUG:
+    # Raw media paths carry no access checks, so they are only served by the development server.
+    urlpatterns.append(path(f'{settings.MEDIA_URL}<path:path>', serve_media, name='media'))
@@ -1,8 +1,16 @@
 from autoslug import AutoSlugField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
 from django.urls import reverse
 
+from PawsConnect.renditions import renditions_built, schedule_renditions
+from PawsConnect.response_cache import invalidate
+from PawsConnect.search import ranked_search, update_search_vector
+
 
 def validate_image(file):
     valid_extensions = ['jpg', 'jpeg', 'png', 'gif']
@@ -17,8 +25,14 @@ def pet_photo_path(instance, filename):
 
 
 class PetManager(models.Manager):
-    def search(self, pet_id=None, name=None, breed=None, age=None):
+    def search(self, pet_id=None, name=None, breed=None, age=None, query=None):
+        """
+        ``query`` is a ranked full-text/fuzzy search over name and breed. The ``name`` and ``breed``
+        substring filters are served by the trigram indexes as well.
+        """
         queryset = self.get_queryset()
+        if query:
+            queryset = ranked_search(queryset, query, ['name', 'breed'])
         if pet_id:
             queryset = queryset.filter(id=pet_id)
         if name:
@@ -47,10 +61,23 @@ class Pet(models.Model):
     description = models.TextField(blank=True, max_length=500)
     profile_picture = models.ImageField(upload_to='pet_profile_pics/', validators=[validate_image], null=True,
                                         blank=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     slug = AutoSlugField(populate_from='name', unique=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = PetManager()
 
+    SEARCH_FIELDS = [('name', 'A'), ('breed', 'B')]
+    RENDITION_SOURCE = 'profile_picture'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-id'], name='pet_owner_recent_idx'),
+            GinIndex(fields=['search_vector'], name='pet_search_vector_idx'),
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='pet_name_trgm_idx'),
+            GinIndex(fields=['breed'], opclasses=['gin_trgm_ops'], name='pet_breed_trgm_idx'),
+        ]
+
     def get_absolute_url(self):
         return reverse('PetManagement:pet_detail', kwargs={'slug': self.slug})
 
@@ -62,16 +89,61 @@ class Pet(models.Model):
         return self.pet_type.capitalize()
 
 
+@receiver(post_save, sender=Pet)
+def update_pet_search_vector(sender, instance, update_fields=None, **kwargs):
+    update_search_vector(instance, Pet.SEARCH_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Pet)
+def render_pet_profile_picture(sender, instance, **kwargs):
+    schedule_renditions(instance)
+
+
 class PetPhoto(models.Model):
     pet = models.ForeignKey(Pet, related_name='photos', on_delete=models.CASCADE)
     image = models.ImageField(upload_to=pet_photo_path, validators=[validate_image])
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(max_length=255, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    RENDITION_SOURCE = 'image'
+
     def __str__(self):
         return f"Photo of {self.pet.name} uploaded on {self.uploaded_at.strftime('%Y-%m-%d')}"
 
 
+@receiver(post_save, sender=PetPhoto)
+def render_pet_photo(sender, instance, **kwargs):
+    schedule_renditions(instance)
+
+
+def invalidate_pet_responses(pet_id, owner_id=None):
+    """A pet's detail response and the profile of everyone listing it (its ``pets`` M2M) embed the pet."""
+    from UserManagement.models import CustomUser
+    holders = set(CustomUser.pets.through.objects.filter(pet_id=pet_id).values_list('customuser_id', flat=True))
+    invalidate(Pet, pet_id)
+    invalidate(CustomUser, owner_id, *holders)
+
+
+@receiver(post_save, sender=Pet)
+@receiver(renditions_built, sender=Pet)
+def invalidate_responses_on_pet_save(sender, instance, **kwargs):
+    invalidate_pet_responses(instance.pk, instance.owner_id)
+
+
+# pre_delete: by post_delete the M2M rows naming the pet are already gone.
+@receiver(pre_delete, sender=Pet)
+def invalidate_responses_on_pet_delete(sender, instance, **kwargs):
+    invalidate_pet_responses(instance.pk, instance.owner_id)
+
+
+@receiver(post_save, sender=PetPhoto)
+@receiver(post_delete, sender=PetPhoto)
+@receiver(renditions_built, sender=PetPhoto)
+def invalidate_responses_on_pet_photo_change(sender, instance, **kwargs):
+    invalidate_pet_responses(instance.pet_id)
+
+
 class PetTransferRequest(models.Model):
     class TransferStatus(models.TextChoices):
         PENDING = 'pending', 'Pending'
@@ -88,5 +160,33 @@ class PetTransferRequest(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     message = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='transfer_recent_idx'),
+            # Inbox/outbox pages: one side's requests, optionally by status, newest first.
+            models.Index(fields=['to_user', 'status', '-created_at', '-id'], name='transfer_inbox_idx'),
+            models.Index(fields=['from_user', 'status', '-created_at', '-id'], name='transfer_outbox_idx'),
+        ]
+
     def __str__(self):
         return f"Transfer of {self.pet.name} from {self.from_user.username} to {self.to_user.username}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the post_save receiver tell a status change from any other save without a query.
+        if 'status' in field_names:
+            instance._loaded_status = values[field_names.index('status')]
+        return instance
+
+
+@receiver(post_save, sender=PetTransferRequest)
+def notify_transfer_change(sender, instance, created, **kwargs):
+    from PawsConnect.notifications import notify
+    if created:
+        notify([instance.to_user_id], 'transfer.requested', actor_id=instance.from_user_id,
+               transfer=instance.pk, pet=instance.pet_id)
+    elif instance.status != getattr(instance, '_loaded_status', None):
+        notify([instance.from_user_id, instance.to_user_id], 'transfer.status_changed', transfer=instance.pk,
+               pet=instance.pet_id, status=instance.status)
+    instance._loaded_status = instance.status
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 
+from PawsConnect.serializers import EagerLoadingMixin, FieldSelectionMixin, RenditionsField
 from .models import Pet, PetTransferRequest
 
 
@@ -16,24 +17,28 @@ def validate_pet_type(value):
     return choices[normalized_value]
 
 
-class PetSerializer(serializers.ModelSerializer):
+class PetSerializer(FieldSelectionMixin, EagerLoadingMixin, serializers.ModelSerializer):
     age = serializers.IntegerField()
     pet_type = serializers.CharField()
     can_edit = serializers.SerializerMethodField()
     can_transfer = serializers.SerializerMethodField()
     profile_picture = serializers.ImageField(use_url=True, required=False, allow_null=True)
+    profile_picture_renditions = RenditionsField()
     description = serializers.CharField(required=False)
 
     class Meta:
         model = Pet
-        fields = ['id', 'owner', 'name', 'pet_type', 'breed', 'age', 'color', 'profile_picture', 'description',
-                  'can_edit', 'can_transfer']
+        fields = ['id', 'owner', 'name', 'pet_type', 'breed', 'age', 'color', 'profile_picture',
+                  'profile_picture_renditions', 'description', 'can_edit', 'can_transfer']
         read_only_fields = ['id', 'can_edit', 'can_transfer', 'owner']
         extra_kwargs = {
             'breed': {'required': False},
             'color': {'required': False},
             'profile_picture': {'required': False},
         }
+    expandable_fields = {'owner': ('UserManagement.serializers.CustomUserSerializer', {})}
+    # personalize() recomputes these from the owner
+    selection_requires = {'can_edit': ('owner',), 'can_transfer': ('owner',)}
 
     def create(self, validated_data):
         # Assuming the request user is set as the owner in the view where this serializer is used
@@ -42,10 +47,20 @@ class PetSerializer(serializers.ModelSerializer):
         return pet
 
     def get_can_edit(self, instance):
-        return instance.owner == self.context['request'].user
+        return instance.owner_id == self.context['request'].user.id
 
     def get_can_transfer(self, obj):
-        return obj.owner == self.context['request'].user
+        return obj.owner_id == self.context['request'].user.id
+
+    @staticmethod
+    def personalize(data, request):
+        """Recomputes the viewer-dependent fields of cached output from its ``owner``."""
+        owner = data.get('owner')
+        is_owner = (owner['id'] if isinstance(owner, dict) else owner) == request.user.id
+        for field in ('can_edit', 'can_transfer'):
+            if field in data:
+                data[field] = is_owner
+        return data
 
     def to_representation(self, instance):
         ret = super().to_representation(instance)
@@ -54,7 +69,7 @@ class PetSerializer(serializers.ModelSerializer):
         return ret
 
 
-class PetTransferRequestSerializer(serializers.ModelSerializer):
+class PetTransferRequestSerializer(FieldSelectionMixin, EagerLoadingMixin, serializers.ModelSerializer):
     from UserManagement.models import CustomUser
 
     pet = serializers.PrimaryKeyRelatedField(queryset=Pet.objects.all())
@@ -66,16 +81,20 @@ class PetTransferRequestSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PetTransferRequest
-        fields = ['id', 'pet', 'from_user', 'to_user', 'status', 'message']
+        fields = ['id', 'pet', 'from_user', 'to_user', 'status', 'message', 'can_accept', 'can_reject']
         read_only_fields = ['from_user', 'status']
+    expandable_fields = {
+        'pet': ('PetManagement.serializers.PetSerializer', {}),
+        'to_user': ('UserManagement.serializers.CustomUserSerializer', {}),
+    }
 
     def get_can_accept(self, instance):
         request = self.context.get('request')
-        return instance.to_user == request.user  # Only recipient can accept
+        return instance.to_user_id == request.user.id  # Only recipient can accept
 
     def get_can_reject(self, instance):
         request = self.context.get('request')
-        return instance.to_user == request.user
+        return instance.to_user_id == request.user.id
 
     def validate(self, data):
         if data['from_user'] == data['to_user']:
@@ -83,8 +102,11 @@ class PetTransferRequestSerializer(serializers.ModelSerializer):
         return data
 
 
-class PetTransferRequestDetailSerializer(serializers.ModelSerializer):
+class PetTransferRequestDetailSerializer(FieldSelectionMixin, EagerLoadingMixin, serializers.ModelSerializer):
     pet = PetSerializer()
+    # Serialized with CustomUserSerializer in to_representation
+    extra_select_related = ('from_user', 'to_user')
+    extra_prefetch_related = ('from_user__pets', 'to_user__pets')
 
     class Meta:
         model = PetTransferRequest
@@ -92,11 +114,13 @@ class PetTransferRequestDetailSerializer(serializers.ModelSerializer):
 
     def get_can_cancel(self, instance):
         request = self.context.get('request')
-        return instance.from_user == request.user
+        return instance.from_user_id == request.user.id
 
     def to_representation(self, instance):
         from UserManagement.serializers import CustomUserSerializer  # Import here to avoid circular dependency
         representation = super().to_representation(instance)
-        representation['from_user'] = CustomUserSerializer(instance.from_user).data
-        representation['to_user'] = CustomUserSerializer(instance.to_user).data
+        for name in ('from_user', 'to_user'):
+            if name in representation:
+                representation[name] = CustomUserSerializer(getattr(instance, name), context=self.context,
+                                                            selection=self.selection.child(name)).data
         return representation
@@ -0,0 +1,116 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from PawsConnect.query_budget import QueryBudgetTestMixin
+from PawsConnect.testing import make_pet, make_user
+from .models import Pet, PetTransferRequest
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viewer = make_user()
+            self.other = make_user()
+        self.client.force_authenticate(self.viewer)
+
+    def add_pets(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                make_pet(self.viewer)
+
+    def add_transfers(self, count):
+        """``count`` requests each way between the viewer and someone else."""
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                PetTransferRequest.objects.create(pet=make_pet(self.other), from_user=self.other,
+                                                  to_user=self.viewer)
+                PetTransferRequest.objects.create(pet=make_pet(self.viewer), from_user=self.viewer,
+                                                  to_user=self.other)
+
+    def test_pet_list(self):
+        self.assertBudgetWhileGrowing('PetManagement:pet-list', self.add_pets)
+
+    def test_transfer_list(self):
+        self.assertBudgetWhileGrowing('PetManagement:pet-transfer-request-list', self.add_transfers)
+
+    def test_transfer_inbox(self):
+        self.assertBudgetWhileGrowing('PetManagement:pet-transfer-request-inbox', self.add_transfers)
+
+    def test_transfer_outbox(self):
+        self.assertBudgetWhileGrowing('PetManagement:pet-transfer-request-outbox', self.add_transfers)
+
+
+class BulkTransferTests(APITestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipient = make_user()
+            self.sender = make_user()
+            self.other = make_user()
+        self.client.force_authenticate(self.recipient)
+
+    def request_transfer(self, to_user, owner=None, **fields):
+        pet = make_pet(owner or self.sender)
+        return PetTransferRequest.objects.create(pet=pet, from_user=self.sender, to_user=to_user, **fields)
+
+    def post(self, action, ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse(f'PetManagement:pet-transfer-request-{action}'), {'ids': ids},
+                                    format='json')
+
+    def assertOwnedBy(self, transfer, user):
+        pet = Pet.objects.get(pk=transfer.pet_id)
+        self.assertEqual(pet.owner_id, user.pk)
+        self.assertEqual(list(pet.owned_by.values_list('pk', flat=True)), [user.pk])
+
+    def assertStatus(self, transfer, expected):
+        transfer.refresh_from_db()
+        self.assertEqual(transfer.status, expected)
+
+    def test_bulk_accept_moves_only_the_callers_pending_requests(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            mine = [self.request_transfer(self.recipient) for _ in range(2)]
+            someone_elses = self.request_transfer(self.other)
+            answered = self.request_transfer(self.recipient, status=PetTransferRequest.TransferStatus.REJECTED)
+            given_away = self.request_transfer(self.recipient, owner=self.other)  # not the sender's pet any more
+        ids = [mine[0].pk, someone_elses.pk, answered.pk, mine[1].pk, given_away.pk, 10 ** 9]
+
+        response = self.post('bulk-accept', ids)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['accepted'], [mine[0].pk, mine[1].pk])
+        self.assertEqual(response.data['skipped'], sorted(set(ids) - {mine[0].pk, mine[1].pk}))
+
+        for transfer in mine:
+            self.assertStatus(transfer, PetTransferRequest.TransferStatus.APPROVED)
+            self.assertOwnedBy(transfer, self.recipient)
+        self.assertStatus(someone_elses, PetTransferRequest.TransferStatus.PENDING)
+        self.assertOwnedBy(someone_elses, self.sender)
+        self.assertStatus(answered, PetTransferRequest.TransferStatus.REJECTED)
+        self.assertOwnedBy(answered, self.sender)
+        self.assertStatus(given_away, PetTransferRequest.TransferStatus.PENDING)
+        self.assertOwnedBy(given_away, self.other)
+
+        # Repeating the call finds nothing left to accept.
+        self.assertEqual(self.post('bulk-accept', ids).data['accepted'], [])
+
+    def test_only_the_first_request_for_a_pet_is_accepted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.request_transfer(self.recipient)
+            second = PetTransferRequest.objects.create(pet_id=first.pet_id, from_user=self.sender,
+                                                       to_user=self.recipient)
+        self.assertEqual(self.post('bulk-accept', [second.pk, first.pk]).data['accepted'], [first.pk])
+        self.assertStatus(second, PetTransferRequest.TransferStatus.PENDING)
+        self.assertOwnedBy(first, self.recipient)
+
+    def test_bulk_reject_leaves_ownership_alone(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            mine = self.request_transfer(self.recipient)
+            someone_elses = self.request_transfer(self.other)
+        response = self.post('bulk-reject', [mine.pk, someone_elses.pk])
+        self.assertEqual(response.data, {'rejected': [mine.pk], 'skipped': [someone_elses.pk]})
+        self.assertStatus(mine, PetTransferRequest.TransferStatus.REJECTED)
+        self.assertStatus(someone_elses, PetTransferRequest.TransferStatus.PENDING)
+        self.assertOwnedBy(mine, self.sender)
+
+    def test_ids_must_be_a_list_of_integers(self):
+        for ids in ([], ['1'], [True], 1):
+            self.assertEqual(self.post('bulk-accept', ids).status_code, 400)
@@ -0,0 +1,83 @@
+"""
+Accepting and rejecting pet transfer requests in bulk.
+
+Both lock the recipient's pending requests (``SELECT ... FOR UPDATE``, in id order so concurrent batches
+cannot deadlock) and then apply every change with one statement per table, however many requests there
+are. An accepted request moves the pet to the recipient (``Pet.owner`` and the ``CustomUser.pets`` rows).
+A request is skipped when it is not a pending request addressed to ``user``, or when its pet no longer
+belongs to the sender. Only the first request per pet is taken.
+
+Set-based updates send no model signals, so the response-cache invalidation and notifications that the
+per-object ``save()`` used to trigger are done here. Both run entirely on the primary database.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from PawsConnect.db_routing import pin_to_primary
+from PawsConnect.notifications import notify
+from PawsConnect.response_cache import invalidate
+from .models import Pet, PetTransferRequest
+
+PENDING = PetTransferRequest.TransferStatus.PENDING
+
+
+def _lock_pending(user, ids):
+    return list(
+        PetTransferRequest.objects.select_for_update()
+        .filter(pk__in=ids, to_user_id=user.pk, status=PENDING)
+        .order_by('pk')
+        .values_list('pk', 'pet_id', 'from_user_id')
+    )
+
+
+def _set_status(transfers, status):
+    PetTransferRequest.objects.filter(pk__in=[pk for pk, _, _ in transfers]).update(
+        status=status, updated_at=timezone.now())
+    for pk, pet_id, from_user_id in transfers:
+        notify([from_user_id], 'transfer.status_changed', transfer=pk, pet=pet_id, status=status)
+
+
+@pin_to_primary()
+def accept_transfers(user, ids):
+    """Accepts ``user``'s pending requests among ``ids``. Returns the ids that were accepted."""
+    from UserManagement.models import CustomUser
+    holders = CustomUser.pets.through
+
+    with transaction.atomic():
+        transfers = _lock_pending(user, ids)
+        owners = dict(Pet.objects.select_for_update().filter(pk__in={pet_id for _, pet_id, _ in transfers})
+                      .order_by('pk').values_list('pk', 'owner_id'))
+        accepted, pets = [], set()
+        for transfer in transfers:
+            _, pet_id, from_user_id = transfer
+            if owners.get(pet_id) == from_user_id and pet_id not in pets:
+                accepted.append(transfer)
+                pets.add(pet_id)
+        if not accepted:
+            return []
+
+        # Every profile listing one of the pets embeds its owner, not just the sender's.
+        affected_users = set(holders.objects.filter(pet_id__in=pets).values_list('customuser_id', flat=True))
+        Pet.objects.filter(pk__in=pets).update(owner_id=user.pk)
+        previous = Q()
+        for _, pet_id, from_user_id in accepted:
+            previous |= Q(customuser_id=from_user_id, pet_id=pet_id)
+        holders.objects.filter(previous).delete()
+        holders.objects.bulk_create([holders(customuser_id=user.pk, pet_id=pet_id) for pet_id in pets],
+                                    ignore_conflicts=True)
+        _set_status(accepted, PetTransferRequest.TransferStatus.APPROVED)
+
+        invalidate(Pet, *pets)
+        invalidate(CustomUser, user.pk, *affected_users, *{from_user_id for _, _, from_user_id in accepted})
+    return [pk for pk, _, _ in accepted]
+
+
+@pin_to_primary()
+def reject_transfers(user, ids):
+    """Rejects ``user``'s pending requests among ``ids``. Returns the ids that were rejected."""
+    with transaction.atomic():
+        transfers = _lock_pending(user, ids)
+        if transfers:
+            _set_status(transfers, PetTransferRequest.TransferStatus.REJECTED)
+    return [pk for pk, _, _ in transfers]
@@ -1,17 +1,27 @@
-from django.db import transaction
+from django.conf import settings
+from django.db.models import Q
 from rest_framework import status, viewsets, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
+from PawsConnect.asynchronous import AsyncListModelMixin, AsyncViewSetMixin
+from PawsConnect.pagination import SearchResultsPagination
+from PawsConnect.response_cache import ResponseCache
+from PawsConnect.serializers import FieldSelection
 from .models import Pet, PetTransferRequest
 from .permissions import IsOwnerPermission, IsOwnerOrRecipient
 from .serializers import PetSerializer, PetTransferRequestSerializer
+from .transfers import accept_transfers, reject_transfers
 
+pet_details = ResponseCache('pet_detail', Pet)
 
-class PetViewSet(viewsets.ModelViewSet):
+
+class PetViewSet(AsyncViewSetMixin, AsyncListModelMixin, viewsets.ModelViewSet):
     queryset = Pet.objects.all()
     serializer_class = PetSerializer
+    cursor_ordering = ('-id',)
     permission_classes = [permissions.IsAuthenticated, IsOwnerPermission]
 
 
@@ -26,7 +36,37 @@ class PetViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_queryset(self):
-        return Pet.objects.filter(owner=self.request.user)
+        return self.get_serializer_class().setup_eager_loading(Pet.objects.filter(owner=self.request.user),
+                                                            request=self.request)
+
+    async def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs['pk'])
+        except ValueError:
+            raise NotFound()
+
+        async def build():
+            pet = await self.aget_object()
+            return pet.owner_id, self.get_serializer(pet).data
+
+        owner_id, data = await pet_details.aget_or_build(request, pk, build,
+                                                         variant=FieldSelection.from_request(request).key())
+        # Same rule as get_queryset, so a payload cached for the owner is never shown to anyone else.
+        if owner_id != request.user.id:
+            raise NotFound()
+        return Response(PetSerializer.personalize(data, request))
+
+    @action(methods=['GET'], detail=False, url_path='search')
+    def search(self, request):
+        query = request.query_params.get('query')
+        if not query:
+            return Response({'error': "'query' is required."}, status=status.HTTP_400_BAD_REQUEST)
+        pets = Pet.objects.search(query=query)[:settings.PET_SEARCH_MAX_RESULTS]
+        paginator = SearchResultsPagination()
+        pets = self.get_serializer_class().setup_eager_loading(pets, request=request)
+        page = paginator.paginate_queryset(pets, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -37,58 +77,109 @@ class PetViewSet(viewsets.ModelViewSet):
 class PetTransferRequestViewSet(viewsets.ModelViewSet):
     queryset = PetTransferRequest.objects.all()
     serializer_class = PetTransferRequestSerializer
+    cursor_ordering = ('-created_at', '-id')
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrRecipient]
 
+    def get_queryset(self):
+        # Only requests the requester is a party to; inbox/outbox narrow that to one side.
+        user_id = self.request.user.pk
+        queryset = super().get_queryset()
+        if self.action == 'inbox':
+            queryset = queryset.filter(to_user_id=user_id)
+        elif self.action == 'outbox':
+            queryset = queryset.filter(from_user_id=user_id)
+        else:
+            queryset = queryset.filter(Q(to_user_id=user_id) | Q(from_user_id=user_id))
+        return self.get_serializer_class().setup_eager_loading(queryset, request=self.request)
+
     def perform_create(self, serializer):
         serializer.save(from_user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        return self.list_requests(request)
+
+    @action(detail=False, methods=['get'])
+    def inbox(self, request):
+        """Requests sent to the user, newest first; ``?status=pending`` for the ones awaiting an answer."""
+        return self.list_requests(request)
+
+    @action(detail=False, methods=['get'])
+    def outbox(self, request):
+        """Requests the user sent, newest first; takes ``?status=`` like the inbox."""
+        return self.list_requests(request)
+
+    def list_requests(self, request):
+        queryset = self.get_queryset()
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            if status_filter not in PetTransferRequest.TransferStatus.values:
+                choices = ', '.join(PetTransferRequest.TransferStatus.values)
+                return Response({'error': f"'status' must be one of {choices}."}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(status=status_filter)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['post'])
     def accept(self, request, pk=None):
         transfer_request = self.get_object()
-        if transfer_request.to_user != request.user:
+        if transfer_request.to_user_id != request.user.pk:
             return Response({'error': 'You are not authorized to accept this transfer request.'},
                             status=status.HTTP_403_FORBIDDEN)
         if transfer_request.status != PetTransferRequest.TransferStatus.PENDING:
             return Response({'error': 'Transfer request is not pending.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        with transaction.atomic():
-            pet = transfer_request.pet
-            pet.owner = transfer_request.to_user
-            pet.save()
-
-            transfer_request.from_user.pets.remove(pet)
-            transfer_request.to_user.pets.add(pet)
-
-            transfer_request.status = PetTransferRequest.TransferStatus.APPROVED
-            transfer_request.save()
-
+        if not accept_transfers(request.user, [transfer_request.pk]):
+            return Response({'error': 'Transfer request could not be accepted.'}, status=status.HTTP_409_CONFLICT)
         return Response({'message': 'Pet transfer successful.'})
 
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
         transfer_request = self.get_object()
-        if transfer_request.to_user != request.user:
+        if transfer_request.to_user_id != request.user.pk:
             return Response({'error': 'You are not authorized to reject this transfer request.'},
                             status=status.HTTP_403_FORBIDDEN)
         if transfer_request.status != PetTransferRequest.TransferStatus.PENDING:
             return Response({'error': 'Transfer request is not pending.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not reject_transfers(request.user, [transfer_request.pk]):
+            return Response({'error': 'Transfer request is not pending.'}, status=status.HTTP_409_CONFLICT)
+        return Response({'message': 'Pet transfer rejected.'})
 
-        with transaction.atomic():
-            transfer_request.status = PetTransferRequest.TransferStatus.REJECTED
-            transfer_request.save()
+    @action(detail=False, methods=['post'], url_path='bulk-accept')
+    def bulk_accept(self, request):
+        """``{"ids": [...]}``: accepts the user's pending requests among ``ids`` in one transaction."""
+        return self.apply_in_bulk(request, accept_transfers, 'accepted')
 
-        return Response({'message': 'Pet transfer rejected.'})
+    @action(detail=False, methods=['post'], url_path='bulk-reject')
+    def bulk_reject(self, request):
+        return self.apply_in_bulk(request, reject_transfers, 'rejected')
+
+    @staticmethod
+    def apply_in_bulk(request, apply, done_key):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if (not isinstance(ids, list) or not 0 < len(ids) <= settings.TRANSFER_BULK_MAX
+                or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids)):
+            return Response({'error': f"'ids' must be a list of 1 to {settings.TRANSFER_BULK_MAX} request ids."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        done = apply(request.user, ids)
+        return Response({done_key: done, 'skipped': sorted(set(ids) - set(done))})
 
 
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from PawsConnect.media import serve_file
 from .models import Pet
 
 
+@require_safe
 def pet_profile_picture(request, slug):
-    pet = get_object_or_404(Pet, slug=slug)
-    if pet.profile_picture:
-        return HttpResponse(pet.profile_picture, content_type='image/jpeg')
+    # ?v=<etag> makes the response immutable; only the file name is needed to build it.
+    profile_picture = Pet.objects.filter(slug=slug).values_list('profile_picture', flat=True).first()
+    if profile_picture is None:
+        get_object_or_404(Pet, slug=slug)
+    if profile_picture:
+        return serve_file(request, profile_picture)
     else:
         # Return a default image or a 404 response
         return HttpResponse('No profile picture found.', status=404)
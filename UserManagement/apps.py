@@ -1,7 +1,26 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import pre_migrate
+
+
+def create_search_extensions(using, **kwargs):
+    # The trigram indexes on CustomUser and Pet need pg_trgm before their tables are created.
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
 
 
 class UserManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'UserManagement'
 
+    def ready(self):
+        from PawsConnect.caching import require_shared_cache
+        from PawsConnect.db_routing import replica_aliases
+
+        pre_migrate.connect(create_search_extensions, sender=self)
+        require_shared_cache('AUTH_CACHE', 'token revocations and user cache invalidations')
+        require_shared_cache('RESPONSE_CACHE', 'the version counters of the response cache')
+        if replica_aliases():
+            require_shared_cache('REPLICA_STICKY_CACHE', 'the read-after-write markers of the replica router')
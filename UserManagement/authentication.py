@@ -0,0 +1,166 @@
+"""
+JWT authentication that usually skips the per-request user query.
+
+``CachedJWTAuthentication`` validates the token exactly like simplejwt. It then takes the user from a
+small per-process TTL/LRU cache (``JWT_USER_CACHE_SIZE`` entries, ``JWT_USER_CACHE_TTL`` seconds) instead
+of loading the row, and only falls back to ``JWTAuthentication.get_user`` on a miss.
+
+Staleness is bounded by two markers per user in the shared ``AUTH_CACHE`` alias, read together in one
+``get_many``:
+
+* ``auth:epoch:<id>`` is bumped whenever the user row is saved or deleted (profile edits, deactivation,
+  password changes). A cached user fetched under an older epoch is reloaded.
+* ``auth:revoked:<id>`` is set on logout and on password change. Tokens issued (``iat``) up to and
+  including that second are rejected, on every device, for the rest of their lifetime. ``issue_tokens``
+  dates new tokens after the marker, so a login in the same second as a logout still works.
+
+The simplejwt endpoints follow the same rules: ``TokenObtainPairSerializer`` issues through
+``issue_tokens``, and ``TokenRefreshSerializer`` refuses a refresh token that ``get_user`` would refuse.
+
+Both only take effect everywhere on the next request if every process sees them, so ``AUTH_CACHE`` must be
+shared (e.g. Redis). The app refuses to start with a process-local one outside ``DEBUG``.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+EPOCH_KEY = 'auth:epoch:{}'
+REVOKED_KEY = 'auth:revoked:{}'
+
+
+class TTLCache:
+    """A thread-safe LRU whose entries also expire ``ttl`` seconds after they were stored."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_users = None
+_users_lock = threading.Lock()
+
+
+def get_user_cache():
+    global _users
+    with _users_lock:
+        if _users is None:
+            _users = TTLCache(settings.JWT_USER_CACHE_SIZE, settings.JWT_USER_CACHE_TTL)
+        return _users
+
+
+def _cache():
+    return caches[settings.AUTH_CACHE]
+
+
+def forget_user(user_id):
+    """Drops ``user_id``'s cached user everywhere once the current transaction commits."""
+
+    def bump():
+        get_user_cache().delete(user_id)
+        cache = _cache()
+        try:
+            cache.incr(EPOCH_KEY.format(user_id))
+        except ValueError:
+            cache.set(EPOCH_KEY.format(user_id), time.time_ns(), timeout=None)
+    transaction.on_commit(bump)
+
+
+def revoke_tokens(user_id):
+    """Rejects every token issued to ``user_id`` up to now."""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    _cache().set(REVOKED_KEY.format(user_id), int(time.time()), timeout=int(lifetime.total_seconds()))
+    forget_user(user_id)
+
+
+def issue_tokens(user):
+    """Returns a new ``(refresh, access)`` pair for ``user``, issued after any revocation of their tokens."""
+    refresh = RefreshToken.for_user(user)
+    access = refresh.access_token
+    # iat has a resolution of one second; a token from the second of a revocation would count as revoked.
+    revoked = _cache().get(REVOKED_KEY.format(user.pk))
+    if revoked is not None:
+        for token in (refresh, access):
+            if token['iat'] <= revoked:
+                token['iat'] = revoked + 1
+    return refresh, access
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)  # raises InvalidToken
+
+        epoch_key, revoked_key = EPOCH_KEY.format(user_id), REVOKED_KEY.format(user_id)
+        markers = _cache().get_many([epoch_key, revoked_key])
+        revoked = markers.get(revoked_key)
+        if revoked is not None and validated_token.get('iat', 0) <= revoked:
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+
+        epoch = markers.get(epoch_key)
+        users = get_user_cache()
+        entry = users.get(user_id)
+        if entry is not None and entry[0] == epoch:
+            user = entry[1]
+            if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                    api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        else:
+            user = super().get_user(validated_token)
+            users.set(user_id, (epoch, user))
+        # Each request gets its own instance, so nothing a view does to request.user leaks into the cache.
+        return copy.copy(user)
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        refresh, _ = issue_tokens(user)
+        return refresh  # its access_token copies the adjusted iat
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    def validate(self, attrs):
+        # Revoked, deactivated or deleted users cannot mint new access tokens from an old refresh token.
+        CachedJWTAuthentication().get_user(self.token_class(attrs['refresh']))
+        return super().validate(attrs)
@@ -0,0 +1,73 @@
+"""
+Adjacency index of accepted friendships.
+
+Each user's friend ids are stored in the ``SOCIAL_GRAPH_CACHE`` cache as a sorted ``array('q')`` (8 bytes per
+friend) and loaded from ``Friendship`` on a miss. The ``Friendship`` signals in ``models.py`` drop both
+users' entries whenever an edge is added or removed, and entries also expire after
+``SOCIAL_GRAPH_CACHE_TIMEOUT``.
+
+The index may lag behind the table: with a per-process cache, only the process that made the change drops
+its entries. It is good enough for ranking suggestions, but never for deciding who may see what. Access
+checks use ``load_friend_ids``, which always reads the table on the primary database.
+"""
+from array import array
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+
+from PawsConnect.db_routing import pin_to_primary
+
+KEY = 'friends:{}'
+
+
+def _cache():
+    return caches[settings.SOCIAL_GRAPH_CACHE]
+
+
+def _pack(ids):
+    return array('q', sorted(ids))
+
+
+def _load(user_ids):
+    from .models import Friendship
+    adjacency = {user_id: set() for user_id in user_ids}
+    edges = Friendship.objects.filter(status='accepted').filter(
+        Q(user_from_id__in=user_ids) | Q(user_to_id__in=user_ids)
+    ).values_list('user_from_id', 'user_to_id')
+    for user_from, user_to in edges:
+        if user_from in adjacency:
+            adjacency[user_from].add(user_to)
+        if user_to in adjacency:
+            adjacency[user_to].add(user_from)
+    return {user_id: _pack(ids) for user_id, ids in adjacency.items()}
+
+
+def get_many_friend_ids(user_ids):
+    """Maps each of ``user_ids`` to its sorted ``array`` of friend ids, in one cache round trip plus one query."""
+    user_ids = list(user_ids)
+    cache = _cache()
+    cached = cache.get_many([KEY.format(user_id) for user_id in user_ids])
+    result = {user_id: cached[KEY.format(user_id)] for user_id in user_ids if KEY.format(user_id) in cached}
+    missing = [user_id for user_id in user_ids if user_id not in result]
+    if missing:
+        loaded = _load(missing)
+        cache.set_many({KEY.format(user_id): ids for user_id, ids in loaded.items()},
+                       settings.SOCIAL_GRAPH_CACHE_TIMEOUT)
+        result.update(loaded)
+    return result
+
+
+def get_friend_ids(user_id):
+    return get_many_friend_ids([user_id])[user_id]
+
+
+@pin_to_primary()
+def load_friend_ids(user_id):
+    """``user_id``'s friend ids, straight from the primary database. Use this for access control."""
+    return _load([user_id])[user_id]
+
+
+def forget_edge(user_a, user_b):
+    # Deleting, rather than patching the stored arrays, cannot lose a concurrent change to the same entry.
+    _cache().delete_many([KEY.format(user_a), KEY.format(user_b)])
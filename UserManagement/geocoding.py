@@ -1,15 +1,238 @@
+"""
+Address geocoding with a two-level cache.
+
+``geocode_address`` answers from, in order: an in-process LRU, the bundled ZIP centroid dataset, the
+``GeocodedAddress`` table, and finally the configured backend (``GEOCODING_BACKEND``). Anything the
+backend returns is written to the table so every process can reuse it. ``StubGeocodingBackend`` stands in
+for the HTTP backend in tests and offline development.
+"""
+import csv
+import logging
+import threading
+import time
+from collections import OrderedDict
+
 import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.gis.geos import Point
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodingError(Exception):
+    pass
+
+
+def normalize_zip(zip_code):
+    # Spreadsheets and forms drop leading zeros and append +4 extensions.
+    return str(zip_code).strip().split('-')[0].zfill(5)
+
+
+def normalize_address(city, state, zip_code):
+    city = ' '.join(str(city).split()).upper()
+    state = ' '.join(str(state).split()).upper()
+    return f"{city}, {state}, {normalize_zip(zip_code)}"
+
+
+class GoogleGeocodingBackend:
+    url = 'https://maps.googleapis.com/maps/api/geocode/json'
+    retry_statuses = {'OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'}
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def geocode(self, address):
+        """Returns ``(longitude, latitude)`` for ``address`` or raises ``GeocodingError``."""
+        attempts = settings.GEOCODING_RETRIES + 1
+        for attempt in range(attempts):
+            try:
+                response = self.session.get(
+                    self.url,
+                    params={'address': address, 'key': settings.GOOGLE_MAPS_API_KEY},
+                    timeout=settings.GEOCODING_TIMEOUT,
+                )
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                error = e
+            else:
+                if data.get('status') == 'OK' and data.get('results'):
+                    location = data['results'][0]['geometry']['location']
+                    return location['lng'], location['lat']
+                if data.get('status') not in self.retry_statuses:
+                    raise GeocodingError(f"No result for {address!r}: {data.get('status')}")
+                error = GeocodingError(data.get('status'))
+            if attempt + 1 < attempts:
+                time.sleep(settings.GEOCODING_RETRY_BACKOFF * 2 ** attempt)
+        raise GeocodingError(f"Geocoding {address!r} failed: {error}")
+
+
+class StubGeocodingBackend:
+    """Answers from ``GEOCODING_STUB_RESULTS`` (normalized address -> ``(longitude, latitude)``), offline."""
+
+    def __init__(self):
+        self.calls = []
+
+    def geocode(self, address):
+        self.calls.append(address)
+        try:
+            longitude, latitude = settings.GEOCODING_STUB_RESULTS[address]
+        except KeyError:
+            raise GeocodingError(f"No stub result for {address!r}")
+        return longitude, latitude
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
 
-from PawsConnect import settings
+
+def load_zip_centroids(path):
+    """
+    Reads a ZIP -> ``(longitude, latitude)`` map from either a ``zip,lat,lng`` CSV or the Census
+    Bureau's ZCTA Gazetteer file (tab separated, ``GEOID``/``INTPTLAT``/``INTPTLONG`` columns).
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        sample = f.readline()
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter='\t' if '\t' in sample else ',')
+        reader.fieldnames = [name.strip() for name in reader.fieldnames]
+        if 'GEOID' in reader.fieldnames:
+            columns = ('GEOID', 'INTPTLAT', 'INTPTLONG')
+        else:
+            columns = ('zip', 'lat', 'lng')
+        return {
+            normalize_zip(row[columns[0]]): (float(row[columns[2]]), float(row[columns[1]]))
+            for row in reader
+        }
+
+
+class GeocodingCache:
+    def __init__(self):
+        self.memory = LRUCache(settings.GEOCODING_LRU_SIZE)
+        self.stats = dict.fromkeys(('memory_hits', 'zip_hits', 'db_hits', 'backend_calls', 'failures'), 0)
+        self._stats_lock = threading.Lock()
+        self._zip_centroids = None
+        self._backends = {}
+
+    def count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    @property
+    def zip_centroids(self):
+        if self._zip_centroids is None:
+            path = settings.GEOCODING_ZIP_CENTROIDS_PATH
+            try:
+                self._zip_centroids = load_zip_centroids(path)
+            except OSError:
+                logger.warning("ZIP centroid dataset not found at %s; falling back to the database and backend.",
+                               path)
+                self._zip_centroids = {}
+        return self._zip_centroids
+
+    @property
+    def backend(self):
+        path = settings.GEOCODING_BACKEND
+        if path not in self._backends:
+            self._backends[path] = import_string(path)()
+        return self._backends[path]
+
+    def lookup_local(self, city, state, zip_code):
+        """Answers from the LRU or the ZIP centroids only, without database or network I/O; ``None`` otherwise."""
+        key = normalize_address(city, state, zip_code)
+        coords = self.memory.get(key)
+        if coords is not None:
+            self.count('memory_hits')
+            return coords
+
+        coords = self.zip_centroids.get(normalize_zip(zip_code))
+        if coords is not None:
+            self.count('zip_hits')
+            self.memory.set(key, coords)
+        return coords
+
+    def lookup(self, city, state, zip_code):
+        from .models import GeocodedAddress
+
+        coords = self.lookup_local(city, state, zip_code)
+        if coords is not None:
+            return coords
+
+        key = normalize_address(city, state, zip_code)
+        location = GeocodedAddress.objects.filter(address=key).values_list('location', flat=True).first()
+        if location is not None:
+            self.count('db_hits')
+            coords = (location.x, location.y)
+        else:
+            self.count('backend_calls')
+            try:
+                coords = self.backend.geocode(key)
+            except GeocodingError:
+                self.count('failures')
+                raise
+            GeocodedAddress.objects.bulk_create(
+                [GeocodedAddress(address=key, location=Point(*coords, srid=4326))], ignore_conflicts=True
+            )
+        self.memory.set(key, coords)
+        return coords
+
+    def clear(self):
+        self.memory.clear()
+        self._zip_centroids = None
+        self._backends.clear()
+        with self._stats_lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+
+_cache = None
+
+
+def get_geocoding_cache():
+    global _cache
+    if _cache is None:
+        _cache = GeocodingCache()
+    return _cache
+
+
+def geocoding_stats():
+    return dict(get_geocoding_cache().stats)
 
 
 def geocode_address(city, state, zip_code):
-    address = f"{city}, {state}, {zip_code}"
-    response = requests.get(
-        f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={settings.GOOGLE_MAPS_API_KEY}"
-    )
-    location_data = response.json()
-    latitude = location_data['results'][0]['geometry']['location']['lat']
-    longitude = location_data['results'][0]['geometry']['location']['lng']
+    longitude, latitude = get_geocoding_cache().lookup(city, state, zip_code)
+    return Point(longitude, latitude, srid=4326)
+
+
+async def ageocode_address(city, state, zip_code):
+    """``geocode_address`` for async views: only database and backend lookups leave the event loop."""
+    cache = get_geocoding_cache()
+    coords = cache.lookup_local(city, state, zip_code)
+    if coords is None:
+        coords = await sync_to_async(cache.lookup)(city, state, zip_code)
+    longitude, latitude = coords
     return Point(longitude, latitude, srid=4326)
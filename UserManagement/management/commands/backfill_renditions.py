@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from PawsConnect.renditions import build_renditions
+
+
+def rendition_models():
+    return [model for model in apps.get_models() if getattr(model, 'RENDITION_SOURCE', None)]
+
+
+class Command(BaseCommand):
+    help = 'Builds missing or stale image renditions for every model with a RENDITION_SOURCE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', help='Limit to these models, e.g. Content.Post')
+        parser.add_argument('--workers', type=int, default=None, help='Resizing processes')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--force', action='store_true', help='Rebuild renditions that are already current')
+
+    def handle(self, *args, **options):
+        models = rendition_models()
+        if options['model']:
+            wanted = {label.lower() for label in options['model']}
+            models = [model for model in models if model._meta.label_lower in wanted]
+            if len(models) != len(wanted):
+                raise CommandError(f"Unknown rendition models in {sorted(wanted)}; "
+                                   f"choose from {[model._meta.label for model in rendition_models()]}")
+
+        workers = options['workers'] or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(max_workers=workers) as readers:
+            for model in models:
+                built = failed = 0
+                for batch in self.stale_batches(model, options['batch_size'], options['force']):
+                    # One thread per process keeps every worker busy while the others read and write storage.
+                    for result in readers.map(lambda instance: self.build(instance, pool), batch):
+                        built += result is True
+                        failed += result is False
+                self.stdout.write(f"{model._meta.label}: built {built}, failed {failed}.")
+        self.stdout.write(self.style.SUCCESS('Renditions are up to date.'))
+
+    def stale_batches(self, model, batch_size, force):
+        field = model.RENDITION_SOURCE
+        queryset = model._base_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        batch = []
+        for instance in queryset.only('pk', field, 'renditions').order_by('pk').iterator(chunk_size=batch_size):
+            if force or (instance.renditions or {}).get('source') != getattr(instance, field).name:
+                batch.append(instance)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def build(self, instance, pool):
+        try:
+            return build_renditions(instance, pool) is not None
+        except Exception as e:
+            self.stderr.write(f"{type(instance)._meta.label} {instance.pk}: {e}")
+            return False
@@ -0,0 +1,152 @@
+"""
+End-to-end API benchmark on a throwaway test database.
+
+Creates a test database (like ``manage.py test``), seeds it deterministically from ``--seed`` and the
+counts below, then sends every scenario's requests through the real URLconf and middleware with the test
+client. Each scenario reports throughput, p50/p95/p99 latency and queries per request (counted on a warm-up
+request), and ``--output`` writes the report as sorted JSON, so runs from two commits can be diffed.
+"""
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Content.models import Post
+from PawsConnect.benchmarking import time_calls, write_report
+from PetManagement.models import Pet, PetTransferRequest
+from UserManagement.models import CustomUser, Friendship
+from UserManagement.seeding import Seeder
+
+PASSWORD = 'TempPass!234'
+SCENARIOS = ('login', 'profile_retrieve', 'user_search_text', 'user_search_radius', 'post_list', 'like',
+             'unlike', 'comment', 'transfer_accept')
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the main API scenarios in-process against a freshly seeded test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--pets-per-user', type=float, default=1.5)
+        parser.add_argument('--friendships', type=int, default=10000)
+        parser.add_argument('--friends', type=int, default=100, help='Friends of the benchmarking user')
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=40000)
+        parser.add_argument('--likes', type=int, default=60000)
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario')
+        parser.add_argument('--login-requests', type=int, default=20,
+                            help='Timed logins; each one hashes the password')
+        parser.add_argument('--radius', type=float, default=50, help='Miles, for the radius search')
+        parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                            help='Run only this scenario (repeatable)')
+        parser.add_argument('--output', help='Write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            report = self.run(options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+        for name, stats in report['scenarios'].items():
+            self.stdout.write(f"{name:<20} {stats['throughput_per_s']:>9.1f} req/s  p50 {stats['p50_ms']:>8.2f} ms  "
+                              f"p95 {stats['p95_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms  "
+                              f"{stats['queries_per_request']:>3} queries")
+        if options['output']:
+            write_report(options['output'], report)
+
+    def run(self, options):
+        data = self.generate(options)
+        viewer = data['viewer']
+        client = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(viewer)}')
+        anonymous = Client(HTTP_HOST='localhost')
+        requests = options['requests']
+
+        def repeat(values, count=requests):
+            return list(islice(cycle(values), count))
+
+        scenarios = {
+            'login': (anonymous, 'post', [(reverse('UserManagement:login'), {'username': viewer.username,
+                                                                             'password': PASSWORD})]
+                      * options['login_requests'], 200),
+            'profile_retrieve': (client, 'get', [(reverse('UserManagement:user-detail', args=[pk]), None)
+                                                 for pk in repeat(data['profiles'])], 200),
+            'user_search_text': (client, 'get', [(reverse('UserManagement:user-search'), {'query': term})
+                                                 for term in repeat(data['terms'])], 200),
+            'user_search_radius': (client, 'get', [
+                (reverse('UserManagement:user-search'), {'location': center, 'range': options['radius']})
+                for center in repeat(data['centers'])
+            ], 200),
+            'post_list': (client, 'get', [(reverse('content:post-list'), {'user_id': author})
+                                          for author in repeat(data['authors'])], 200),
+            'like': (client, 'put', [(reverse('content:post-like', args=[pk]), None)
+                                     for pk in repeat(data['posts'])], 200),
+            'unlike': (client, 'delete', [(reverse('content:post-like', args=[pk]), None)
+                                          for pk in repeat(data['posts'])], 200),
+            'comment': (client, 'post', [(reverse('content:comment-list'), {'post': pk, 'content': 'Benchmark!'})
+                                         for pk in repeat(data['posts'])], 201),
+            'transfer_accept': (client, 'post', [(reverse('PetManagement:pet-transfer-request-accept', args=[pk]),
+                                                  None) for pk in data['transfers']], 200),
+        }
+
+        results = {}
+        for name in options['scenario'] or SCENARIOS:
+            scenario_client, method, calls, expected = scenarios[name]
+
+            def call(url, payload, scenario_client=scenario_client, method=method, expected=expected):
+                if method == 'get':
+                    response = scenario_client.get(url, payload)
+                else:
+                    response = getattr(scenario_client, method)(url, payload, content_type='application/json')
+                assert response.status_code == expected, (url, response.status_code, response.content[:500])
+
+            # The first call warms caches and is the one whose queries are counted.
+            with CaptureQueriesContext(connection) as queries:
+                call(*calls[0])
+            results[name] = time_calls(call, calls[1:])
+            results[name]['queries_per_request'] = len(queries)
+
+        counts = {key: options[key] for key in ('seed', 'users', 'pets_per_user', 'friendships', 'friends', 'posts',
+                                                'comments', 'likes', 'requests', 'login_requests', 'radius')}
+        return {'dataset': counts, 'scenarios': results}
+
+    def generate(self, options):
+        self.stdout.write('Generating data...')
+        seeder = Seeder(seed=options['seed'], log=lambda message: self.stdout.write(message))
+        user_ids = seeder.users(options['users'], password=PASSWORD, geocode=False)
+        seeder.scatter_locations(user_ids)
+        seeder.pets(user_ids, per_user=options['pets_per_user'])
+        seeder.friendships(user_ids, options['friendships'])
+        viewer = CustomUser.objects.get(pk=user_ids[0])
+        friends = user_ids[1:options['friends'] + 1]
+        Friendship.objects.bulk_create([
+            Friendship(user_from_id=viewer.pk, user_to_id=friend_id, status='accepted') for friend_id in friends
+        ], ignore_conflicts=True)
+        post_ids = seeder.posts(user_ids, options['posts'])
+        seeder.comments(user_ids, post_ids, options['comments'])
+        seeder.likes(user_ids, post_ids, options['likes'])
+        seeder.finish(post_ids)
+
+        # A pending request to the viewer for every accept, each for a different pet of its current owner.
+        transfers = PetTransferRequest.objects.bulk_create([
+            PetTransferRequest(pet_id=pet_id, from_user_id=owner_id, to_user_id=viewer.pk)
+            for pet_id, owner_id in Pet.objects.exclude(owner_id=viewer.pk).order_by('pk')
+            .values_list('pk', 'owner_id')[:options['requests']]
+        ])
+        located = CustomUser.objects.filter(pk__in=user_ids[:50]).order_by('pk')
+        return {
+            'viewer': viewer,
+            'profiles': user_ids[1:51],
+            'terms': list(located.values_list('first_name', flat=True)),
+            'centers': [f'{point.y},{point.x}' for point in located.values_list('location', flat=True)],
+            'authors': friends[:50],
+            # Distinct posts, so every like and unlike changes a row.
+            'posts': list(Post.objects.filter(visibility=Post.VisibilityChoices.PUBLIC).exclude(likes__user=viewer)
+                          .order_by('pk').values_list('pk', flat=True)[:options['requests']]),
+            'transfers': [transfer.pk for transfer in transfers],
+        }
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from PawsConnect.benchmarking import time_calls, write_report
+from UserManagement.authentication import CachedJWTAuthentication, get_user_cache
+from UserManagement.models import CustomUser
+from UserManagement.views import UserViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compares requests/sec of an authenticated endpoint with simplejwt and the cached JWT authentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--warmup', type=int, default=50)
+        parser.add_argument('--output', help='Write the results as JSON to this path')
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST='localhost')
+        url = reverse('UserManagement:check_session')
+        report = {}
+        original = UserViewSet.authentication_classes
+        try:
+            with transaction.atomic():
+                user = CustomUser.objects.create(email='bench-auth@example.com', password='bench-password-1',
+                                                 username='bench-auth', display_name='Bench Auth')
+                headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+
+                def get():
+                    response = client.get(url, **headers)
+                    assert response.json()['is_authenticated'], response.content
+
+                for name, authentication in (('simplejwt', JWTAuthentication), ('cached', CachedJWTAuthentication)):
+                    UserViewSet.authentication_classes = [authentication]
+                    get_user_cache().clear()
+                    for _ in range(options['warmup']):
+                        get()
+                    with CaptureQueriesContext(connection) as queries:
+                        get()
+                    report[name] = time_calls(get, [()] * options['requests'])
+                    report[name]['queries_per_request'] = len(queries)
+                transaction.set_rollback(True)
+        finally:
+            UserViewSet.authentication_classes = original
+
+        for name, stats in report.items():
+            self.stdout.write(f"{name:<10} {stats['throughput_per_s']:>9.1f} req/s  p50 {stats['p50_ms']:>7.3f} ms  "
+                              f"p99 {stats['p99_ms']:>7.3f} ms  {stats['queries_per_request']} queries/request")
+        report['speedup'] = round(report['cached']['throughput_per_s'] / report['simplejwt']['throughput_per_s'], 2)
+        self.stdout.write(f"speedup    {report['speedup']}x")
+        if options['output']:
+            write_report(options['output'], report)
@@ -0,0 +1,140 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from PawsConnect.benchmarking import time_calls, write_report
+from PawsConnect.search import build_search_vector
+from PetManagement.models import Pet
+from UserManagement.models import CustomUser
+from UserManagement.utils import search_users
+
+FIRST_NAMES = ['Tyrell', 'Maria', 'Jordan', 'Priya', 'Lucas', 'Hannah', 'Diego', 'Aisha', 'Connor', 'Mei',
+               'Samuel', 'Olivia', 'Mateo', 'Grace', 'Elijah', 'Zara', 'Noah', 'Chloe', 'Isaac', 'Nadia']
+LAST_NAMES = ['Baker', 'Garcia', 'Nguyen', 'Patel', 'Smith', 'Okafor', 'Kowalski', 'Rossi', 'Haddad', 'Kim',
+              'Johnson', 'Silva', 'Muller', 'Tanaka', 'Brown', 'Ivanova', 'Lopez', 'Cohen', 'Walsh', 'Singh']
+PET_NAMES = ['Buddy', 'Luna', 'Max', 'Bella', 'Charlie', 'Daisy', 'Rocky', 'Milo', 'Coco', 'Pepper',
+             'Biscuit', 'Shadow', 'Ziggy', 'Nala', 'Oreo', 'Waffles', 'Mochi', 'Pickles', 'Sprout', 'Juniper']
+BREEDS = ['Labrador Retriever', 'German Shepherd', 'Golden Retriever', 'French Bulldog', 'Beagle', 'Poodle',
+          'Maine Coon', 'Siamese', 'Persian', 'Ragdoll', 'Cockatiel', 'Budgerigar', 'Bearded Dragon', 'Ball Python']
+
+
+def insert_series(model, count, expressions):
+    """
+    Inserts ``count`` rows with a single ``INSERT ... SELECT FROM generate_series`` (``i`` is the row
+    number). Columns missing from ``expressions`` get NULL or the field's default.
+    """
+    columns, selects, values = [], [], []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        columns.append(connection.ops.quote_name(field.column))
+        if field.name in expressions:
+            selects.append(expressions[field.name])
+        elif field.null:
+            selects.append('NULL')
+        else:
+            selects.append('%s')
+            values.append(field.get_db_prep_save(field.get_default(), connection))
+    sql = (f"INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({', '.join(columns)}) "
+           f"SELECT {', '.join(selects)} FROM generate_series(1, %s) AS i")
+    with connection.cursor() as cursor:
+        cursor.execute(sql, values + [count])
+
+
+def pick(words, salt=7919):
+    """SQL expression choosing a word from the (constant, quote-free) ``words`` list for row ``i``."""
+    array = ', '.join(f"'{word}'" for word in words)
+    return f"(ARRAY[{array}])[1 + mod(i * {salt}, {len(words)})]"
+
+
+class Command(BaseCommand):
+    help = 'Compares ranked full-text/trigram search with the old icontains search on a generated dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Users and pets to generate')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the results as JSON to this path')
+        parser.add_argument('--keep', action='store_true', help='Commit the generated rows instead of rolling back')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        terms = self.build_terms(rng, options['queries'])
+
+        with transaction.atomic():
+            self.generate(options['rows'])
+            report = {'rows': options['rows'], 'queries': len(terms)}
+            report['users_ranked'] = time_calls(lambda q: list(search_users(query=q)), [(q,) for q in terms])
+            report['pets_ranked'] = time_calls(lambda q: list(Pet.objects.search(query=q)[:100]), [(q,) for q in terms])
+
+            # The icontains path as it ran before this schema existed: no trigram indexes to help the ILIKE.
+            with transaction.atomic():
+                self.drop_trigram_indexes()
+                report['users_icontains'] = time_calls(self.icontains_users, [(q,) for q in terms])
+                report['pets_icontains'] = time_calls(self.icontains_pets, [(q,) for q in terms])
+                transaction.set_rollback(True)
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        for name in ('users_icontains', 'users_ranked', 'pets_icontains', 'pets_ranked'):
+            stats = report[name]
+            self.stdout.write(f"{name:<16} p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms  "
+                              f"p99 {stats['p99_ms']:>9.2f} ms  {stats['throughput_per_s']:>8.1f} q/s")
+        if options['output']:
+            write_report(options['output'], report)
+
+    @staticmethod
+    def build_terms(rng, count):
+        words = FIRST_NAMES + LAST_NAMES + PET_NAMES + BREEDS
+        terms = []
+        for _ in range(count):
+            word = rng.choice(words).split()[0]
+            kind = rng.random()
+            if kind < 0.3:  # typo
+                position = rng.randrange(1, len(word))
+                word = word[:position] + word[position + 1:]
+            elif kind < 0.5:  # partial
+                word = word[:max(3, len(word) - 2)]
+            terms.append(word)
+        return terms
+
+    def generate(self, rows):
+        self.stdout.write(f"Generating {rows} users and {rows} pets...")
+        insert_series(CustomUser, rows, {
+            'username': f"lower({pick(LAST_NAMES)}) || i",
+            'email': "'bench' || i || '@example.com'",
+            'display_name': f"{pick(FIRST_NAMES, 104729)} || ' ' || {pick(LAST_NAMES)}",
+            'slug': "'bench-user-' || i",
+        })
+        first_user = CustomUser.objects.get(slug='bench-user-1').pk  # one INSERT, so the ids are consecutive
+        insert_series(Pet, rows, {
+            'owner': f"{first_user} - 1 + i",
+            'name': pick(PET_NAMES),
+            'breed': pick(BREEDS, 104729),
+            'slug': "'bench-pet-' || i",
+        })
+        CustomUser.objects.filter(search_vector__isnull=True).update(
+            search_vector=build_search_vector(CustomUser.SEARCH_FIELDS))
+        Pet.objects.filter(search_vector__isnull=True).update(search_vector=build_search_vector(Pet.SEARCH_FIELDS))
+        with connection.cursor() as cursor:
+            for model in (CustomUser, Pet):
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+    @staticmethod
+    def drop_trigram_indexes():
+        with connection.cursor() as cursor:
+            for model in (CustomUser, Pet):
+                for index in model._meta.indexes:
+                    if 'gin_trgm_ops' in getattr(index, 'opclasses', ()):
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+
+    @staticmethod
+    def icontains_users(query):
+        return list(CustomUser.objects.filter(Q(username__icontains=query) | Q(display_name__icontains=query))[:100])
+
+    @staticmethod
+    def icontains_pets(query):
+        return list(Pet.objects.filter(Q(name__icontains=query) | Q(breed__icontains=query))[:100])
@@ -1,50 +1,35 @@
-import json
-import pandas as pd
+import time
+
 from django.core.management.base import BaseCommand
-from django.conf import settings
-from faker import Faker
-from pathlib import Path
+
+from UserManagement.seeding import Seeder
+
 
 class Command(BaseCommand):
-    help = 'Creates dummy users from an Excel file'
-
-    def handle(self, *args, **kwargs):
-        from UserManagement.forms import UserRegistrationForm
-
-        # Define the path to the Excel file
-        excel_file_path = Path(settings.BASE_DIR) / 'misc' / 'DummyData.xlsx'
-
-        # Load the Excel file
-        df = pd.read_excel(excel_file_path, header=1)
-
-        fake = Faker()
-        for _ in range(250):  # Adjust the range as needed
-            row = df.sample(n=1).iloc[0]
-            user_data = {
-                'username': fake.user_name(),
-                'email': fake.email(),
-                'password1': 'TempPass!234',
-                'password2': 'TempPass!234',
-                'first_name': fake.first_name(),
-                'last_name': fake.last_name(),
-                'city': row['City'],
-                'state': row['State'],
-                'zip_code': str(row['Zip']),
-                'preferred_language': 'en',
-                'display_name': fake.user_name(),  # Updated to use Faker
-                # Removed 'profile_picture': None, if not handling file uploads
-                'has_pets': fake.boolean(),  # Randomly decide if the user has pets
-                'about_me': 'This is an autogenerated user.',
-            }
-
-            form = UserRegistrationForm(data=user_data)
-
-            if form.is_valid():
-                form.save()
-                self.stdout.write(self.style.SUCCESS(
-                    f"Successfully created user {user_data['first_name']} {user_data['last_name']}."))
-            else:
-                # Enhanced error logging
-                errors = json.dumps(form.errors.get_json_data(), indent=4)
-                self.stdout.write(self.style.ERROR(
-                    f"Failed to create user {user_data['first_name']} {user_data['last_name']}: {errors}"))
\ No newline at end of file
+    help = 'Bulk-creates dummy users, pets, friendships and posts for development and load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=250)
+        parser.add_argument('--pets-per-user', type=float, default=1.0, help='Average pets per user')
+        parser.add_argument('--friendships', type=int, default=0)
+        parser.add_argument('--posts', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=None, help='Processes used to hash passwords')
+        parser.add_argument('--password', default='TempPass!234')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        seeder = Seeder(seed=options['seed'], batch_size=options['batch_size'], workers=options['workers'],
+                        log=self.stdout.write)
+
+        user_ids = seeder.users(options['users'], password=options['password'])
+        pet_ids = seeder.pets(user_ids, options['pets_per_user'])
+        friendships = seeder.friendships(user_ids, options['friendships'])
+        post_ids = seeder.posts(user_ids, options['posts'])
+        seeder.finish(post_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(user_ids)} users, {len(pet_ids)} pets, {friendships} friendships and "
+            f"{len(post_ids)} posts in {time.perf_counter() - started:.1f}s."
+        ))
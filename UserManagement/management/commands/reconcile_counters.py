@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Func, IntegerField, OuterRef, Q, Subquery
+
+from Content.models import Comment, Like, Post
+from UserManagement.models import CustomUser, Friendship
+
+
+def count_subquery(queryset):
+    """
+    Correlated ``(SELECT COUNT(id) FROM ...)``. ``COUNT`` is applied as a plain function so Django adds no
+    GROUP BY, and the subquery yields 0 rather than NULL when nothing matches.
+    """
+    counted = queryset.order_by().annotate(n=Func(F('pk'), function='COUNT')).values('n')
+    return Subquery(counted, output_field=IntegerField())
+
+
+class Command(BaseCommand):
+    help = ('Recomputes Post.like_count, Post.comment_count and CustomUser.num_friends in small id-range batches, '
+            'writing only rows that drifted')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+
+    def handle(self, *args, **options):
+        post_counters = {
+            'like_count': lambda: count_subquery(Like.objects.filter(post=OuterRef('pk'))),
+            'comment_count': lambda: count_subquery(Comment.objects.filter(post=OuterRef('pk'), is_active=True)),
+        }
+        user_counters = {
+            'num_friends': lambda: count_subquery(Friendship.objects.filter(status='accepted').filter(
+                Q(user_from=OuterRef('pk')) | Q(user_to=OuterRef('pk')))),
+        }
+
+        fixed_posts = self.reconcile(Post, post_counters, options)
+        fixed_users = self.reconcile(CustomUser, user_counters, options)
+        self.stdout.write(self.style.SUCCESS(f"Repaired {fixed_posts} posts and {fixed_users} users."))
+
+    def reconcile(self, model, counters, options):
+        """
+        Each batch is its own short transaction: the drifted rows in an id range are found with one query and
+        rewritten from the same correlated counts, so only those rows are locked, and only briefly. The counts
+        are evaluated inside the UPDATE, so a like or friendship landing mid-batch is not overwritten.
+        """
+        batch_size = options['batch_size']
+        last_id = model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        fixed = 0
+        for start in range(0, last_id + 1, batch_size):
+            with transaction.atomic():
+                batch = model.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+                batch = batch.annotate(**{f'actual_{field}': counter() for field, counter in counters.items()})
+                drifted = Q()
+                for field in counters:
+                    drifted |= ~Q(**{field: F(f'actual_{field}')})
+                ids = list(batch.filter(drifted).values_list('pk', flat=True))
+                if ids:
+                    fixed += model.objects.filter(pk__in=ids).update(
+                        **{field: counter() for field, counter in counters.items()})
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        return fixed
@@ -2,15 +2,20 @@ from autoslug import AutoSlugField
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.contrib.gis.db import models as gis_models
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.db.models import F
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from imagekit.models import ProcessedImageField
 from imagekit.processors import ResizeToFill
 
+from PawsConnect.renditions import schedule_renditions
+from PawsConnect.response_cache import invalidate
+from PawsConnect.search import update_search_vector
 
 
 # Constants for choices
@@ -65,9 +70,19 @@ class CustomUser(AbstractUser):
     friends = models.ManyToManyField('self', related_name='friends_with', symmetrical=False, blank=True)
     email = models.EmailField(unique=True)
     has_completed_profile = models.BooleanField(default=False)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = CustomUserManager()
 
+    SEARCH_FIELDS = [('username', 'A'), ('display_name', 'A')]
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='user_search_vector_idx'),
+            GinIndex(fields=['username'], opclasses=['gin_trgm_ops'], name='user_username_trgm_idx'),
+            GinIndex(fields=['display_name'], opclasses=['gin_trgm_ops'], name='user_display_name_trgm_idx'),
+        ]
+
     def get_absolute_url(self):
         return reverse('user_profile', kwargs={'slug': self.slug})
 
@@ -75,30 +90,77 @@ class CustomUser(AbstractUser):
         return self.username
 
 
+class GeocodedAddress(models.Model):
+    """Persistent geocoding cache, keyed on ``geocoding.normalize_address``."""
+    address = models.CharField(max_length=255, unique=True)
+    location = gis_models.PointField(geography=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.address
+
+
 class Photo(models.Model):
     user = models.ForeignKey(CustomUser, related_name='user_photos', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='photos/')
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(max_length=255, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    RENDITION_SOURCE = 'image'
+
     def __str__(self):
         return f"Photo by {self.user.username}"
 
 
+@receiver(post_save, sender=Photo)
+def render_photo(sender, instance, **kwargs):
+    schedule_renditions(instance)
+
+
+class FriendshipManager(models.Manager):
+    def friend_ids(self, user):
+        """Returns the ids of everyone with an accepted friendship with ``user``, in either direction."""
+        user_id = getattr(user, 'pk', user)
+        accepted = self.get_queryset().filter(status='accepted')
+        sent = accepted.filter(user_from_id=user_id).values_list('user_to_id', flat=True)
+        received = accepted.filter(user_to_id=user_id).values_list('user_from_id', flat=True)
+        return set(sent.union(received))
+
+
 class Friendship(models.Model):
     user_from = models.ForeignKey(CustomUser, related_name='sent_friendships', on_delete=models.CASCADE)
     user_to = models.ForeignKey(CustomUser, related_name='received_friendships', on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=FRIENDSHIP_STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = FriendshipManager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user_from', 'user_to'], name='unique_friendship')
         ]
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='friendship_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user_from.username} -> {self.user_to.username} ({self.status})"
 
+    def save(self, *args, **kwargs):
+        # num_friends follows every transition into or out of 'accepted', however the status was changed.
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = Friendship.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'status', flat=True).first()
+            self._previous_status = previous
+            super().save(*args, **kwargs)
+            if self.status == 'accepted' and previous != 'accepted':
+                increment_friend_count(self.user_from_id, self.user_to_id)
+            elif previous == 'accepted' and self.status != 'accepted':
+                decrement_friend_count(self.user_from_id, self.user_to_id)
+
     def accept(self):
         self.status = 'accepted'
         self.save()
@@ -108,21 +170,92 @@ class Friendship(models.Model):
         self.save()
 
 
-def increment_friend_count(user_from, user_to):
-    CustomUser.objects.filter(pk=user_from.pk).update(num_friends=F('num_friends') + 1)
-    CustomUser.objects.filter(pk=user_to.pk).update(num_friends=F('num_friends') + 1)
+def increment_friend_count(user_from_id, user_to_id):
+    CustomUser.objects.filter(pk__in=[user_from_id, user_to_id]).update(num_friends=F('num_friends') + 1)
 
-def decrement_friend_count(user_from, user_to):
-    CustomUser.objects.filter(pk=user_from.pk).update(num_friends=F('num_friends') - 1)
-    CustomUser.objects.filter(pk=user_to.pk).update(num_friends=F('num_friends') - 1)
 
+def decrement_friend_count(user_from_id, user_to_id):
+    CustomUser.objects.filter(pk__in=[user_from_id, user_to_id], num_friends__gt=0).update(
+        num_friends=F('num_friends') - 1)
+
+
+@receiver(post_save, sender=CustomUser)
+def update_user_search_vector(sender, instance, update_fields=None, **kwargs):
+    update_search_vector(instance, CustomUser.SEARCH_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_responses(sender, instance, **kwargs):
+    invalidate(CustomUser, instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_authentication_cache(sender, instance, created=False, **kwargs):
+    from .authentication import forget_user, revoke_tokens
+    # set_password() leaves the raw password in _password until save() finishes.
+    if not created and getattr(instance, '_password', None) is not None:
+        revoke_tokens(instance.pk)
+    else:
+        forget_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=CustomUser.pets.through)
+def invalidate_responses_on_pets_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate(CustomUser, instance.pk)
+    elif action == 'pre_clear':
+        invalidate(CustomUser, *instance.owned_by.values_list('pk', flat=True))
+    else:
+        invalidate(CustomUser, *pk_set)
 
-@receiver(post_save, sender=Friendship)
-def update_friends_count_on_save(sender, instance, created, **kwargs):
-    if created and instance.status == 'accepted':
-        increment_friend_count(instance.user_from, instance.user_to)
 
 @receiver(post_delete, sender=Friendship)
 def update_friends_count_on_delete(sender, instance, **kwargs):
     if instance.status == 'accepted':
-        decrement_friend_count(instance.user_from, instance.user_to)
+        decrement_friend_count(instance.user_from_id, instance.user_to_id)
+
+
+@receiver(post_save, sender=Friendship)
+def update_social_graph_on_save(sender, instance, **kwargs):
+    from .friends import forget_edge
+    from .suggestions import invalidate_suggestions, invalidate_suggestions_around
+    # A pending or declined request only changes who the two users exclude; an accepted edge coming or
+    # going also changes their friends' mutual counts.
+    edge_changed = (instance.status == 'accepted') != (getattr(instance, '_previous_status', None) == 'accepted')
+
+    def update():
+        forget_edge(instance.user_from_id, instance.user_to_id)
+        if edge_changed:
+            invalidate_suggestions_around(instance.user_from_id, instance.user_to_id)
+        else:
+            invalidate_suggestions(instance.user_from_id, instance.user_to_id)
+    transaction.on_commit(update)
+
+
+@receiver(post_save, sender=Friendship)
+def notify_friendship_change(sender, instance, created, **kwargs):
+    from PawsConnect.notifications import notify
+    if created:
+        notify([instance.user_to_id], 'friendship.requested', actor_id=instance.user_from_id,
+               friendship=instance.pk)
+    elif instance.status == 'accepted' and getattr(instance, '_previous_status', None) != 'accepted':
+        notify([instance.user_from_id], 'friendship.accepted', actor_id=instance.user_to_id,
+               friendship=instance.pk)
+
+
+@receiver(post_delete, sender=Friendship)
+def update_social_graph_on_delete(sender, instance, **kwargs):
+    from .friends import forget_edge
+    from .suggestions import invalidate_suggestions, invalidate_suggestions_around
+
+    def update():
+        forget_edge(instance.user_from_id, instance.user_to_id)
+        if instance.status == 'accepted':
+            invalidate_suggestions_around(instance.user_from_id, instance.user_to_id)
+        else:
+            invalidate_suggestions(instance.user_from_id, instance.user_to_id)
+    transaction.on_commit(update)
@@ -0,0 +1,272 @@
+"""
+Bulk synthetic data for load tests, used by the ``create_users`` command and the benchmark suite.
+
+Everything goes through ``bulk_create`` in batches, and the per-row costs that dominate the normal
+signup path are paid once instead. One process pool hashes a few shared passwords, each distinct
+City/State/Zip is geocoded once, and slugs are assigned up front. Signals do not run for bulk inserts,
+so search vectors, counters and timelines are rebuilt afterwards with set-based statements.
+"""
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.gis.geos import Point
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils.text import slugify
+from faker import Faker
+
+from Content.models import Comment, Like, Post
+from Content.timeline import fan_out_post_range
+from PawsConnect.search import build_search_vector
+from PetManagement.models import Pet
+from .geocoding import GeocodingError, geocode_address, normalize_zip
+from .models import CustomUser, Friendship
+
+DUMMY_DATA_PATH = Path(settings.BASE_DIR) / 'misc' / 'DummyData.xlsx'
+NAME_POOL_SIZE = 2000
+CONTINENTAL_US = (-124.7, 24.5, -66.9, 49.4)  # west, south, east, north
+
+
+def insert_presigned(model, objs):
+    """
+    Bulk inserts rows whose slugs were assigned up front and are already unique, returning them with
+    their primary keys set.
+
+    The insert is raw, so no field's ``pre_save`` runs and ``AutoSlugField`` skips its per-row uniqueness
+    query; the database's unique index still enforces uniqueness. Every other column must be set (or
+    defaulted) on the instances already.
+    """
+    opts = model._meta
+    fields = [field for field in opts.concrete_fields if field is not opts.pk]
+    rows = model._base_manager._insert(objs, fields, returning_fields=[opts.pk], raw=True)
+    for obj, (pk,) in zip(objs, rows):
+        obj.pk = pk
+        obj._state.adding = False
+    return objs
+
+
+def hash_passwords(password, count, workers=None):
+    """``count`` independently salted hashes of ``password``, computed in parallel."""
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        return list(pool.map(make_password, [password] * count))
+
+
+def load_addresses(path=DUMMY_DATA_PATH):
+    df = pd.read_excel(path, header=1)[['City', 'State', 'Zip']].dropna()
+    df['Zip'] = df['Zip'].astype(int).astype(str).map(normalize_zip)
+    return df
+
+
+class Seeder:
+    def __init__(self, seed=0, batch_size=5000, workers=None, log=None):
+        self.seed = seed
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count()
+        self.rng = np.random.default_rng(seed)
+        self.fake = Faker()
+        self.fake.seed_instance(seed)
+        self.log = log or (lambda message: None)
+
+    def _name_pool(self, generate):
+        return [generate() for _ in range(NAME_POOL_SIZE)]
+
+    def _chunks(self, count):
+        for start in range(0, count, self.batch_size):
+            yield start, min(start + self.batch_size, count)
+
+    def geocode_distinct(self, addresses):
+        """Resolves each distinct (City, State, Zip) once; failures map to ``None``."""
+        locations = {}
+        for city, state, zip_code in addresses.drop_duplicates().itertuples(index=False):
+            try:
+                locations[(city, state, zip_code)] = geocode_address(city, state, zip_code)
+            except GeocodingError:
+                locations[(city, state, zip_code)] = None
+        self.log(f"Geocoded {len(locations)} distinct addresses.")
+        return locations
+
+    def users(self, count, password='TempPass!234', distinct_hashes=None, geocode=True):
+        if not count:
+            return []
+        hashes = hash_passwords(password, distinct_hashes or self.workers, self.workers)
+        addresses = load_addresses().sample(n=count, replace=True, random_state=self.seed).reset_index(drop=True)
+        locations = self.geocode_distinct(addresses) if geocode else {}
+
+        bases = [re.sub('[^a-z]', '', name.lower())[:12] or 'user' for name in self._name_pool(self.fake.user_name)]
+        first_names = self._name_pool(self.fake.first_name)
+        last_names = self._name_pool(self.fake.last_name)
+        picks = self.rng.integers(0, NAME_POOL_SIZE, size=(count, 3))
+        has_pets = self.rng.random(count) < 0.5
+        # Letters then digits, so the username (and the slug, which is the same string) stays unique.
+        offset = (CustomUser.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+        cities, states, zip_codes = (addresses[column].to_numpy() for column in ('City', 'State', 'Zip'))
+
+        ids = []
+        for start, end in self._chunks(count):
+            batch = []
+            for i in range(start, end):
+                username = f"{bases[picks[i, 0]]}{offset + i}"
+                city, state, zip_code = cities[i], states[i], zip_codes[i]
+                batch.append(CustomUser(
+                    username=username,
+                    slug=username,
+                    email=f"{username}@example.com",
+                    password=hashes[i % len(hashes)],
+                    first_name=first_names[picks[i, 1]],
+                    last_name=last_names[picks[i, 2]],
+                    display_name=f"{first_names[picks[i, 1]]} {last_names[picks[i, 2]]}",
+                    city=city,
+                    state=state,
+                    zip_code=zip_code,
+                    location=locations.get((city, state, zip_code)),
+                    has_pets=bool(has_pets[i]),
+                    has_completed_profile=True,
+                    about_me='This is an autogenerated user.',
+                ))
+            ids.extend(user.pk for user in insert_presigned(CustomUser, batch))
+            self.log(f"Created {end}/{count} users.")
+        CustomUser.objects.filter(pk__in=ids, search_vector__isnull=True).update(
+            search_vector=build_search_vector(CustomUser.SEARCH_FIELDS))
+        return ids
+
+    def scatter_locations(self, user_ids, bounds=CONTINENTAL_US):
+        """Gives users uniformly random locations inside ``bounds``; a network-free stand-in for geocoding."""
+        west, south, east, north = bounds
+        points = self.rng.uniform((west, south), (east, north), size=(len(user_ids), 2))
+        for start, end in self._chunks(len(user_ids)):
+            CustomUser.objects.bulk_update([
+                CustomUser(pk=int(user_ids[i]), location=Point(float(points[i, 0]), float(points[i, 1]), srid=4326))
+                for i in range(start, end)
+            ], ['location'])
+            self.log(f"Located {end}/{len(user_ids)} users.")
+
+    def pets(self, user_ids, per_user=1.0):
+        if not user_ids or per_user <= 0:
+            return []
+        counts = self.rng.poisson(per_user, size=len(user_ids))
+        owners = np.repeat(np.asarray(user_ids), counts)
+        names = self._name_pool(self.fake.first_name)
+        types = [choice for choice, _ in Pet.PetType.choices]
+        picks = self.rng.integers(0, NAME_POOL_SIZE, size=len(owners))
+        type_picks = self.rng.integers(0, len(types), size=len(owners))
+        ages = self.rng.integers(0, 18, size=len(owners))
+        offset = (Pet.objects.order_by('-pk').values_list('pk', flat=True).first() or 0) + 1
+
+        through = CustomUser.pets.through
+        ids = []
+        for start, end in self._chunks(len(owners)):
+            pets = insert_presigned(Pet, [
+                Pet(
+                    owner_id=int(owners[i]),
+                    name=names[picks[i]],
+                    pet_type=types[type_picks[i]],
+                    age=int(ages[i]),
+                    slug=f"{slugify(names[picks[i]])}-{offset + i}",
+                )
+                for i in range(start, end)
+            ])
+            through.objects.bulk_create([through(customuser_id=pet.owner_id, pet_id=pet.pk) for pet in pets])
+            ids.extend(pet.pk for pet in pets)
+            self.log(f"Created {end}/{len(owners)} pets.")
+        Pet.objects.filter(pk__in=ids, search_vector__isnull=True).update(
+            search_vector=build_search_vector(Pet.SEARCH_FIELDS))
+        return ids
+
+    def friendships(self, user_ids, count):
+        if len(user_ids) < 2 or not count:
+            return 0
+        user_ids = np.asarray(user_ids)
+        pairs = self.rng.integers(0, len(user_ids), size=(int(count * 1.1) + 10, 2))
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        pairs.sort(axis=1)  # (a, b) and (b, a) are the same friendship
+        pairs = np.unique(pairs, axis=0)[:count]
+        self.rng.shuffle(pairs)
+
+        created = 0
+        for start, end in self._chunks(len(pairs)):
+            Friendship.objects.bulk_create([
+                Friendship(user_from_id=int(user_ids[a]), user_to_id=int(user_ids[b]), status='accepted')
+                for a, b in pairs[start:end]
+            ], ignore_conflicts=True)
+            created = end
+            self.log(f"Created {end}/{len(pairs)} friendships.")
+        return created
+
+    def posts(self, user_ids, count, max_age_days=30):
+        if not user_ids or not count:
+            return []
+        authors = self.rng.choice(np.asarray(user_ids), size=count)
+        sentences = self._name_pool(self.fake.sentence)
+        picks = self.rng.integers(0, NAME_POOL_SIZE, size=count)
+        friends_only = self.rng.random(count) < 0.3
+
+        ids = []
+        for start, end in self._chunks(count):
+            posts = Post.objects.bulk_create([
+                Post(
+                    user_id=int(authors[i]),
+                    content=sentences[picks[i]],
+                    visibility=Post.VisibilityChoices.FRIENDS_ONLY if friends_only[i] else Post.VisibilityChoices.PUBLIC,
+                )
+                for i in range(start, end)
+            ])
+            ids.extend(post.pk for post in posts)
+            self.log(f"Created {end}/{count} posts.")
+
+        # auto_now_add stamps every row with the same instant; spread them out so feeds look realistic.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {connection.ops.quote_name(Post._meta.db_table)} '
+                f'SET "timestamp" = now() - random() * %s * interval \'1 day\' WHERE id BETWEEN %s AND %s',
+                [max_age_days, min(ids), max(ids)],
+            )
+        return ids
+
+    def comments(self, user_ids, post_ids, count):
+        if not user_ids or not post_ids or not count:
+            return []
+        authors = self.rng.choice(np.asarray(user_ids), size=count)
+        posts = self.rng.choice(np.asarray(post_ids), size=count)
+        sentences = self._name_pool(self.fake.sentence)
+        picks = self.rng.integers(0, NAME_POOL_SIZE, size=count)
+
+        ids = []
+        for start, end in self._chunks(count):
+            comments = Comment.objects.bulk_create([
+                Comment(user_id=int(authors[i]), post_id=int(posts[i]), content=sentences[picks[i]])
+                for i in range(start, end)
+            ])
+            ids.extend(comment.pk for comment in comments)
+            self.log(f"Created {end}/{count} comments.")
+        return ids
+
+    def likes(self, user_ids, post_ids, count):
+        if not user_ids or not post_ids or not count:
+            return 0
+        pairs = np.column_stack((self.rng.choice(np.asarray(user_ids), size=int(count * 1.1) + 10),
+                                 self.rng.choice(np.asarray(post_ids), size=int(count * 1.1) + 10)))
+        pairs = np.unique(pairs, axis=0)[:count]  # one like per user and post
+        self.rng.shuffle(pairs)
+
+        created = 0
+        for start, end in self._chunks(len(pairs)):
+            Like.objects.bulk_create([
+                Like(user_id=int(user_id), post_id=int(post_id)) for user_id, post_id in pairs[start:end]
+            ], ignore_conflicts=True)
+            created = end
+            self.log(f"Created {end}/{len(pairs)} likes.")
+        return created
+
+    def finish(self, post_ids=()):
+        """Rebuilds what signals would have maintained: counters, then feeds (which depend on num_friends)."""
+        call_command('reconcile_counters', batch_size=50000)
+        if post_ids:
+            with transaction.atomic():
+                fan_out_post_range(min(post_ids), max(post_ids))
@@ -3,6 +3,8 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 
+from PawsConnect.db_routing import pin_to_primary
+from PawsConnect.serializers import EagerLoadingMixin, FieldSelectionMixin, RenditionsField
 from PetManagement.serializers import PetSerializer
 from .geocoding import geocode_address
 from .models import CustomUser, Friendship, Photo
@@ -10,7 +12,7 @@ from .models import CustomUser, Friendship, Photo
 User = get_user_model()
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(FieldSelectionMixin, EagerLoadingMixin, serializers.ModelSerializer):
     pets = PetSerializer(many=True, read_only=True)
     profile_picture = serializers.ImageField(use_url=True, required=False, allow_null=True)
     password = serializers.CharField(write_only=True, style={'input_type': 'password'}, required=False)
@@ -24,6 +26,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'slug', 'has_completed_profile']
 
+    @pin_to_primary()
     def create(self, validated_data):
         from PetManagement.models import Pet
         display_name = validated_data.pop('display_name', None) or validated_data.get('username')
@@ -63,7 +66,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
         return instance
 
 
-class FriendshipSerializer(serializers.ModelSerializer):
+class FriendshipSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user_from = serializers.SlugRelatedField(slug_field='username', read_only=True)
     user_to = serializers.SlugRelatedField(slug_field='username', queryset=User.objects.all())
 
@@ -75,10 +78,11 @@ class FriendshipSerializer(serializers.ModelSerializer):
 
 class PhotoSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')
+    image_renditions = RenditionsField()
 
     class Meta:
         model = Photo
-        fields = ['id', 'user', 'image', 'caption', 'uploaded_at']
+        fields = ['id', 'user', 'image', 'image_renditions', 'caption', 'uploaded_at']
         read_only_fields = ['id', 'user', 'uploaded_at']
 
 
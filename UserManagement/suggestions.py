@@ -0,0 +1,99 @@
+"""
+"People you may know": friends of friends ranked by mutual friend count, optionally boosted by proximity.
+
+Works entirely off the adjacency index in ``friends.py``, so the graph walk is one cache round trip. Users
+with more than ``SUGGESTIONS_MAX_FANOUT`` friends are walked through a sample of them, and finished
+rankings are cached for ``SUGGESTIONS_CACHE_TIMEOUT``. A user's rankings are dropped when their own
+friendships change, and also when a friend gains or loses a friend, which changes their mutual counts.
+"""
+import heapq
+import random
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Distance
+from django.core.cache import caches
+from django.db.models import Q
+
+from PawsConnect.db_routing import pin_to_primary
+from .friends import get_friend_ids, get_many_friend_ids
+
+KEY = 'suggestions:{}:{}'
+
+
+def _cache():
+    return caches[settings.SOCIAL_GRAPH_CACHE]
+
+
+def invalidate_suggestions(*user_ids):
+    _cache().delete_many([KEY.format(user_id, near) for user_id in user_ids for near in (0, 1)])
+
+
+def invalidate_suggestions_around(user_a, user_b):
+    """
+    Drops every ranking an accepted edge between ``user_a`` and ``user_b`` affects, whether it was added or
+    removed: theirs, and those of each side's friends, for whom the other side's mutual count changed.
+    Call it after ``forget_edge``, so the neighbours are read from the table.
+    """
+    with pin_to_primary():
+        neighbours = get_many_friend_ids([user_a, user_b])
+    invalidate_suggestions(user_a, user_b, *neighbours[user_a], *neighbours[user_b])
+
+
+def _mutual_counts(user_id):
+    from .models import Friendship
+
+    friends = get_friend_ids(user_id)
+    walked = list(friends)
+    if len(walked) > settings.SUGGESTIONS_MAX_FANOUT:
+        walked = random.Random(user_id).sample(walked, settings.SUGGESTIONS_MAX_FANOUT)
+
+    counts = Counter()
+    for friend_ids in get_many_friend_ids(walked).values():
+        counts.update(friend_ids)
+
+    # Anyone already connected, pending or declined in either direction is not a suggestion.
+    excluded = set(friends)
+    excluded.add(user_id)
+    for user_from, user_to in Friendship.objects.filter(
+            Q(user_from_id=user_id) | Q(user_to_id=user_id)).values_list('user_from_id', 'user_to_id'):
+        excluded.update((user_from, user_to))
+    for candidate in excluded:
+        counts.pop(candidate, None)
+    return counts
+
+
+def _rank(user, near):
+    from .models import CustomUser
+
+    counts = _mutual_counts(user.pk)
+    candidates = heapq.nlargest(settings.SUGGESTIONS_CANDIDATE_POOL, counts.items(), key=lambda item: item[1])
+    ranked = [(candidate, mutual, mutual, None) for candidate, mutual in candidates]
+
+    if near and user.location is not None and candidates:
+        distances = dict(
+            CustomUser.objects.filter(pk__in=[c for c, _ in candidates], location__isnull=False)
+            .annotate(distance=Distance('location', user.location))
+            .values_list('pk', 'distance')
+        )
+        ranked = []
+        for candidate, mutual in candidates:
+            distance_km = distances[candidate].km if candidate in distances else None
+            boost = 0.0
+            if distance_km is not None:
+                boost = settings.SUGGESTIONS_PROXIMITY_WEIGHT / (1 + distance_km / settings.SUGGESTIONS_PROXIMITY_SCALE_KM)
+            ranked.append((candidate, mutual, mutual * (1 + boost), distance_km))
+
+    ranked.sort(key=lambda item: (-item[2], item[0]))
+    return [(candidate, mutual, distance_km) for candidate, mutual, _, distance_km in ranked]
+
+
+def suggest_friends(user, limit=20, near=False):
+    """Returns up to ``limit`` ``(user_id, mutual_friends, distance_km)`` tuples, best first."""
+    cache = _cache()
+    key = KEY.format(user.pk, int(bool(near)))
+    ranked = cache.get(key)
+    if ranked is None:
+        ranked = _rank(user, near)
+        cache.set(key, ranked, settings.SUGGESTIONS_CACHE_TIMEOUT)
+    return ranked[:limit]
@@ -0,0 +1,294 @@
+import io
+import itertools
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from PawsConnect.query_budget import QueryBudgetTestMixin
+from Content.models import Comment, Like, Post
+from PawsConnect.testing import befriend, make_pet, make_post, make_user
+from .authentication import REVOKED_KEY, CachedJWTAuthentication, get_user_cache
+from .geocoding import GeocodingCache, GeocodingError
+from .models import CustomUser, Friendship, GeocodedAddress
+from .suggestions import suggest_friends
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viewer = make_user()
+        self.client.force_authenticate(self.viewer)
+
+    def test_user_detail(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = make_user()
+
+        def add_pets(count):
+            # On commit, so the cached profile is invalidated as it would be in production.
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(count):
+                    make_pet(profile)
+
+        self.assertBudgetWhileGrowing('UserManagement:user-detail', add_pets, args=[profile.pk])
+
+    def test_user_search(self):
+        numbers = itertools.count(1)
+
+        def add_users(count):
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(count):
+                    make_pet(make_user(username=f'budget{next(numbers)}'))
+
+        self.assertBudgetWhileGrowing('UserManagement:user-search', add_users, data={'query': 'budget'})
+
+    def test_friendship_list(self):
+        def add_friends(count):
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(count):
+                    befriend(self.viewer, make_user())
+
+        self.assertBudgetWhileGrowing('UserManagement:friendship-list', add_friends)
+
+
+@override_settings(GEOCODING_BACKEND='UserManagement.geocoding.StubGeocodingBackend',
+                   GEOCODING_STUB_RESULTS={'AUSTIN, TX, 78701': (-97.74, 30.27)})
+class GeocodingCacheTests(TestCase):
+    def setUp(self):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as f:
+            f.write('zip,lat,lng\n02134,42.35,-71.13\n')
+        self.addCleanup(os.remove, path)
+        settings_override = override_settings(GEOCODING_ZIP_CENTROIDS_PATH=path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.cache = GeocodingCache()
+
+    def test_zip_centroid_needs_no_database_or_backend(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.lookup('Boston', 'MA', '2134'), (-71.13, 42.35))
+        self.assertEqual(self.cache.backend.calls, [])
+        self.assertEqual(self.cache.stats['zip_hits'], 1)
+
+    def test_backend_result_is_persisted_then_served_from_memory_and_table(self):
+        self.assertEqual(self.cache.lookup('austin ', 'tx', '78701'), (-97.74, 30.27))
+        self.assertEqual(self.cache.backend.calls, ['AUSTIN, TX, 78701'])
+        self.assertTrue(GeocodedAddress.objects.filter(address='AUSTIN, TX, 78701').exists())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.lookup('Austin', 'TX', '78701'), (-97.74, 30.27))
+        self.assertEqual(self.cache.stats['memory_hits'], 1)
+
+        # A fresh process has an empty LRU, so the row answers before the backend is asked again.
+        other = GeocodingCache()
+        with self.assertNumQueries(1):
+            coords = other.lookup('Austin', 'TX', '78701')
+        self.assertAlmostEqual(coords[0], -97.74)
+        self.assertAlmostEqual(coords[1], 30.27)
+        self.assertEqual(other.backend.calls, [])
+        self.assertEqual(other.stats['db_hits'], 1)
+
+    def test_unknown_address_fails_without_persisting(self):
+        with self.assertRaises(GeocodingError):
+            self.cache.lookup('Nowhere', 'ZZ', '00000')
+        self.assertEqual(self.cache.stats['failures'], 1)
+        self.assertFalse(GeocodedAddress.objects.exists())
+
+
+class FriendCounterTests(TestCase):
+    def setUp(self):
+        self.alice = make_user()
+        self.bob = make_user()
+        self.carol = make_user()
+
+    def assertFriendCounts(self, *expected):
+        users = [self.alice, self.bob, self.carol]
+        for user in users:
+            user.refresh_from_db()
+            accepted = Friendship.objects.filter(Q(user_from=user) | Q(user_to=user), status='accepted').count()
+            self.assertEqual(user.num_friends, accepted)
+        self.assertEqual(tuple(user.num_friends for user in users), expected)
+
+    def test_only_accepted_friendships_count(self):
+        request = Friendship.objects.create(user_from=self.alice, user_to=self.bob)
+        self.assertFriendCounts(0, 0, 0)
+
+        request.status = 'accepted'
+        request.save()
+        request.save()  # no transition, so no second increment
+        befriend(self.carol, self.alice)
+        self.assertFriendCounts(2, 1, 1)
+
+    def test_unfriending_and_deleting(self):
+        friendship = befriend(self.alice, self.bob)
+        befriend(self.alice, self.carol).delete()
+        self.assertFriendCounts(1, 1, 0)
+
+        friendship.status = 'declined'
+        friendship.save()
+        self.assertFriendCounts(0, 0, 0)
+        friendship.delete()  # no longer accepted, so nothing left to take off
+        self.assertFriendCounts(0, 0, 0)
+
+
+class ReconcileCountersTests(TestCase):
+    def test_repairs_drifted_counters(self):
+        alice, bob, carol = make_user(), make_user(), make_user()
+        befriend(alice, bob)
+        post = make_post(alice)
+        untouched = make_post(bob)
+        Like.objects.create(post=post, user=bob)
+        Comment.objects.create(post=post, user=carol, content='Active')
+        Comment.objects.create(post=post, user=carol, content='Hidden').deactivate()
+
+        Post.objects.filter(pk=post.pk).update(like_count=7, comment_count=0)
+        CustomUser.objects.filter(pk__in=[alice.pk, carol.pk]).update(num_friends=3)
+
+        out = io.StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=out)
+        self.assertIn('Repaired 1 posts and 2 users.', out.getvalue())
+
+        post.refresh_from_db()
+        untouched.refresh_from_db()
+        self.assertEqual((post.like_count, post.comment_count), (1, 1))
+        self.assertEqual((untouched.like_count, untouched.comment_count), (0, 0))
+        self.assertEqual(dict(CustomUser.objects.filter(pk__in=[alice.pk, bob.pk, carol.pk])
+                              .values_list('pk', 'num_friends')), {alice.pk: 1, bob.pk: 1, carol.pk: 0})
+
+        out = io.StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('Repaired 0 posts and 0 users.', out.getvalue())
+
+
+class AuthenticationTests(APITestCase):
+    password = 'TempPass!234'
+
+    def setUp(self):
+        get_user_cache().clear()
+        caches[settings.AUTH_CACHE].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = make_user()
+
+    def login(self):
+        response = self.client.post(reverse('UserManagement:login'),
+                                    {'username': self.user.username, 'password': self.password})
+        self.assertEqual(response.status_code, 200)
+        return response.data['tokens']
+
+    def get(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return self.client.get(reverse('UserManagement:friendship-list'))
+
+    def test_cached_user_needs_no_query(self):
+        token = AccessToken(self.login()['access'])
+        authentication = CachedJWTAuthentication()
+        with self.assertNumQueries(1):
+            authentication.get_user(token)
+        with self.assertNumQueries(0):
+            user = authentication.get_user(token)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_password_change_revokes_tokens(self):
+        access = self.login()['access']
+        self.assertEqual(self.get(access).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('NewPass!234')
+            self.user.save()
+        self.assertEqual(self.get(access).status_code, 401)
+
+    def test_deactivation_rejects_tokens(self):
+        tokens = self.login()
+        self.assertEqual(self.get(tokens['access']).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get(tokens['access']).status_code, 401)
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(reverse('UserManagement:logout')).status_code, 200)
+        self.assertEqual(self.get(tokens['access']).status_code, 401)
+
+        self.client.credentials()
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_works_without_revocation(self):
+        response = self.client.post(reverse('token_refresh'), {'refresh': self.login()['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(response.data['access']).status_code, 200)
+
+    def test_login_in_the_second_of_a_revocation_works(self):
+        # Pin the marker to the current second, as if the logout had just happened.
+        caches[settings.AUTH_CACHE].set(REVOKED_KEY.format(self.user.pk), int(time.time()))
+        self.assertEqual(self.get(self.login()['access']).status_code, 200)
+
+        self.client.credentials()
+        response = self.client.post(reverse('token_obtain_pair'),
+                                    {'username': self.user.username, 'password': self.password})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(response.data['access']).status_code, 200)
+        response = self.client.post(reverse('token_refresh'), {'refresh': response.data['refresh']})
+        self.assertEqual(response.status_code, 200)
+
+
+class SuggestionTests(TestCase):
+    def setUp(self):
+        caches[settings.SOCIAL_GRAPH_CACHE].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viewer = make_user(location=Point(-97.74, 30.27, srid=4326))
+            self.friends = [make_user(), make_user()]
+            for friend in self.friends:
+                befriend(self.viewer, friend)
+
+    def connect(self, user, *friends, status='accepted'):
+        with self.captureOnCommitCallbacks(execute=True):
+            for friend in friends:
+                Friendship.objects.create(user_from=friend, user_to=user, status=status)
+        return user
+
+    def test_ranked_by_mutual_friends(self):
+        both = self.connect(make_user(), *self.friends)
+        one = self.connect(make_user(), self.friends[0])
+        self.assertEqual(suggest_friends(self.viewer), [(both.pk, 2, None), (one.pk, 1, None)])
+
+    def test_friends_and_pending_or_declined_users_are_excluded(self):
+        pending = self.connect(make_user(), *self.friends)
+        declined = self.connect(make_user(), *self.friends)
+        self.connect(pending, self.viewer, status='pending')
+        self.connect(self.viewer, declined, status='declined')
+        self.connect(self.friends[1], self.friends[0])  # two friends who know each other
+        self.assertEqual(suggest_friends(self.viewer), [])
+
+    def test_nearby_candidates_are_boosted(self):
+        far = self.connect(make_user(location=Point(-71.06, 42.36, srid=4326)), self.friends[0])
+        near = self.connect(make_user(location=Point(-97.75, 30.28, srid=4326)), self.friends[1])
+        unknown = self.connect(make_user(), *self.friends)
+        ranked = suggest_friends(self.viewer, near=True)
+        self.assertEqual([user_id for user_id, _, _ in ranked], [unknown.pk, near.pk, far.pk])
+        distances = {user_id: distance for user_id, _, distance in ranked}
+        self.assertIsNone(distances[unknown.pk])
+        self.assertLess(distances[near.pk], 5)
+        self.assertGreater(distances[far.pk], 2000)
+
+    def test_a_friends_new_friend_updates_cached_rankings(self):
+        candidate = self.connect(make_user(), self.friends[0])
+        self.assertEqual(suggest_friends(self.viewer), [(candidate.pk, 1, None)])
+        self.connect(candidate, self.friends[1])
+        self.assertEqual(suggest_friends(self.viewer), [(candidate.pk, 2, None)])
+        with self.captureOnCommitCallbacks(execute=True):
+            Friendship.objects.filter(user_to=candidate).first().delete()
+        self.assertEqual(suggest_friends(self.viewer), [(candidate.pk, 1, None)])
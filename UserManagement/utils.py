@@ -1,30 +1,51 @@
-from django.contrib.gis.measure import D, Distance
-from elasticsearch_dsl import Q
+from django.conf import settings
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.db.models import FloatField, Func, Value
 
+from PawsConnect.search import ranked_search
 
 
+class KNNDistance(Func):
+    """
+    PostGIS ``<->`` operator. Ordering by it lets the GiST index on a geography column return rows
+    nearest-first without computing the exact distance for every row.
+    """
+    arg_joiner = ' <-> '
+    template = '%(expressions)s'
+    output_field = FloatField()
 
+    def __init__(self, expression, point, **extra):
+        point = Value(point, output_field=PointField(geography=True, srid=point.srid or 4326))
+        super().__init__(expression, point, **extra)
 
-def search_users(query=None, location_point=None, search_range=None):
+
+def parse_location(value):
+    """Parses a ``"lat,lng"`` query parameter into a ``Point``. Raises ``ValueError`` if it is malformed."""
+    latitude, longitude = (float(part) for part in value.split(','))
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('Coordinates out of range.')
+    return Point(longitude, latitude, srid=4326)
+
+
+def search_users(query=None, location_point=None, search_range=None, limit=None):
     from UserManagement.models import CustomUser
     queryset = CustomUser.objects.all()
     if query:
-        queryset = queryset.filter(
-            Q(username__icontains=query) | Q(display_name__icontains=query)
-        )
-    if location_point and search_range:
-        search_distance = D(mi=search_range)
+        queryset = ranked_search(queryset, query, ['username', 'display_name'])
+    if location_point:
+        if search_range:
+            # ST_DWithin on the geography column, answered from its GiST index.
+            queryset = queryset.filter(location__dwithin=(location_point, D(mi=search_range)))
         queryset = queryset.annotate(
             distance=Distance('location', location_point)
-        ).filter(distance__lte=search_distance)
-    return queryset
+        ).order_by(KNNDistance('location', location_point))
+    limit = min(limit or settings.USER_SEARCH_MAX_RESULTS, settings.USER_SEARCH_MAX_RESULTS)
+    return queryset[:limit]
 
 
-def search_pets(pet_id=None, name=None):
+def search_pets(pet_id=None, name=None, query=None):
     from PetManagement.models import Pet
-    queryset = Pet.objects.all()
-    if pet_id:
-        queryset = queryset.filter(id=pet_id)
-    if name:
-        queryset = queryset.filter(name__icontains=name)
-    return queryset
+    return Pet.objects.search(pet_id=pet_id, name=name, query=query)
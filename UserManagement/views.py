@@ -1,24 +1,35 @@
+from django.conf import settings
 from django.contrib.auth import authenticate, logout
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from PawsConnect.asynchronous import AsyncListModelMixin, AsyncViewSetMixin
+from PawsConnect.pagination import SearchResultsPagination
+from PawsConnect.response_cache import ResponseCache
+from PawsConnect.serializers import FieldSelection
+from PetManagement.serializers import PetSerializer
+from .authentication import issue_tokens, revoke_tokens
+from .geocoding import ageocode_address, GeocodingError
 from .models import CustomUser, Friendship
 from .serializers import CustomUserSerializer, FriendshipSerializer, CompleteProfileSerializer
-from .utils import search_users
+from .suggestions import suggest_friends
+from .utils import search_users, parse_location
+
+user_profiles = ResponseCache('user_profile', CustomUser)
 
 
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    refresh, access = issue_tokens(user)
     return {
         'refresh': str(refresh),
-        'access': str(refresh.access_token),
+        'access': str(access),
     }
 
 
-class UserViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.UpdateModelMixin):
+class UserViewSet(AsyncViewSetMixin, viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.UpdateModelMixin):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
 
@@ -27,6 +38,20 @@ class UserViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.Retri
             return [AllowAny()]
         return [IsAuthenticated()]
 
+    def get_queryset(self):
+        return self.get_serializer_class().setup_eager_loading(super().get_queryset(), request=self.request)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs['pk'])
+        except ValueError:
+            raise NotFound()
+        data = user_profiles.get_or_build(request, pk, lambda: self.get_serializer(self.get_object()).data,
+                                          variant=FieldSelection.from_request(request).key())
+        for pet in data.get('pets', ()):
+            PetSerializer.personalize(pet, request)
+        return Response(data)
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -57,6 +82,8 @@ class UserViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.Retri
 
     @action(methods=['POST'], detail=False, url_path='logout')
     def logout(self, request):
+        if request.user.is_authenticated:
+            revoke_tokens(request.user.pk)
         logout(request)
         return Response({"message": "Logged out successfully."}, status=status.HTTP_200_OK)
 
@@ -74,23 +101,66 @@ class UserViewSet(viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.Retri
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(methods=['GET'], detail=False, url_path='search')
-    def search(self, request):
+    async def search(self, request):
         query = request.query_params.get('query')
         city = request.query_params.get('city')
         state = request.query_params.get('state')
         zip_code = request.query_params.get('zip_code')
         location = request.query_params.get('location')
-        range = request.query_params.get('range')
-
-        users = search_users(query=query, location_point=location, search_range=range)
-        serializer = self.get_serializer(users, many=True)
-        return Response(serializer.data)
-
-
-class FriendshipViewSet(viewsets.ModelViewSet):
+        search_range = request.query_params.get('range')
+
+        try:
+            location_point = parse_location(location) if location else None
+            search_range = float(search_range) if search_range else None
+        except ValueError:
+            return Response({'error': "'location' must be 'lat,lng' and 'range' a number of miles."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if search_range is not None and search_range <= 0:
+            return Response({'error': "'range' must be positive."}, status=status.HTTP_400_BAD_REQUEST)
+        if location_point is None and city and state and zip_code:
+            try:
+                location_point = await ageocode_address(city, state, zip_code)
+            except GeocodingError:
+                return Response({'error': 'Invalid address.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        users = search_users(query=query, location_point=location_point, search_range=search_range)
+        users = self.get_serializer_class().setup_eager_loading(users, request=request)
+        paginator = SearchResultsPagination()
+        page = await paginator.apaginate_queryset(users, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(methods=['GET'], detail=False, url_path='suggestions')
+    def suggestions(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), settings.SUGGESTIONS_MAX_RESULTS))
+        except ValueError:
+            return Response({'error': "'limit' must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        near = request.query_params.get('near', '').lower() in ('1', 'true', 'yes')
+
+        ranked = suggest_friends(request.user, limit=limit, near=near)
+        users = self.get_serializer_class().setup_eager_loading(
+            CustomUser.objects.filter(pk__in=[user_id for user_id, _, _ in ranked], is_active=True), request=request
+        ).in_bulk()
+        results = [
+            {
+                'user': self.get_serializer(users[user_id]).data,
+                'mutual_friends': mutual,
+                'distance_km': round(distance_km, 1) if distance_km is not None else None,
+            }
+            for user_id, mutual, distance_km in ranked if user_id in users
+        ]
+        return Response(results)
+
+
+class FriendshipViewSet(AsyncViewSetMixin, AsyncListModelMixin, viewsets.ModelViewSet):
     queryset = Friendship.objects.all()
     serializer_class = FriendshipSerializer
+    cursor_ordering = ('-created_at', '-id')
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        return self.get_serializer_class().setup_eager_loading(super().get_queryset(), request=self.request)
+
     def perform_create(self, serializer):
         serializer.save(user_from=self.request.user)